@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT / "src"))
+
+from features.backtest import (
+    DEFAULT_GRACE,
+    DEFAULT_MAX_LEAD,
+    default_rule,
+    parse_duration,
+    parse_time,
+    read_incidents,
+    run_backtest,
+)
+from features.rules import RuleSet, load_rules
+from features.store import open_store
+from observability import profiling
+from observability.metrics import emit_summary
+
+DATA_DIR = REPO_ROOT / "data"
+DB_PATH = DATA_DIR / "feature_store.duckdb"
+REPORT_PATH = DATA_DIR / "features" / "backtest.json"
+
+
+def _format_share(value: float | None) -> str:
+    return "n/a" if value is None else f"{value:.1%}"
+
+
+def _format_lead(seconds: float | None) -> str:
+    return "n/a" if seconds is None else f"{seconds / 3600:.1f}h"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Replay the stored event history through the anomaly rule on a simulated clock."
+    )
+    parser.add_argument("--step", default="1h", help="clock step, e.g. 15m, 1h or 1d (default 1h)")
+    parser.add_argument("--start", help="first tick (ISO 8601, UTC); default: first event")
+    parser.add_argument("--end", help="last tick (ISO 8601, UTC); default: last event")
+    parser.add_argument("--rules", type=Path, help="alert rules file or directory (default: the find_anomalies rule)")
+    parser.add_argument("--incidents", type=Path, help="JSONL of labeled incidents to score against")
+    parser.add_argument("--max-lead", default=None, help="earliest an alert may precede an incident (default 24h)")
+    parser.add_argument("--grace", default=None, help="how long after an incident an alert still counts (default 1h)")
+    parser.add_argument("--db", type=Path, default=DB_PATH, help="feature store written by build_features")
+    parser.add_argument("--out", type=Path, default=REPORT_PATH, help="JSON report path")
+    parser.add_argument("--profile", metavar="STAGES", help="profile the backtest stage (see docs/CONFIG.md)")
+    args = parser.parse_args()
+
+    try:
+        profiling.init("backtest", stages=args.profile)
+        step = parse_duration(args.step)
+        max_lead = parse_duration(args.max_lead) if args.max_lead else DEFAULT_MAX_LEAD
+        grace = parse_duration(args.grace) if args.grace else DEFAULT_GRACE
+        start = parse_time(args.start) if args.start else None
+        end = parse_time(args.end) if args.end else None
+        incidents = read_incidents(args.incidents) if args.incidents else []
+        rule_set = RuleSet(load_rules(args.rules)) if args.rules else None
+    except (ImportError, OSError, ValueError) as exc:
+        print(str(exc), file=sys.stderr)
+        return 1
+    if not args.db.exists():
+        print(f"{args.db} not found; run scripts/build_features.py first.", file=sys.stderr)
+        return 1
+
+    conn = open_store(args.db)
+    try:
+        with profiling.profile("backtest"):
+            report = run_backtest(
+                conn,
+                step,
+                rule=rule_set.mask if rule_set is not None else default_rule,
+                start=start,
+                end=end,
+                incidents=incidents,
+                max_lead=max_lead,
+                grace=grace,
+            )
+    except ImportError:
+        print("numpy is required for backtests: pip install -r requirements-core.txt", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+
+    summary = report.to_dict()
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(summary, indent=2) + "\n", encoding="utf-8")
+    print(
+        f"{report.steps} steps x {report.groups} groups from {report.start.isoformat()} to "
+        f"{report.end.isoformat()} in {report.seconds.get('total', 0.0):.3f}s: "
+        f"{len(report.alerts)} alerts ({report.firing_steps} firing steps)"
+    )
+    if report.incidents:
+        print(
+            f"incidents {report.detected}/{report.incidents} detected, "
+            f"precision {_format_share(report.precision)}, recall {_format_share(report.recall)}, "
+            f"median lead {_format_lead(summary['lead_seconds']['median'])}"
+        )
+    print(f"report -> {args.out}")
+    emit_summary("backtest")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
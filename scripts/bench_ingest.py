@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT / "src"))
+
+from bench.fake_rpc import FakeChain, FakeRpcServer, chain_specs
+from bench.fake_rss import FeedSet, FakeRssServer
+from bench.fake_server import ServerBehavior, running
+from bench.harness import append_result, compare, environment, previous_result
+from bench.ingest import bench_onchain, bench_rss
+from ingest.onchain import DEFAULT_UNISWAP_V3_POOL, build_default_streams
+from ingest.rpc import Endpoint, RetryPolicy, RpcClient, connect
+
+RESULTS_PATH = REPO_ROOT / "benchmarks" / "results" / "ingest.jsonl"
+# Any address works against the fake chain; this one stands in for the Aave v3 pool.
+FAKE_AAVE_POOL = "0x87870Bca3F3fD6335C3F4ce8392D69350B4fA4E2"
+
+
+def _behavior(args: argparse.Namespace, max_results: int | None) -> ServerBehavior:
+    return ServerBehavior(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate_limit=args.rate_limit,
+        burst=args.burst,
+        failure_rate=args.failure_rate,
+        max_results=max_results,
+        seed=args.seed,
+    )
+
+
+def _report_line(report) -> str:
+    latency = " ".join(f"{key} {value}ms" for key, value in report.latency_ms.items())
+    failed = report.detail.get("failed_chunks")
+    errors = f"; {failed} failed chunks {report.detail['errors']}" if failed else ""
+    return (
+        f"[{report.stage}] {report.rows} events in {report.seconds:.3f}s "
+        f"({report.rows_per_second:,.0f}/s); {latency}{errors}"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Measure on-chain and RSS ingest throughput against local stand-in servers."
+    )
+    parser.add_argument("--blocks", type=int, default=2000, help="synthetic chain length")
+    parser.add_argument("--logs-per-block", type=float, default=2.0, help="mean logs per stream per block")
+    parser.add_argument("--chunk-blocks", type=int, default=10, help="blocks per eth_getLogs call")
+    parser.add_argument("--max-block-range", type=int, default=None, help="reject larger eth_getLogs ranges")
+    parser.add_argument("--max-logs", type=int, default=10000, help="eth_getLogs result cap")
+    parser.add_argument("--max-batch", type=int, default=None, help="largest accepted JSON-RPC batch")
+    parser.add_argument("--feed-items", type=int, default=200, help="items per synthetic RSS feed")
+    parser.add_argument("--max-items", type=int, default=None, help="truncate feeds to their newest N items")
+    parser.add_argument("--onchain-events", type=Path, nargs="*", help="replay recorded on-chain JSONL instead")
+    parser.add_argument("--rss-events", type=Path, nargs="*", help="replay recorded off-chain JSONL instead")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None, help="requests per second per server")
+    parser.add_argument("--burst", type=int, default=10)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--only", choices=("onchain", "rss"), help="run one side only")
+    parser.add_argument("--endpoints", type=int, default=1, help="RPC stand-ins serving the same chain")
+    parser.add_argument(
+        "--client",
+        choices=("pooled", "plain"),
+        default="pooled",
+        help="ingest.rpc client or a bare Web3.HTTPProvider against the first endpoint",
+    )
+    parser.add_argument("--client-rate", type=float, default=None, help="client-side requests/s per endpoint")
+    parser.add_argument("--client-attempts", type=int, default=5)
+    parser.add_argument("--hedge-ms", type=float, default=None, help="hedge requests slower than this")
+    parser.add_argument("--serve", action="store_true", help="keep the servers running for manual ingest runs")
+    parser.add_argument("--rpc-port", type=int, default=0)
+    parser.add_argument("--rss-port", type=int, default=0)
+    parser.add_argument("--save", action="store_true", help="append to benchmarks/results/ingest.jsonl")
+    args = parser.parse_args()
+
+    streams = build_default_streams(FAKE_AAVE_POOL, DEFAULT_UNISWAP_V3_POOL)
+    if args.onchain_events:
+        chain = FakeChain.from_events(args.onchain_events)
+    else:
+        chain = FakeChain.synthetic(chain_specs(streams, args.logs_per_block), 19_000_000, args.blocks, args.seed)
+    feed_set = FeedSet.from_paths(args.rss_events) if args.rss_events else FeedSet.synthetic(args.feed_items, args.seed)
+
+    rpcs = [
+        FakeRpcServer(
+            chain,
+            _behavior(args, args.max_logs),
+            max_block_range=args.max_block_range,
+            max_batch=args.max_batch,
+            port=args.rpc_port + index if args.rpc_port else 0,
+        )
+        for index in range(max(1, args.endpoints))
+    ]
+    rpc = rpcs[0]
+    rss = FakeRssServer(feed_set, _behavior(args, args.max_items), port=args.rss_port)
+    reports = []
+    client_stats: dict = {}
+    with ExitStack() as stack:
+        for server in rpcs:
+            stack.enter_context(running(server))
+        stack.enter_context(running(rss))
+        feeds = feed_set.rss_feeds(rss.url)
+        if args.serve:
+            custom = ",".join(f"{feed.url}|{feed.protocol}|{feed.kind}" for feed in feeds)
+            print(f"RPC_URLS={','.join(server.url for server in rpcs)}")
+            print(f"START_BLOCK={chain.first_block}")
+            print(f"END_BLOCK={chain.head}")
+            print(f"AAVE_V3_POOL_ADDRESS={FAKE_AAVE_POOL}")
+            print(f"RSS_FEEDS={custom}")
+            print("serving; Ctrl-C to stop", flush=True)
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                return 0
+        if args.only in (None, "onchain"):
+            if args.client == "plain":
+                from web3 import Web3
+
+                w3 = Web3(Web3.HTTPProvider(rpc.url))
+                client = None
+            else:
+                client = RpcClient(
+                    [
+                        Endpoint(name=f"fake{index}", url=server.url, rate=args.client_rate)
+                        for index, server in enumerate(rpcs)
+                    ],
+                    retry=RetryPolicy(max_attempts=args.client_attempts),
+                    hedge_after=args.hedge_ms / 1000.0 if args.hedge_ms else None,
+                    seed=args.seed,
+                )
+                w3 = connect(client)
+            reports.append(bench_onchain(w3, streams, chain.first_block, chain.head, args.chunk_blocks))
+            print(_report_line(reports[-1]), flush=True)
+            if client is not None:
+                client_stats = client.stats()
+                client.close()
+        if args.only in (None, "rss"):
+            reports.append(bench_rss(feeds))
+            print(_report_line(reports[-1]), flush=True)
+        servers = {f"rpc{index}": server.stats.snapshot() for index, server in enumerate(rpcs)}
+        servers["rss"] = rss.stats.snapshot()
+
+    record = {
+        "version": 1,
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "scale": "ingest",
+        "seed": args.seed,
+        "settings": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("serve", "save", "rpc_port", "rss_port", "onchain_events", "rss_events")
+        },
+        "environment": environment(REPO_ROOT),
+        "stages": {report.stage: vars(report) for report in reports},
+        "servers": servers,
+        "client": client_stats,
+    }
+    print(json.dumps({"servers": servers, "client": client_stats}, indent=2))
+    if args.save:
+        previous = previous_result(RESULTS_PATH, args.seed)
+        if previous is not None and previous.get("settings") == record["settings"]:
+            for change in compare(previous, record):
+                marker = "  REGRESSION" if change["regressed"] else ""
+                print(
+                    f"  {change['stage']:<8} {change['metric']:<12} {change['previous']} -> "
+                    f"{change['current']} ({change['change']:+.1%}){marker}"
+                )
+        append_result(RESULTS_PATH, record)
+        print(f"appended results to {RESULTS_PATH}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT / "src"))
+
+from ingest.segments import event_files
+from rag.index import (
+    RagConfig,
+    build_index,
+    embed_texts,
+    iter_documents,
+    query_index,
+    vector_store_path,
+)
+
+DATA_DIR = REPO_ROOT / "data"
+INGEST_DIR = DATA_DIR / "ingest"
+FIXTURES_DIR = DATA_DIR / "fixtures"
+
+# (label, backend, quantization)
+VARIANTS = [
+    ("chroma", "chroma", "none"),
+    ("numpy", "numpy", "none"),
+    ("numpy-int8", "numpy", "int8"),
+]
+
+
+def _gather_inputs() -> list[Path]:
+    paths = event_files(INGEST_DIR)
+    if not paths:
+        paths = event_files(FIXTURES_DIR)
+    return paths
+
+
+def _sample_queries(paths: list[Path], count: int, max_chars: int, seed: int) -> list[str]:
+    # Query with word windows taken from indexed chunks, like a user quoting a headline.
+    rng = random.Random(seed)
+    texts = [text for _, text, _ in iter_documents(paths, max_chars)]
+    queries = []
+    for _ in range(count):
+        words = rng.choice(texts).split()
+        start = rng.randrange(max(1, len(words) - 8))
+        queries.append(" ".join(words[start : start + 8]))
+    return queries
+
+
+def _exact_top_k(config: RagConfig, query_vectors: np.ndarray, top_k: int) -> list[list[str]]:
+    """Ground truth: exact cosine ranking over every indexed chunk."""
+    from rag.vector_store import NumpyVectorStore
+
+    store = NumpyVectorStore.open(vector_store_path(config), "none")
+    return [[hit.doc_id for hit in hits] for hits in store.search(query_vectors, top_k)]
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    return round(float(np.percentile(samples, q)), 3) if samples else 0.0
+
+
+def bench_variant(
+    config: RagConfig,
+    paths: list[Path],
+    queries: list[str],
+    truth: list[list[str]],
+    top_k: int,
+) -> dict:
+    started = time.perf_counter()
+    try:
+        build_index(config, paths)
+    except ImportError as exc:
+        return {"error": f"missing dependency: {exc.name or exc}"}
+    build_s = time.perf_counter() - started
+
+    query_index(config, queries[0], top_k=top_k, mode="dense")  # warm clients and caches
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        result = query_index(config, query, top_k=top_k, mode="dense")
+        latencies.append((time.perf_counter() - started) * 1000.0)
+        hits += len(set(result["ids"][0]) & set(expected))
+    report = {
+        "build_s": round(build_s, 3),
+        f"recall@{top_k}": round(hits / max(1, sum(len(expected) for expected in truth)), 4),
+        "p50_ms": _percentile(latencies, 50),
+        "p99_ms": _percentile(latencies, 99),
+    }
+    if config.backend == "numpy":
+        from rag.vector_store import open_store
+
+        store = open_store(vector_store_path(config), config.quantization)
+        vectors = np.asarray(embed_texts(config, queries))
+        started = time.perf_counter()
+        store.search(vectors, top_k)
+        report["batch_ms_per_query"] = round((time.perf_counter() - started) * 1000.0 / len(queries), 4)
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare RAG vector backends on recall and latency.")
+    parser.add_argument("inputs", nargs="*", type=Path, help="event JSONL files (default: data/ingest or fixtures)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--max-chars", type=int, default=1200)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument(
+        "--model",
+        default=os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"),
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=Path(os.getenv("RAG_EMBED_CACHE_DIR") or DATA_DIR / "embedding_cache"),
+        help="embedding cache shared by all variants so the model runs once per chunk",
+    )
+    parser.add_argument("--output", type=Path, help="also write the JSON report here")
+    args = parser.parse_args()
+
+    paths = args.inputs or _gather_inputs()
+    if not paths:
+        print("No input events found in data/ingest or data/fixtures.")
+        return 1
+    queries = _sample_queries(paths, args.queries, args.max_chars, args.seed)
+
+    with tempfile.TemporaryDirectory(prefix="rag-bench-") as tmp:
+        def _config(label: str, backend: str, quantization: str) -> RagConfig:
+            return RagConfig(
+                persist_dir=Path(tmp),
+                collection_name=f"bench_{label.replace('-', '_')}",
+                embedding_model=args.model,
+                max_chars=args.max_chars,
+                embedding_cache_dir=args.cache_dir,
+                backend=backend,
+                quantization=quantization,
+            )
+
+        configs = {label: _config(label, backend, quant) for label, backend, quant in VARIANTS}
+        exact = configs["numpy"]
+        build_index(exact, paths)
+        query_vectors = np.asarray(embed_texts(exact, queries))
+        truth = _exact_top_k(exact, query_vectors, args.top_k)
+
+        results = {}
+        for label, config in configs.items():
+            results[label] = bench_variant(config, paths, queries, truth, args.top_k)
+            summary = results[label]
+            if "error" in summary:
+                print(f"{label}: skipped ({summary['error']})")
+            else:
+                print(
+                    f"{label}: recall@{args.top_k} {summary[f'recall@{args.top_k}']} "
+                    f"p50 {summary['p50_ms']} ms p99 {summary['p99_ms']} ms"
+                )
+
+    report = {
+        "inputs": [str(path) for path in paths],
+        "queries": len(queries),
+        "top_k": args.top_k,
+        "model": args.model,
+        "results": results,
+    }
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
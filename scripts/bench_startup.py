@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+SRC_DIR = REPO_ROOT / "src"
+
+# Library modules are imported; scripts are executed without running main().
+ENTRY_POINTS = [
+    "api.app",
+    "features.store",
+    "ingest.rss",
+    "ingest.onchain",
+    "rag.index",
+    "scripts/build_features.py",
+    "scripts/build_rag_index.py",
+    "scripts/ingest_onchain.py",
+    "scripts/ingest_rss.py",
+    "scripts/query_rag.py",
+]
+
+# api.app cannot import faster than fastapi itself, so its budget covers only what it adds.
+BASELINE = "fastapi"
+DEFAULT_BUDGET_MS = 150.0
+
+_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {src!r})
+target = {target!r}
+if target.endswith(".py"):
+    import runpy
+    runpy.run_path(target, run_name="bench_startup")
+else:
+    import importlib
+    importlib.import_module(target)
+print(json.dumps({{"import_ms": (time.perf_counter() - started) * 1000.0}}))
+"""
+
+
+def _parse_importtime(stderr: str, top: int) -> list[dict]:
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:") :].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        # Nested imports are indented under their parent; keep top-level ones only.
+        name = parts[2][1:] if parts[2].startswith(" ") else parts[2]
+        if name.startswith(" "):
+            continue
+        modules.append({"module": name, "cumulative_ms": int(parts[1]) / 1000.0})
+    modules.sort(key=lambda item: item["cumulative_ms"], reverse=True)
+    return modules[:top]
+
+
+def _run_once(target: str, importtime: bool) -> tuple[dict, str]:
+    path = REPO_ROOT / target if target.endswith(".py") else None
+    code = _CHILD.format(src=str(SRC_DIR), target=str(path) if path else target)
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", code]
+    started = time.perf_counter()
+    proc = subprocess.run(cmd, capture_output=True, text=True, cwd=REPO_ROOT)
+    process_ms = (time.perf_counter() - started) * 1000.0
+    if proc.returncode != 0:
+        last = proc.stderr.strip().splitlines()[-1:] or ["unknown error"]
+        return {"error": last[0], "process_ms": process_ms}, proc.stderr
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process_ms"] = process_ms
+    return result, proc.stderr
+
+
+def bench(target: str, runs: int, top: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        result, _ = _run_once(target, importtime=False)
+        if "error" in result:
+            return {"entry_point": target, "error": result["error"]}
+        samples.append(result)
+    _, stderr = _run_once(target, importtime=True)
+    import_ms = [sample["import_ms"] for sample in samples]
+    process_ms = [sample["process_ms"] for sample in samples]
+    return {
+        "entry_point": target,
+        "runs": runs,
+        "import_ms_median": round(statistics.median(import_ms), 1),
+        "import_ms_min": round(min(import_ms), 1),
+        "process_ms_median": round(statistics.median(process_ms), 1),
+        "slowest_imports": _parse_importtime(stderr, top),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure cold import time per entry point.")
+    parser.add_argument("entry_points", nargs="*", default=ENTRY_POINTS)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="slowest top-level imports to list")
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=DEFAULT_BUDGET_MS,
+        help=f"import budget for api.app on top of a bare {BASELINE} import",
+    )
+    parser.add_argument("--output", type=Path, help="also write the JSON report here")
+    args = parser.parse_args()
+
+    results = [bench(target, args.runs, args.top) for target in args.entry_points]
+    for result in results:
+        if "error" in result:
+            print(f"{result['entry_point']}: failed ({result['error']})")
+            continue
+        print(
+            f"{result['entry_point']}: import {result['import_ms_median']} ms "
+            f"(process {result['process_ms_median']} ms)"
+        )
+
+    api = next((item for item in results if item["entry_point"] == "api.app"), None)
+    baseline = bench(BASELINE, args.runs, args.top) if api and "error" not in api else None
+    overhead = None
+    if baseline and "error" not in baseline:
+        # Fastest runs: scheduler noise only ever adds time, and both imports share it.
+        overhead = round(api["import_ms_min"] - baseline["import_ms_min"], 1)
+        print(f"api.app adds {overhead} ms over {BASELINE} ({baseline['import_ms_min']} ms, fastest runs)")
+
+    report = {"python": sys.version.split()[0], "results": results, "baseline": baseline}
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    else:
+        print(json.dumps(report, indent=2))
+
+    if overhead is not None and overhead > args.budget_ms:
+        print(f"api.app import exceeds budget: {overhead} ms over {BASELINE} > {args.budget_ms} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT / "src"))
+
+from bench.harness import (
+    STAGES,
+    BenchOptions,
+    StageReport,
+    append_result,
+    compare,
+    previous_result,
+    result_record,
+    run_stage,
+)
+from bench.synthetic import SCALES, SyntheticConfig, write_events
+
+BENCH_DIR = REPO_ROOT / "data" / "bench"
+RESULTS_DIR = REPO_ROOT / "benchmarks" / "results"
+
+
+def _events_path(scale: str, seed: int) -> Path:
+    return BENCH_DIR / f"events-{scale}-seed{seed}.jsonl"
+
+
+def _ensure_events(scale: str, seed: int) -> Path:
+    """Generated streams are cached; the same scale and seed always give the same file."""
+    path = _events_path(scale, seed)
+    if not path.exists():
+        started = time.perf_counter()
+        write_events(path, SCALES[scale], SyntheticConfig(seed=seed))
+        print(f"generated {SCALES[scale]} events in {time.perf_counter() - started:.1f}s -> {path}", flush=True)
+    return path
+
+
+def _report_line(report: StageReport) -> str:
+    if report.status != "ok":
+        return f"[{report.stage}] {report.status}: {report.reason}"
+    latency = " ".join(f"{key} {value}ms" for key, value in report.latency_ms.items())
+    return (
+        f"[{report.stage}] {report.rows} rows in {report.seconds:.3f}s "
+        f"({report.rows_per_second:,.0f}/s) peak RSS {report.peak_rss_mb:.0f} MB; {latency}"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark normalize, load, features, RAG build/query and API latency on synthetic events."
+    )
+    parser.add_argument("--scale", choices=sorted(SCALES), default="10k")
+    parser.add_argument("--stages", nargs="*", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--seed", type=int, default=SyntheticConfig.seed)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per batch stage (median is reported)")
+    parser.add_argument("--rag-events", type=int, default=20000, help="events sampled into the RAG build")
+    parser.add_argument("--rag-queries", type=int, default=100)
+    parser.add_argument("--api-requests", type=int, default=200, help="rounds over the API endpoints")
+    parser.add_argument(
+        "--model",
+        default=os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"),
+    )
+    parser.add_argument("--threshold", type=float, default=0.2, help="regression threshold (fraction)")
+    parser.add_argument("--no-save", action="store_true", help="do not append to benchmarks/results")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    events_path = _ensure_events(args.scale, args.seed)
+    options = BenchOptions(
+        events_path=events_path,
+        work_dir=BENCH_DIR / args.scale,
+        events=SCALES[args.scale],
+        repeat=args.repeat,
+        rag_events=args.rag_events,
+        rag_queries=args.rag_queries,
+        api_requests=args.api_requests,
+        embedding_model=args.model,
+    )
+    # Later stages read what earlier ones wrote, so run them in pipeline order.
+    reports = []
+    for stage in [stage for stage in STAGES if stage in args.stages]:
+        report = run_stage(stage, options)
+        reports.append(report)
+        print(_report_line(report), flush=True)
+
+    record = result_record(REPO_ROOT, args.scale, args.seed, options, reports)
+    results_path = RESULTS_DIR / f"{args.scale}.jsonl"
+    previous = previous_result(results_path, args.seed)
+    regressions = []
+    if previous is not None:
+        changes = compare(previous, record, args.threshold)
+        label = previous["environment"].get("describe", "previous")
+        for change in changes:
+            marker = "  REGRESSION" if change["regressed"] else ""
+            print(
+                f"  {change['stage']:<10} {change['metric']:<12} {change['previous']} -> "
+                f"{change['current']} ({change['change']:+.1%} vs {label}){marker}"
+            )
+        regressions = [change for change in changes if change["regressed"]]
+    if not args.no_save:
+        append_result(results_path, record)
+        print(f"appended results to {results_path}")
+    else:
+        print(json.dumps(record, indent=2))
+    failed = [report.stage for report in reports if report.status == "failed"]
+    return 1 if failed or (args.fail_on_regression and regressions) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,20 +2,33 @@
 from __future__ import annotations
 
 from pathlib import Path
+import os
 import sys
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(REPO_ROOT / "src"))
 
+from features.evidence import build_evidence, write_evidence
+from features.rules import AlertState, RuleSet, load_rules, write_alerts
+from features.snapshot import build_sections, publish_snapshot
 from features.store import (
+    StoreLimits,
+    append_changes,
     compute_features,
     find_anomalies,
     load_events,
     normalize_events,
     open_store,
+    read_feature_dicts,
     write_anomalies,
+    write_brief,
+    write_manifest,
     write_outputs,
 )
+from ingest.segments import event_files
+from normalize.batch import EventBatch
+from observability import profiling
+from observability.metrics import emit_summary
 
 DATA_DIR = REPO_ROOT / "data"
 INGEST_DIR = DATA_DIR / "ingest"
@@ -23,14 +36,65 @@ FIXTURES_DIR = DATA_DIR / "fixtures"
 FEATURES_DIR = DATA_DIR / "features"
 DB_PATH = DATA_DIR / "feature_store.duckdb"
 NORMALIZED_PATH = FEATURES_DIR / "_events_normalized.jsonl"
+SNAPSHOT_DIR = FEATURES_DIR / "snapshots"
+ALERT_STATE_PATH = FEATURES_DIR / "alert_state.json"
+
+
+def _load_env_file(path: Path) -> dict[str, str]:
+    values: dict[str, str] = {}
+    if not path.exists():
+        return values
+    for line in path.read_text(encoding="utf-8").splitlines():
+        text = line.strip()
+        if not text or text.startswith("#") or "=" not in text:
+            continue
+        key, value = text.split("=", 1)
+        values[key.strip()] = value.strip()
+    return values
+
+
+def _env_value(key: str, env_file: dict[str, str], default: str | None = None) -> str | None:
+    return os.getenv(key) or env_file.get(key, default)
+
+
+def _parse_int(value: str | None, name: str) -> int | None:
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except ValueError as exc:
+        raise ValueError(f"{name} must be an integer") from exc
+
+
+def _rag_config():
+    """RAG index to pull related documents from, or None when evidence should skip it."""
+    env_file = _load_env_file(Path(".env"))
+    if (_env_value("EVIDENCE_DOCUMENTS", env_file, "1") or "1").lower() in ("0", "false", "no"):
+        return None
+    persist_dir = Path(_env_value("CHROMA_PERSIST_DIR", env_file, "data/chroma"))
+    if not persist_dir.exists():
+        return None
+    from rag.index import RagConfig
+
+    cache_dir = _env_value("RAG_EMBED_CACHE_DIR", env_file, "data/embedding_cache")
+    return RagConfig(
+        persist_dir=persist_dir,
+        collection_name=_env_value("CHROMA_COLLECTION", env_file, "defi_sentinel"),
+        embedding_model=_env_value(
+            "EMBEDDING_MODEL",
+            env_file,
+            "sentence-transformers/all-MiniLM-L6-v2",
+        ),
+        embedding_cache_dir=Path(cache_dir) if cache_dir else None,
+        backend=_env_value("RAG_BACKEND", env_file, "chroma") or "chroma",
+        quantization=_env_value("RAG_QUANTIZATION", env_file, "none") or "none",
+    )
 
 
 def _gather_inputs() -> list[Path]:
     paths: list[Path] = []
-    if INGEST_DIR.exists():
-        paths.extend(sorted(INGEST_DIR.glob("*.jsonl")))
-    if FIXTURES_DIR.exists():
-        paths.extend(sorted(FIXTURES_DIR.glob("*.jsonl")))
+    paths.extend(event_files(INGEST_DIR))
+    paths.extend(event_files(FIXTURES_DIR))
     return paths
 
 
@@ -40,22 +104,68 @@ def main() -> int:
         print("No input events found in data/ingest or data/fixtures.")
         return 1
 
-    conn = open_store(DB_PATH)
+    env_file = _load_env_file(Path(".env"))
+    try:
+        profiling.init("build_features", lambda key: _env_value(key, env_file))
+        threads = _parse_int(_env_value("FEATURE_THREADS", env_file), "FEATURE_THREADS")
+        rules_path = _env_value("ALERT_RULES", env_file)
+        rule_set = RuleSet(load_rules(Path(rules_path))) if rules_path else None
+    except (ImportError, OSError, ValueError) as exc:
+        print(str(exc), file=sys.stderr)
+        return 1
+    memory_limit = _env_value("FEATURE_MEMORY_LIMIT", env_file)
+    temp_dir = _env_value("FEATURE_TEMP_DIR", env_file)
+    limits = StoreLimits(
+        threads=threads,
+        memory_limit=memory_limit,
+        temp_dir=Path(temp_dir) if temp_dir else None,
+    )
+
+    conn = open_store(DB_PATH, limits)
     try:
-        normalize_events(inputs, NORMALIZED_PATH)
-        load_events(conn, [NORMALIZED_PATH])
-        features = compute_features(conn)
+        with profiling.profile("normalize"):
+            normalize_events(inputs, NORMALIZED_PATH)
+        with profiling.profile("load"):
+            load_events(conn, [NORMALIZED_PATH])
+        with profiling.profile("compute"):
+            features = compute_features(conn)
         if not features:
             print("No events to compute features.")
             return 1
-        write_outputs(conn, features, FEATURES_DIR)
-        anomalies = find_anomalies(features)
-        write_anomalies(anomalies, FEATURES_DIR)
+        with profiling.profile("write"):
+            previous_features = read_feature_dicts(FEATURES_DIR / "feature_snapshot.jsonl")
+            previous_anomalies = read_feature_dicts(FEATURES_DIR / "anomalies.jsonl")
+            write_outputs(conn, features, FEATURES_DIR)
+            outputs = [FEATURES_DIR / "feature_snapshot.jsonl"]
+            if rule_set is None:
+                anomalies = find_anomalies(features)
+            else:
+                state = AlertState.load(ALERT_STATE_PATH)
+                alerts, anomalies = rule_set.evaluate_rows(features, state)
+                state.save(ALERT_STATE_PATH, features[0].as_of, rule_set.longest_cooldown)
+                outputs.append(write_alerts(alerts, features, FEATURES_DIR))
+                print(f"{len(alerts)} alerts from {len(rule_set)} rules")
+            anomalies_path = write_anomalies(anomalies, FEATURES_DIR)
+            evidence = build_evidence(conn, anomalies, _rag_config())
+            evidence_path = write_evidence(evidence, FEATURES_DIR)
+            brief_path = write_brief(anomalies, FEATURES_DIR, evidence)
+            write_manifest(
+                FEATURES_DIR,
+                [*outputs, anomalies_path, evidence_path, brief_path],
+                features[0].as_of,
+            )
+            append_changes(previous_features, previous_anomalies, features, anomalies, FEATURES_DIR)
+            # The files /events serves: ingest output, or the fixtures when there is none.
+            events = EventBatch.from_jsonl(event_files(INGEST_DIR) or event_files(FIXTURES_DIR))
+            publish_snapshot(
+                SNAPSHOT_DIR, build_sections(features, anomalies, evidence, events)
+            )
         print(
             f"wrote {len(features)} feature rows and {len(anomalies)} anomalies to {FEATURES_DIR}"
         )
     finally:
         conn.close()
+    emit_summary("build_features")
     return 0
 
 
@@ -8,7 +8,10 @@ from pathlib import Path
 REPO_ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(REPO_ROOT / "src"))
 
+from ingest.segments import event_files
 from rag.index import RagConfig, build_index
+from observability import profiling
+from observability.metrics import emit_summary
 
 DATA_DIR = REPO_ROOT / "data"
 INGEST_DIR = DATA_DIR / "ingest"
@@ -43,17 +46,20 @@ def _parse_int(value: str | None, default: int) -> int:
 
 def _gather_inputs() -> list[Path]:
     paths: list[Path] = []
-    if INGEST_DIR.exists():
-        paths.extend(sorted(INGEST_DIR.glob("*.jsonl")))
+    paths.extend(event_files(INGEST_DIR))
     if paths:
         return paths
-    if FIXTURES_DIR.exists():
-        paths.extend(sorted(FIXTURES_DIR.glob("*.jsonl")))
+    paths.extend(event_files(FIXTURES_DIR))
     return paths
 
 
 def main() -> int:
     env_file = _load_env_file(Path(".env"))
+    try:
+        profiling.init("build_rag_index", lambda key: _env_value(key, env_file))
+    except ValueError as exc:
+        print(str(exc), file=sys.stderr)
+        return 1
     persist_dir = Path(_env_value("CHROMA_PERSIST_DIR", env_file, "data/chroma"))
     collection = _env_value("CHROMA_COLLECTION", env_file, "defi_sentinel")
     model = _env_value(
@@ -63,6 +69,13 @@ def main() -> int:
     )
     max_chars = _parse_int(_env_value("RAG_MAX_CHARS", env_file), 1200)
     batch_size = _parse_int(_env_value("RAG_BATCH_SIZE", env_file), 128)
+    parse_workers = _parse_int(_env_value("RAG_PARSE_WORKERS", env_file), 0)
+    embed_workers = _parse_int(_env_value("RAG_EMBED_WORKERS", env_file), 0)
+    embed_batch_size = _parse_int(_env_value("RAG_EMBED_BATCH_SIZE", env_file), 256)
+    cache_dir = _env_value("RAG_EMBED_CACHE_DIR", env_file, "data/embedding_cache")
+    backend = _env_value("RAG_BACKEND", env_file, "chroma")
+    quantization = _env_value("RAG_QUANTIZATION", env_file, "none")
+    cache_dtype = _env_value("RAG_EMBED_CACHE_DTYPE", env_file, "float32")
 
     inputs = _gather_inputs()
     if not inputs:
@@ -75,10 +88,19 @@ def main() -> int:
         embedding_model=model,
         max_chars=max_chars,
         batch_size=batch_size,
+        parse_workers=parse_workers,
+        embed_workers=embed_workers,
+        embed_batch_size=embed_batch_size,
+        embedding_cache_dir=Path(cache_dir) if cache_dir else None,
+        embedding_cache_dtype=cache_dtype or "float32",
+        backend=backend or "chroma",
+        quantization=quantization or "none",
     )
 
-    total = build_index(config, inputs)
+    with profiling.profile("index"):
+        total = build_index(config, inputs)
     print(f"indexed {total} chunks into {persist_dir} ({collection})")
+    emit_summary("build_rag_index")
     return 0
 
 
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT / "src"))
+
+from bench.synthetic import SCALES, SyntheticConfig, write_events
+
+
+def _parse_count(value: str) -> int:
+    if value.lower() in SCALES:
+        return SCALES[value.lower()]
+    return int(value.replace("_", ""))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Write a deterministic synthetic event stream (schema-valid JSONL)."
+    )
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--count", type=_parse_count, default=SCALES["10k"], help="events, or 10k/1m/10m")
+    parser.add_argument("--seed", type=int, default=SyntheticConfig.seed)
+    parser.add_argument("--days", type=float, default=SyntheticConfig.duration.days, help="time span")
+    parser.add_argument("--onchain-share", type=float, default=SyntheticConfig.onchain_share)
+    parser.add_argument("--late-share", type=float, default=SyntheticConfig.late_share)
+    parser.add_argument("--duplicate-share", type=float, default=SyntheticConfig.duplicate_share)
+    args = parser.parse_args()
+
+    config = SyntheticConfig(
+        seed=args.seed,
+        duration=timedelta(days=args.days),
+        onchain_share=args.onchain_share,
+        late_share=args.late_share,
+        duplicate_share=args.duplicate_share,
+    )
+    started = time.perf_counter()
+    counts = write_events(args.output, args.count, config)
+    elapsed = time.perf_counter() - started
+    summary = ", ".join(f"{source}={count}" for source, count in sorted(counts.items()))
+    print(f"wrote {args.count} events ({summary}) to {args.output} in {elapsed:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,17 +1,18 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
-import json
 import os
 import sys
 from pathlib import Path
 
-from web3 import Web3
-
 REPO_ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(REPO_ROOT / "src"))
 
-from ingest.onchain import DEFAULT_UNISWAP_V3_POOL, build_default_streams, fetch_stream_events
+from ingest.chains import chain_configs
+from ingest.segments import DEFAULT_SEGMENT_EVENTS
+from ingest.supervisor import migrate_legacy, run_chains
+from observability import profiling
+from observability.metrics import emit_summary
 
 
 def _load_env_file(path: Path) -> dict[str, str]:
@@ -40,69 +41,68 @@ def _parse_int(value: str | None, name: str) -> int | None:
         raise ValueError(f"{name} must be an integer") from exc
 
 
-def main() -> int:
-    env_file = _load_env_file(Path(".env"))
-    rpc_url = _env_value("ALCHEMY_RPC_URL", env_file)
-    if not rpc_url:
-        api_key = _env_value("ALCHEMY_API_KEY", env_file)
-        if not api_key:
-            print("ALCHEMY_API_KEY is required", file=sys.stderr)
-            return 1
-        rpc_url = f"https://eth-mainnet.g.alchemy.com/v2/{api_key}"
-
-    w3 = Web3(Web3.HTTPProvider(rpc_url))
-    if not w3.is_connected():
-        print("RPC connection failed", file=sys.stderr)
-        return 1
-
-    start_block = _parse_int(_env_value("START_BLOCK", env_file), "START_BLOCK")
-    end_block = _parse_int(_env_value("END_BLOCK", env_file), "END_BLOCK")
-    lookback = _parse_int(_env_value("ONCHAIN_LOOKBACK_BLOCKS", env_file, "10"), "ONCHAIN_LOOKBACK_BLOCKS")
-    if lookback is None:
-        lookback = 10
-    if lookback < 1:
-        print("ONCHAIN_LOOKBACK_BLOCKS must be >= 1", file=sys.stderr)
-        return 1
-
-    latest_block = w3.eth.block_number
-    if end_block is None:
-        end_block = latest_block
-    if start_block is None:
-        start_block = max(0, end_block - (lookback - 1))
+def _parse_float(value: str | None, name: str) -> float | None:
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError as exc:
+        raise ValueError(f"{name} must be a number") from exc
 
-    if start_block > end_block:
-        print("START_BLOCK must be <= END_BLOCK", file=sys.stderr)
-        return 1
 
-    aave_pool = _env_value("AAVE_V3_POOL_ADDRESS", env_file)
-    uniswap_pool = _env_value("UNISWAP_V3_WETH_USDC_POOL", env_file, DEFAULT_UNISWAP_V3_POOL)
-    streams = build_default_streams(aave_pool, uniswap_pool)
-    if not streams:
-        print("No on-chain streams configured.", file=sys.stderr)
+def main() -> int:
+    env_file = _load_env_file(Path(".env"))
+    try:
+        profiling.init("ingest_onchain", lambda key: _env_value(key, env_file))
+        configs = chain_configs(lambda key: _env_value(key, env_file))
+        workers = _parse_int(_env_value("ONCHAIN_WORKERS", env_file), "ONCHAIN_WORKERS")
+        timeout = _parse_float(_env_value("ONCHAIN_WORKER_TIMEOUT", env_file), "ONCHAIN_WORKER_TIMEOUT")
+        segment_events = (
+            _parse_int(_env_value("INGEST_SEGMENT_EVENTS", env_file), "INGEST_SEGMENT_EVENTS")
+            or DEFAULT_SEGMENT_EVENTS
+        )
+    except ValueError as exc:
+        print(str(exc), file=sys.stderr)
         return 1
-
-    events = []
-    seen = set()
-    for stream in streams:
-        for event in fetch_stream_events(w3, stream, start_block, end_block):
-            if event.event_id in seen:
-                continue
-            seen.add(event.event_id)
-            events.append(event)
+    for config in configs:
+        if not config.rpc_urls:
+            required = "ALCHEMY_API_KEY (or RPC_URLS)" if config.name == "ethereum" else f"{config.name.upper()}_RPC_URLS"
+            print(f"{required} is required", file=sys.stderr)
+            return 1
+        if not (config.aave_pool or config.uniswap_pool):
+            print(f"No on-chain streams configured for {config.name}.", file=sys.stderr)
+            return 1
 
     output_dir = Path("data") / "ingest"
-    output_dir.mkdir(parents=True, exist_ok=True)
-    output_path = output_dir / "onchain_events.jsonl"
-
-    with output_path.open("w", encoding="utf-8") as handle:
-        for event in events:
-            handle.write(json.dumps(event.model_dump(mode="json")) + "\n")
-
-    print(
-        f"wrote {len(events)} events to {output_path} "
-        f"(blocks {start_block}-{end_block})"
-    )
-    return 0
+    # Single-chain output from older runs would otherwise be read alongside the partitions.
+    migrated = migrate_legacy(output_dir)
+    if migrated:
+        print(f"moved {migrated} events from onchain_events.jsonl(.gz) into data/ingest/onchain/ethereum")
+    results, cursors = run_chains(configs, output_dir, workers, timeout, segment_events)
+
+    failed = 0
+    for result in results:
+        blocks = f"blocks {result.from_block}-{result.to_block}" if result.from_block >= 0 else "head lookup"
+        if result.status == "ok":
+            print(
+                f"[{result.chain}#{result.index}] wrote {result.events} events in {result.segments} segments "
+                f"({blocks}, {result.seconds:.1f}s)"
+            )
+        else:
+            failed += 1
+            print(f"[{result.chain}#{result.index}] {result.status}: {result.error} ({blocks})", file=sys.stderr)
+        for name, stats in result.rpc.items():
+            print(
+                f"[{result.chain}#{result.index}] rpc {name}: {stats['requests']} requests, "
+                f"errors {stats['errors']}, latency {stats['latency_ms']}"
+            )
+    for chain, next_block in cursors.items():
+        if next_block is not None:
+            print(f"[{chain}] cursor at block {next_block}")
+    if not results:
+        print("nothing to ingest: every chain is up to date")
+    emit_summary("ingest_onchain")
+    return 1 if results and failed == len(results) else 0
 
 
 if __name__ == "__main__":
@@ -1,14 +1,49 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
-import json
+import os
 import sys
 from pathlib import Path
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(REPO_ROOT / "src"))
 
-from ingest.rss import DEFAULT_FEEDS, RssFeed, fetch_all
+from ingest.neardup import DEFAULT_THRESHOLD, NearDuplicateIndex
+from ingest.rss import DEFAULT_FEEDS, RssFeed, iter_all
+from ingest.segments import SegmentWriter
+from observability import profiling
+from observability.metrics import emit_summary
+
+NEARDUP_DIR = Path("data") / "ingest" / "rss_neardup"
+
+
+def _load_env_file(path: Path) -> dict[str, str]:
+    values: dict[str, str] = {}
+    if not path.exists():
+        return values
+    for line in path.read_text(encoding="utf-8").splitlines():
+        text = line.strip()
+        if not text or text.startswith("#") or "=" not in text:
+            continue
+        key, value = text.split("=", 1)
+        values[key.strip()] = value.strip()
+    return values
+
+
+def _env_value(key: str, env_file: dict[str, str], default: str | None = None) -> str | None:
+    return os.getenv(key) or env_file.get(key, default)
+
+
+def _parse_threshold(value: str | None) -> float:
+    if value is None or value == "":
+        return DEFAULT_THRESHOLD
+    try:
+        threshold = float(value)
+    except ValueError as exc:
+        raise ValueError("RSS_NEARDUP_THRESHOLD must be a number") from exc
+    if not 0.0 <= threshold <= 1.0:
+        raise ValueError("RSS_NEARDUP_THRESHOLD must be between 0 and 1")
+    return threshold
 
 
 def _parse_custom_feeds(raw: str | None) -> list[RssFeed]:
@@ -27,32 +62,30 @@ def _parse_custom_feeds(raw: str | None) -> list[RssFeed]:
 
 
 def main() -> int:
-    env = Path(".env")
-    if env.exists():
-        for line in env.read_text(encoding="utf-8").splitlines():
-            if line.strip().startswith("#") or "=" not in line:
-                continue
-            key, value = line.split("=", 1)
-            if key.strip() == "RSS_FEEDS":
-                custom = _parse_custom_feeds(value.strip())
-                feeds = custom if custom else DEFAULT_FEEDS
-                break
-        else:
-            feeds = DEFAULT_FEEDS
-    else:
-        feeds = DEFAULT_FEEDS
-
-    events = fetch_all(feeds)
-    output_dir = Path("data") / "ingest"
-    output_dir.mkdir(parents=True, exist_ok=True)
-    output_path = output_dir / "rss_events.jsonl"
+    env_file = _load_env_file(Path(".env"))
+    try:
+        feeds = _parse_custom_feeds(_env_value("RSS_FEEDS", env_file)) or DEFAULT_FEEDS
+        threshold = _parse_threshold(_env_value("RSS_NEARDUP_THRESHOLD", env_file))
+        profiling.init("ingest_rss", lambda key: _env_value(key, env_file))
+    except ValueError as exc:
+        print(str(exc), file=sys.stderr)
+        return 1
 
-    with output_path.open("w", encoding="utf-8") as handle:
-        for event in events:
-            payload = event.model_dump(mode="json")
-            handle.write(json.dumps(payload) + "\n")
+    output_dir = Path("data") / "ingest"
+    output_path = output_dir / "rss_events.jsonl.gz"
+    index = NearDuplicateIndex(NEARDUP_DIR, threshold) if threshold > 0 else None
+    with profiling.profile("ingest"), SegmentWriter(output_path) as writer:
+        events = iter_all(feeds)
+        writer.write_all(events if index is None else index.mark(events))
+    # Saved only once the events are written, so a failed run is classified again.
+    if index is not None:
+        index.save()
+    # An uncompressed file from an older run would be read alongside the new one.
+    (output_dir / "rss_events.jsonl").unlink(missing_ok=True)
 
-    print(f"wrote {len(events)} events to {output_path}")
+    duplicates = index.duplicates if index is not None else 0
+    print(f"wrote {writer.count} events to {output_path} ({duplicates} near-duplicates)")
+    emit_summary("ingest_rss")
     return 0
 
 
@@ -44,10 +44,17 @@ def main() -> int:
         "sentence-transformers/all-MiniLM-L6-v2",
     )
 
+    cache_dir = _env_value("RAG_EMBED_CACHE_DIR", env_file, "data/embedding_cache")
+    backend = _env_value("RAG_BACKEND", env_file, "chroma")
+    quantization = _env_value("RAG_QUANTIZATION", env_file, "none")
+
     config = RagConfig(
         persist_dir=persist_dir,
         collection_name=collection,
         embedding_model=model,
+        embedding_cache_dir=Path(cache_dir) if cache_dir else None,
+        backend=backend or "chroma",
+        quantization=quantization or "none",
     )
     results = query_index(config, query, top_k=5)
     print(json.dumps(results, indent=2))
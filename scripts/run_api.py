@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
+import os
 import sys
 from pathlib import Path
 
@@ -11,7 +12,8 @@ sys.path.insert(0, str(REPO_ROOT / "src"))
 
 
 def main() -> int:
-    uvicorn.run("api.app:app", host="0.0.0.0", port=8000)
+    workers = int(os.getenv("API_WORKERS", "1"))
+    uvicorn.run("api.app:app", host="0.0.0.0", port=8000, workers=workers)
     return 0
 
 
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import os
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT / "src"))
+
+from observability.metrics import emit_summary
+from pipeline.dag import Stage, StageResult, python_command, run_pipeline
+
+STATE_PATH = REPO_ROOT / "data" / "pipeline_state.json"
+EVENT_INPUTS = (
+    "data/ingest/*.jsonl",
+    "data/ingest/*.jsonl.gz",
+    "data/ingest/onchain/*/*.jsonl.gz",
+    "data/fixtures/*.jsonl",
+)
+
+
+def _load_env_file(path: Path) -> dict[str, str]:
+    values: dict[str, str] = {}
+    if not path.exists():
+        return values
+    for line in path.read_text(encoding="utf-8").splitlines():
+        text = line.strip()
+        if not text or text.startswith("#") or "=" not in text:
+            continue
+        key, value = text.split("=", 1)
+        values[key.strip()] = value.strip()
+    return values
+
+
+def _env_value(key: str, env_file: dict[str, str], default: str | None = None) -> str | None:
+    return os.getenv(key) or env_file.get(key, default)
+
+
+def _parse_float(value: str | None, default: float) -> float:
+    if value is None or value == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
+
+
+def build_stages(env_file: dict[str, str]) -> list[Stage]:
+    ingest_max_age = _parse_float(_env_value("PIPELINE_INGEST_MAX_AGE", env_file), 300.0)
+    persist_dir = _env_value("CHROMA_PERSIST_DIR", env_file, "data/chroma")
+    collection = _env_value("CHROMA_COLLECTION", env_file, "defi_sentinel")
+    alert_rules = _env_value("ALERT_RULES", env_file)
+    # A rules file or directory under the repo; editing it re-runs the feature build.
+    rule_inputs = (alert_rules, f"{alert_rules}/*.json") if alert_rules and not Path(alert_rules).is_absolute() else ()
+    evidence = (_env_value("EVIDENCE_DOCUMENTS", env_file, "1") or "1").lower() not in ("0", "false", "no")
+    manifest = f"{persist_dir}/{collection}.manifest.json"
+    # Evidence reads the RAG index, so the feature build waits for it and re-runs when it changes.
+    index_inputs = (manifest,) if evidence and not Path(manifest).is_absolute() else ()
+    index_deps = ("build_rag_index",) if evidence else ()
+    return [
+        Stage(
+            name="ingest_rss",
+            command=python_command("scripts/ingest_rss.py"),
+            outputs=("data/ingest/rss_events.jsonl.gz",),
+            code=("scripts/ingest_rss.py", "src/ingest/*.py", "src/normalize/*.py", ".env"),
+            env=("RSS_FEEDS", "RSS_NEARDUP_THRESHOLD"),
+            max_age_seconds=ingest_max_age,
+            optional=True,
+        ),
+        Stage(
+            name="ingest_onchain",
+            command=python_command("scripts/ingest_onchain.py"),
+            outputs=("data/ingest/onchain/*/cursor.json",),
+            code=("scripts/ingest_onchain.py", "src/ingest/*.py", "src/normalize/*.py", ".env"),
+            env=(
+                "ALCHEMY_RPC_URL",
+                "ALCHEMY_API_KEY",
+                "RPC_URLS",
+                "START_BLOCK",
+                "END_BLOCK",
+                "ONCHAIN_LOOKBACK_BLOCKS",
+                "ONCHAIN_CHAINS",
+                "ONCHAIN_CHUNK_BLOCKS",
+                "ONCHAIN_SHARDS",
+                "ONCHAIN_WORKERS",
+            ),
+            max_age_seconds=ingest_max_age,
+            optional=True,
+        ),
+        Stage(
+            name="build_rag_index",
+            command=python_command("scripts/build_rag_index.py"),
+            inputs=EVENT_INPUTS,
+            outputs=(manifest,),
+            code=("scripts/build_rag_index.py", "src/rag/*.py", ".env"),
+            env=(
+                "CHROMA_PERSIST_DIR",
+                "CHROMA_COLLECTION",
+                "EMBEDDING_MODEL",
+                "RAG_MAX_CHARS",
+                "RAG_BACKEND",
+                "RAG_QUANTIZATION",
+            ),
+            depends_on=("ingest_rss", "ingest_onchain"),
+            optional=True,
+        ),
+        Stage(
+            name="build_features",
+            command=python_command("scripts/build_features.py"),
+            inputs=(*EVENT_INPUTS, *rule_inputs, *index_inputs),
+            outputs=(
+                "data/features/feature_snapshot.jsonl",
+                "data/features/anomalies.jsonl",
+                "data/features/brief.json",
+            ),
+            code=("scripts/build_features.py", "src/features/*.py", "src/normalize/*.py"),
+            env=(
+                "EVIDENCE_DOCUMENTS",
+                "FEATURE_MEMORY_LIMIT",
+                "FEATURE_THREADS",
+                "FEATURE_TEMP_DIR",
+                "ALERT_RULES",
+            ),
+            depends_on=("ingest_rss", "ingest_onchain", *index_deps),
+        ),
+    ]
+
+
+def _report(result: StageResult, verbose: bool) -> None:
+    detail = f" ({result.reason})" if result.reason else ""
+    timing = f" in {result.seconds:.2f}s" if result.status in ("ran", "failed") else ""
+    print(f"[{result.name}] {result.status}{timing}{detail}", flush=True)
+    if result.output and (verbose or result.status == "failed"):
+        for line in result.output.rstrip().splitlines():
+            print(f"[{result.name}]   {line}", flush=True)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Run ingest, feature and index stages as a DAG, skipping unchanged stages."
+    )
+    parser.add_argument("stages", nargs="*", help="only run these stages (and skip the rest)")
+    parser.add_argument("--force", action="append", default=[], help="run this stage even if unchanged")
+    parser.add_argument("--force-all", action="store_true")
+    parser.add_argument("--jobs", type=int, default=4, help="stages to run at once")
+    parser.add_argument("--dry-run", action="store_true", help="report what would run")
+    parser.add_argument("--verbose", action="store_true", help="print each stage's output")
+    parser.add_argument(
+        "--profile",
+        metavar="STAGES",
+        help="profile these script stages (comma list or 'all') in every stage that runs",
+    )
+    args = parser.parse_args()
+    if args.profile:
+        # Stage scripts inherit the environment; PROFILE_* is not part of any fingerprint.
+        os.environ["PROFILE_STAGES"] = args.profile
+
+    env_file = _load_env_file(REPO_ROOT / ".env")
+    stages = build_stages(env_file)
+    names = [stage.name for stage in stages]
+    unknown = [name for name in [*args.stages, *args.force] if name not in names]
+    if unknown:
+        print(f"unknown stage(s): {', '.join(unknown)}; expected {', '.join(names)}", file=sys.stderr)
+        return 2
+    if args.stages:
+        # Dependencies outside the selection count as already satisfied.
+        selected = set(args.stages)
+        stages = [
+            dataclasses.replace(
+                stage, depends_on=tuple(dep for dep in stage.depends_on if dep in selected)
+            )
+            for stage in stages
+            if stage.name in selected
+        ]
+
+    started = time.perf_counter()
+    results = run_pipeline(
+        REPO_ROOT,
+        stages,
+        STATE_PATH,
+        env={**env_file, **os.environ},
+        jobs=args.jobs,
+        force=names if args.force_all else args.force,
+        dry_run=args.dry_run,
+        on_result=lambda result: _report(result, args.verbose),
+    )
+    elapsed = time.perf_counter() - started
+    ran = sum(1 for result in results if result.status == "ran")
+    print(f"pipeline finished in {elapsed:.2f}s ({ran} of {len(results)} stages ran)")
+    emit_summary("run_pipeline")
+    optional = {stage.name for stage in stages if stage.optional}
+    failed = [
+        result.name
+        for result in results
+        if result.status in ("failed", "blocked") and result.name not in optional
+    ]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -10,20 +10,19 @@ FIXTURES_DIR = REPO_ROOT / "data" / "fixtures"
 
 sys.path.insert(0, str(REPO_ROOT / "src"))
 
+from ingest.segments import event_files, iter_lines
 from normalize.schema import Event
 
 
 def _iter_paths(args: list[str]) -> list[Path]:
     if not args:
-        if not FIXTURES_DIR.exists():
-            return []
-        return sorted(FIXTURES_DIR.glob("*.jsonl"))
+        return event_files(FIXTURES_DIR)
 
     paths: list[Path] = []
     for raw in args:
         path = Path(raw)
         if path.is_dir():
-            paths.extend(sorted(path.glob("*.jsonl")))
+            paths.extend(event_files(path))
         else:
             paths.append(path)
     return paths
@@ -32,23 +31,22 @@ def _iter_paths(args: list[str]) -> list[Path]:
 def _validate_file(path: Path) -> tuple[int, int]:
     errors = 0
     total = 0
-    with path.open("r", encoding="utf-8") as handle:
-        for line_no, line in enumerate(handle, start=1):
-            text = line.strip()
-            if not text:
-                continue
-            total += 1
-            try:
-                payload = json.loads(text)
-            except json.JSONDecodeError as exc:
-                print(f"{path.name}:{line_no} json error: {exc}")
-                errors += 1
-                continue
-            try:
-                Event.model_validate(payload)
-            except Exception as exc:
-                print(f"{path.name}:{line_no} schema error: {exc}")
-                errors += 1
+    for line_no, line in enumerate(iter_lines(path), start=1):
+        text = line.strip()
+        if not text:
+            continue
+        total += 1
+        try:
+            payload = json.loads(text)
+        except json.JSONDecodeError as exc:
+            print(f"{path.name}:{line_no} json error: {exc}")
+            errors += 1
+            continue
+        try:
+            Event.model_validate(payload)
+        except Exception as exc:
+            print(f"{path.name}:{line_no} schema error: {exc}")
+            errors += 1
     return total, errors
 
 
@@ -1,13 +1,28 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 
-from rag.index import RagConfig, query_index
+from api.stream import ChangeHub, Subscription, event_stream
+from features.snapshot import Snapshot, SnapshotReader
+from features.store import CHANGES_NAME, build_brief
+from ingest.segments import event_files
+from observability import profiling
+from observability.metrics import REGISTRY, counter, histogram
+
+if TYPE_CHECKING:
+    from normalize.batch import EventBatch
 
 REPO_ROOT = Path(__file__).resolve().parents[2]
 DATA_DIR = REPO_ROOT / "data"
@@ -15,27 +30,153 @@ INGEST_DIR = DATA_DIR / "ingest"
 FIXTURES_DIR = DATA_DIR / "fixtures"
 FEATURES_DIR = DATA_DIR / "features"
 
+CACHE_CONTROL = "public, max-age=5, must-revalidate"
+RAG_UNAVAILABLE = "RAG extras are not installed (pip install -r requirements-rag.txt)"
+RAG_MODE_PATTERN = "^(hybrid|dense|lexical)$"
+RAG_BATCH_LIMIT = 100
+
+REQUESTS = counter("sentinel_api_requests_total", "API requests served", ("endpoint", "status"))
+REQUEST_LATENCY = histogram(
+    "sentinel_api_request_seconds", "API request latency until response headers", ("endpoint",)
+)
+
+SNAPSHOT_DIR = FEATURES_DIR / "snapshots"
+
 app = FastAPI(title="DeFi Sentinel API", version="0.1")
+snapshots = SnapshotReader(SNAPSHOT_DIR, poll_seconds=float(os.getenv("SNAPSHOT_POLL_SECONDS", "1.0")))
+change_hub = ChangeHub(FEATURES_DIR / CHANGES_NAME)
 
 
 def _iter_event_files() -> List[Path]:
-    ingest_files = sorted(INGEST_DIR.glob("*.jsonl")) if INGEST_DIR.exists() else []
+    ingest_files = event_files(INGEST_DIR)
     if ingest_files:
         return ingest_files
-    return sorted(FIXTURES_DIR.glob("*.jsonl")) if FIXTURES_DIR.exists() else []
-
-
-def _load_jsonl(path: Path) -> List[dict]:
+    return event_files(FIXTURES_DIR)
+
+
+_event_batches: Dict[Path, Tuple[Tuple[int, int], EventBatch]] = {}
+_event_batches_lock = threading.Lock()
+
+
+def _event_batch(path: Path) -> EventBatch:
+    """Columnar copy of an event file, re-read only when (mtime, size) changes."""
+    stat = path.stat()
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _event_batches.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    with _event_batches_lock:
+        cached = _event_batches.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        from normalize.batch import EventBatch  # pydantic schema; loaded on the first /events call
+
+        batch = EventBatch.from_jsonl([path])
+        _event_batches[path] = (stamp, batch)
+        return batch
+
+
+@dataclass
+class _Materialized:
+    stamp: Tuple[int, int]
+    etag: str
+    data: Any
+    bodies: Dict[Any, bytes] = field(default_factory=dict)
+
+
+_materialized: Dict[Tuple[Path, Callable[[bytes], Any]], _Materialized] = {}
+_materialized_lock = threading.Lock()
+
+
+def _load_materialized(path: Path, parse: Callable[[bytes], Any]) -> _Materialized:
+    """Return the parsed contents of a build output, re-reading only on change.
+
+    Files are replaced wholesale by the feature build, so (mtime, size) is a
+    sufficient change marker; the ETag is the content hash of the bytes.
+    """
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"{path.name} not found") from None
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    key = (path, parse)
+    entry = _materialized.get(key)
+    if entry is not None and entry.stamp == stamp:
+        return entry
+    with _materialized_lock:
+        entry = _materialized.get(key)
+        if entry is not None and entry.stamp == stamp:
+            return entry
+        raw = path.read_bytes()
+        entry = _Materialized(
+            stamp=stamp,
+            etag=hashlib.sha256(raw).hexdigest()[:32],
+            data=parse(raw),
+        )
+        _materialized[key] = entry
+        return entry
+
+
+def _parse_jsonl_bytes(raw: bytes) -> List[dict]:
     items: List[dict] = []
-    with path.open("r", encoding="utf-8") as handle:
-        for line in handle:
-            text = line.strip()
-            if not text:
-                continue
-            items.append(json.loads(text))
+    for line in raw.decode("utf-8").splitlines():
+        text = line.strip()
+        if not text:
+            continue
+        items.append(json.loads(text))
     return items
 
 
+def _parse_brief_from_anomalies(raw: bytes) -> dict:
+    return build_brief(_parse_jsonl_bytes(raw))
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    for candidate in header.split(","):
+        value = candidate.strip()
+        if value == "*":
+            return True
+        if value.startswith("W/"):
+            value = value[2:]
+        if value == etag:
+            return True
+    return False
+
+
+def _respond(request: Request, etag: str, body: Callable[[], bytes]) -> Response:
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body(), media_type="application/json", headers=headers)
+
+
+def _cached_response(
+    request: Request,
+    entry: _Materialized,
+    variant: Any,
+    render: Callable[[Any], Any],
+) -> Response:
+    def _body() -> bytes:
+        body = entry.bodies.get(variant)
+        if body is None:
+            body = json.dumps(render(entry.data), separators=(",", ":")).encode("utf-8")
+            entry.bodies[variant] = body
+        return body
+
+    return _respond(request, f'"{entry.etag}-{variant}"', _body)
+
+
+def _snapshot_response(
+    request: Request,
+    snapshot: Snapshot,
+    variant: Any,
+    body: Callable[[], bytes],
+) -> Response:
+    return _respond(request, f'"{snapshot.version}-{variant}"', body)
+
+
 def _load_env_file(path: Path) -> Dict[str, str]:
     values: Dict[str, str] = {}
     if not path.exists():
@@ -53,25 +194,28 @@ def _env_value(key: str, env_file: Dict[str, str], default: Optional[str] = None
     return os.getenv(key) or env_file.get(key, default)
 
 
-def _filter_events(
-    events: Iterable[dict],
-    source: Optional[str],
-    kind: Optional[str],
-    protocol: Optional[str],
-    limit: int,
-) -> List[dict]:
-    results: List[dict] = []
-    for event in events:
-        if source and event.get("source") != source:
-            continue
-        if kind and event.get("kind") != kind:
-            continue
-        if protocol and event.get("protocol") != protocol:
-            continue
-        results.append(event)
-        if len(results) >= limit:
-            break
-    return results
+_PROFILE_ENV = _load_env_file(REPO_ROOT / ".env")
+profiling.init("api", lambda key: _env_value(key, _PROFILE_ENV), argv=[])
+
+
+@app.middleware("http")
+async def _record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    with profiling.profile_request(request.url.path):
+        response = await call_next(request)
+    route = request.scope.get("route")
+    endpoint = getattr(route, "path", "unmatched")
+    REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint=endpoint)
+    REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    return response
+
+
+@app.get("/metrics")
+def metrics() -> PlainTextResponse:
+    return PlainTextResponse(
+        REGISTRY.render_prometheus(),
+        media_type="text/plain; version=0.0.4",
+    )
 
 
 @app.get("/health")
@@ -86,73 +230,114 @@ def list_events(
     protocol: Optional[str] = None,
     limit: int = Query(default=50, ge=1, le=500),
 ) -> List[dict]:
+    snapshot = snapshots.current()
+    batch = snapshot.events() if snapshot is not None else None
+    if batch is not None:
+        # Events published by the last feature build, read from the shared mapping.
+        matches = batch.select(limit, source=source, kind=kind, protocol=protocol)
+        return list(batch.rows(matches))
+
     files = _iter_event_files()
     if not files:
         raise HTTPException(status_code=404, detail="No event files found")
 
     results: List[dict] = []
     for path in files:
-        events = _load_jsonl(path)
-        results.extend(_filter_events(events, source, kind, protocol, limit - len(results)))
+        batch = _event_batch(path)
+        matches = batch.select(limit - len(results), source=source, kind=kind, protocol=protocol)
+        results.extend(batch.rows(matches))
         if len(results) >= limit:
             break
     return results
 
 
 @app.get("/features/latest")
-def latest_features(limit: int = Query(default=200, ge=1, le=1000)) -> List[dict]:
-    path = FEATURES_DIR / "feature_snapshot.jsonl"
-    if not path.exists():
-        raise HTTPException(status_code=404, detail="feature_snapshot.jsonl not found")
-    items = _load_jsonl(path)
-    return items[:limit]
+def latest_features(
+    request: Request,
+    limit: int = Query(default=200, ge=1, le=1000),
+) -> Response:
+    snapshot = snapshots.current()
+    if snapshot is not None:
+        return _snapshot_response(
+            request, snapshot, limit, lambda: snapshot.array_prefix("features", limit)
+        )
+    entry = _load_materialized(FEATURES_DIR / "feature_snapshot.jsonl", _parse_jsonl_bytes)
+    return _cached_response(request, entry, limit, lambda items: items[:limit])
 
 
 @app.get("/anomalies")
-def anomalies() -> List[dict]:
-    path = FEATURES_DIR / "anomalies.jsonl"
-    if not path.exists():
-        raise HTTPException(status_code=404, detail="anomalies.jsonl not found")
-    return _load_jsonl(path)
-
-
-def _count_by(items: Iterable[dict], key: str) -> Dict[str, int]:
-    counts: Dict[str, int] = {}
-    for item in items:
-        value = str(item.get(key, "unknown"))
-        counts[value] = counts.get(value, 0) + 1
-    return counts
-
+def anomalies(request: Request) -> Response:
+    snapshot = snapshots.current()
+    if snapshot is not None:
+        return _snapshot_response(
+            request, snapshot, "all", lambda: bytes(snapshot.section("anomalies"))
+        )
+    entry = _load_materialized(FEATURES_DIR / "anomalies.jsonl", _parse_jsonl_bytes)
+    return _cached_response(request, entry, "all", lambda items: items)
+
+
+@app.get("/anomalies/stream")
+async def anomaly_stream(
+    protocol: List[str] = Query(default=[]),
+    kind: List[str] = Query(default=[]),
+    types: List[str] = Query(default=[], alias="type"),
+    last_event_id: Optional[int] = Query(default=None, ge=0),
+    last_event_id_header: Optional[str] = Header(default=None, alias="Last-Event-ID"),
+) -> StreamingResponse:
+    resume_from = last_event_id
+    if resume_from is None and last_event_id_header:
+        try:
+            resume_from = int(last_event_id_header)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Last-Event-ID must be an integer") from None
+    subscription = Subscription(
+        protocols=frozenset(protocol),
+        kinds=frozenset(kind),
+        types=frozenset(types),
+    )
+    return StreamingResponse(
+        event_stream(change_hub, subscription, resume_from),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-def _top_anomalies(items: List[dict], limit: int) -> List[dict]:
-    def _score(item: dict) -> Tuple[float, int]:
-        ratio = float(item.get("surge_ratio") or 0.0)
-        count_1h = int(item.get("count_1h") or 0)
-        return (ratio, count_1h)
 
-    ranked = sorted(items, key=_score, reverse=True)
-    return ranked[:limit]
+def _slice_brief(payload: dict, limit: int) -> dict:
+    return dict(payload, top_anomalies=payload["top_anomalies"][:limit])
 
 
 @app.get("/brief")
-def brief(limit: int = Query(default=5, ge=1, le=20)) -> dict:
-    path = FEATURES_DIR / "anomalies.jsonl"
-    if not path.exists():
-        raise HTTPException(status_code=404, detail="anomalies.jsonl not found")
-    items = _load_jsonl(path)
-    return {
-        "total_anomalies": len(items),
-        "by_protocol": _count_by(items, "protocol"),
-        "by_kind": _count_by(items, "kind"),
-        "top_anomalies": _top_anomalies(items, limit),
-    }
-
-
-@app.get("/rag/query")
-def rag_query(
-    q: str = Query(..., min_length=3),
-    top_k: int = Query(default=5, ge=1, le=20),
-) -> dict:
+def brief(request: Request, limit: int = Query(default=5, ge=1, le=20)) -> Response:
+    snapshot = snapshots.current()
+    if snapshot is not None and snapshot.has("brief"):
+        return _snapshot_response(
+            request, snapshot, limit, lambda: snapshot.array_prefix("brief", limit)
+        )
+    brief_path = FEATURES_DIR / "brief.json"
+    if brief_path.exists():
+        entry = _load_materialized(brief_path, json.loads)
+    else:
+        # Outputs from builds that predate brief.json: derive it from anomalies.
+        entry = _load_materialized(FEATURES_DIR / "anomalies.jsonl", _parse_brief_from_anomalies)
+    return _cached_response(request, entry, limit, lambda payload: _slice_brief(payload, limit))
+
+
+class RagQuerySpec(BaseModel):
+    q: str = Field(..., min_length=3)
+    top_k: int = Field(default=5, ge=1, le=20)
+    protocol: List[str] = Field(default_factory=list)
+    kind: List[str] = Field(default_factory=list)
+    source: List[str] = Field(default_factory=list)
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    mode: str = Field(default="hybrid", pattern=RAG_MODE_PATTERN)
+
+
+class RagBatchRequest(BaseModel):
+    queries: List[RagQuerySpec] = Field(..., min_length=1, max_length=RAG_BATCH_LIMIT)
+
+
+def _rag_config():
     env_file = _load_env_file(REPO_ROOT / ".env")
     persist_dir = Path(_env_value("CHROMA_PERSIST_DIR", env_file, "data/chroma"))
     collection = _env_value("CHROMA_COLLECTION", env_file, "defi_sentinel")
@@ -165,9 +350,66 @@ def rag_query(
     if not persist_dir.exists():
         raise HTTPException(status_code=404, detail="Chroma index not found")
 
-    config = RagConfig(
+    cache_dir = _env_value("RAG_EMBED_CACHE_DIR", env_file, "data/embedding_cache")
+    backend = _env_value("RAG_BACKEND", env_file, "chroma")
+    quantization = _env_value("RAG_QUANTIZATION", env_file, "none")
+
+    from rag.index import RagConfig
+
+    return RagConfig(
         persist_dir=persist_dir,
         collection_name=collection,
         embedding_model=model,
+        embedding_cache_dir=Path(cache_dir) if cache_dir else None,
+        backend=backend or "chroma",
+        quantization=quantization or "none",
     )
-    return query_index(config, q, top_k=top_k)
+
+
+def _rag_request(spec: RagQuerySpec):
+    from rag.filters import QueryFilters
+    from rag.index import QueryRequest
+
+    filters = QueryFilters(
+        protocol=tuple(spec.protocol),
+        kind=tuple(spec.kind),
+        source=tuple(spec.source),
+        since=spec.since,
+        until=spec.until,
+    )
+    return QueryRequest(spec.q, spec.top_k, filters, spec.mode)
+
+
+@app.get("/rag/query")
+def rag_query(
+    q: str = Query(..., min_length=3),
+    top_k: int = Query(default=5, ge=1, le=20),
+    protocol: List[str] = Query(default=[]),
+    kind: List[str] = Query(default=[]),
+    source: List[str] = Query(default=[]),
+    since: Optional[datetime] = Query(default=None),
+    until: Optional[datetime] = Query(default=None),
+    mode: str = Query(default="hybrid", pattern=RAG_MODE_PATTERN),
+) -> dict:
+    config = _rag_config()
+    spec = RagQuerySpec(
+        q=q, top_k=top_k, protocol=protocol, kind=kind, source=source, since=since, until=until, mode=mode
+    )
+    try:
+        from rag.index import query_many
+
+        return query_many(config, [_rag_request(spec)])[0]
+    except ImportError:
+        raise HTTPException(status_code=503, detail=RAG_UNAVAILABLE) from None
+
+
+@app.post("/rag/query:batch")
+def rag_query_batch(body: RagBatchRequest) -> dict:
+    config = _rag_config()
+    try:
+        from rag.index import query_many
+
+        results = query_many(config, [_rag_request(spec) for spec in body.queries])
+    except ImportError:
+        raise HTTPException(status_code=503, detail=RAG_UNAVAILABLE) from None
+    return {"results": results}
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, FrozenSet, List, Optional, Set
+
+POLL_SECONDS = 0.25
+HEARTBEAT_SECONDS = 15.0
+QUEUE_SIZE = 256
+
+
+@dataclass(eq=False)
+class Subscription:
+    protocols: FrozenSet[str]
+    kinds: FrozenSet[str]
+    types: FrozenSet[str]
+    queue: "asyncio.Queue[Optional[dict]]" = field(
+        default_factory=lambda: asyncio.Queue(maxsize=QUEUE_SIZE)
+    )
+    lagged: bool = False
+
+    def accepts(self, message: dict) -> bool:
+        data = message.get("data") or {}
+        if self.types and message.get("type") not in self.types:
+            return False
+        if self.protocols and data.get("protocol") not in self.protocols:
+            return False
+        if self.kinds and data.get("kind") not in self.kinds:
+            return False
+        return True
+
+
+def _read_messages(path: Path, offset: int) -> tuple[List[dict], int]:
+    """Read complete lines appended after ``offset``; returns messages and new offset."""
+    with path.open("rb") as handle:
+        handle.seek(offset)
+        chunk = handle.read()
+    end = chunk.rfind(b"\n")
+    if end < 0:
+        return [], offset
+    messages: List[dict] = []
+    for line in chunk[: end + 1].splitlines():
+        text = line.strip()
+        if not text:
+            continue
+        try:
+            messages.append(json.loads(text))
+        except json.JSONDecodeError:
+            continue
+    return messages, offset + end + 1
+
+
+class ChangeHub:
+    """Fan out messages appended to the feature build's change log.
+
+    One task per process tails the log and pushes matching messages into a
+    bounded queue per subscriber. A subscriber that falls ``QUEUE_SIZE``
+    messages behind is disconnected instead of buffering without limit; it
+    reconnects with ``Last-Event-ID`` and replays the gap from the log.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._subscribers: Set[Subscription] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._offset = 0
+        self._last_id = 0
+
+    def _catch_up(self) -> None:
+        if self.path.exists():
+            self._offset = self.path.stat().st_size
+            messages, _ = _read_messages(self.path, max(0, self._offset - 65536))
+            if messages:
+                self._last_id = int(messages[-1].get("id", 0))
+
+    async def _tail(self) -> None:
+        while self._subscribers:
+            await asyncio.sleep(POLL_SECONDS)
+            try:
+                size = self.path.stat().st_size
+            except FileNotFoundError:
+                continue
+            if size < self._offset:
+                # The log was compacted; ids keep increasing so rescan it all.
+                self._offset = 0
+            if size == self._offset:
+                continue
+            messages, self._offset = _read_messages(self.path, self._offset)
+            for message in messages:
+                message_id = int(message.get("id", 0))
+                if message_id <= self._last_id:
+                    continue
+                self._last_id = message_id
+                self._publish(message)
+
+    def _publish(self, message: dict) -> None:
+        for subscription in list(self._subscribers):
+            if not subscription.accepts(message):
+                continue
+            try:
+                subscription.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                subscription.lagged = True
+                self._subscribers.discard(subscription)
+
+    def subscribe(self, subscription: Subscription) -> None:
+        if self._task is None or self._task.done():
+            self._catch_up()
+            self._task = asyncio.get_running_loop().create_task(self._tail())
+        self._subscribers.add(subscription)
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+
+    def replay(self, after_id: int) -> List[dict]:
+        if not self.path.exists():
+            return []
+        messages, _ = _read_messages(self.path, 0)
+        return [message for message in messages if int(message.get("id", 0)) > after_id]
+
+
+def _format_sse(message: dict) -> str:
+    data = json.dumps(message.get("data"), separators=(",", ":"))
+    return f"id: {message.get('id')}\nevent: {message.get('type')}\ndata: {data}\n\n"
+
+
+async def event_stream(
+    hub: ChangeHub,
+    subscription: Subscription,
+    last_event_id: Optional[int],
+) -> AsyncIterator[str]:
+    hub.subscribe(subscription)
+    try:
+        yield "retry: 2000\n\n"
+        sent_id = last_event_id or 0
+        if last_event_id is not None:
+            # Reading the log is blocking file I/O; keep it off the event loop.
+            replayed = await asyncio.get_running_loop().run_in_executor(None, hub.replay, last_event_id)
+            for message in replayed:
+                if subscription.accepts(message):
+                    yield _format_sse(message)
+                sent_id = max(sent_id, int(message.get("id", 0)))
+        while not subscription.lagged:
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if message is None:
+                break
+            if int(message.get("id", 0)) <= sent_id:
+                continue
+            sent_id = int(message["id"])
+            yield _format_sse(message)
+    finally:
+        hub.unsubscribe(subscription)
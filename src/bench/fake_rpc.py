@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import bisect
+import hashlib
+import json
+import math
+import random
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from bench.fake_server import FakeServer, QuietHandler, ServerBehavior
+from ingest.segments import iter_events
+
+BLOCK_SECONDS = 12
+GENESIS_TIME = 1_704_067_200  # 2024-01-01T00:00:00Z, the timestamp of the first block served
+
+# Error codes and messages follow what hosted providers return.
+LIMIT_EXCEEDED = -32005
+INVALID_PARAMS = -32602
+METHOD_NOT_FOUND = -32601
+PARSE_ERROR = -32700
+
+
+def _word(rng: random.Random, bits: int = 256) -> str:
+    return f"0x{rng.getrandbits(bits):0{bits // 4}x}"
+
+
+def _block_hash(number: int) -> str:
+    return "0x" + hashlib.sha256(f"block:{number}".encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class LogSpec:
+    """One contract event that the synthetic chain emits."""
+
+    address: str
+    topic0: str
+    logs_per_block: float
+
+
+class RpcError(Exception):
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class FakeChain:
+    """Blocks and logs held in memory, indexed by block number."""
+
+    def __init__(self, logs: List[dict], head: int, genesis_time: int = GENESIS_TIME, first_block: int = 0) -> None:
+        self.logs = sorted(logs, key=lambda log: (int(log["blockNumber"], 16), int(log["logIndex"], 16)))
+        self.log_blocks = [int(log["blockNumber"], 16) for log in self.logs]
+        self.head = head
+        self.first_block = first_block
+        self.genesis_time = genesis_time
+        self.block_times: Dict[int, int] = {}
+
+    @classmethod
+    def synthetic(
+        cls,
+        specs: Sequence[LogSpec],
+        first_block: int,
+        blocks: int,
+        seed: int = 7,
+    ) -> "FakeChain":
+        """Poisson-distributed logs for each spec over ``blocks`` blocks."""
+        rng = random.Random(seed)
+        logs: List[dict] = []
+        for number in range(first_block, first_block + blocks):
+            log_index = 0
+            for spec in specs:
+                for _ in range(_poisson(rng, spec.logs_per_block)):
+                    logs.append(
+                        _log(
+                            number,
+                            log_index,
+                            spec.address,
+                            [spec.topic0, _word(rng), _word(rng)],
+                            _word(rng, 512),
+                            _word(rng),
+                        )
+                    )
+                    log_index += 1
+        return cls(logs, head=first_block + blocks - 1, first_block=first_block)
+
+    @classmethod
+    def from_events(cls, paths: Iterable[Path]) -> "FakeChain":
+        """Replay on-chain events recorded by ``scripts/ingest_onchain.py``.
+
+        Each event's ``raw`` address, topics and data become a log; block
+        timestamps come from the events' ``event_time``.
+        """
+        logs: List[dict] = []
+        times: Dict[int, int] = {}
+        for path in paths:
+            for event in iter_events(path):
+                raw = event.get("raw") or {}
+                if event.get("source") != "onchain" or "address" not in raw:
+                    continue
+                number = int(event["block_number"])
+                event_time = datetime.fromisoformat(event["event_time"].replace("Z", "+00:00"))
+                times[number] = int(event_time.timestamp())
+                logs.append(
+                    _log(
+                        number,
+                        int(event.get("log_index") or 0),
+                        raw["address"],
+                        raw.get("topics", []),
+                        raw.get("data", "0x"),
+                        event["tx_hash"],
+                    )
+                )
+        if not logs:
+            raise ValueError("no recorded on-chain events with raw logs found")
+        chain = cls(logs, head=max(times), first_block=min(times))
+        chain.block_times = times
+        return chain
+
+    def block_time(self, number: int) -> int:
+        if number in self.block_times:
+            return self.block_times[number]
+        return self.genesis_time + (number - self.first_block) * BLOCK_SECONDS
+
+    def block(self, number: int) -> Optional[dict]:
+        if number < 0 or number > self.head:
+            return None
+        return {
+            "number": hex(number),
+            "hash": _block_hash(number),
+            "parentHash": _block_hash(number - 1),
+            "timestamp": hex(self.block_time(number)),
+            "miner": "0x" + "00" * 20,
+            "gasLimit": hex(30_000_000),
+            "gasUsed": hex(15_000_000),
+            "baseFeePerGas": hex(10**10),
+            "transactions": [],
+            "uncles": [],
+        }
+
+    def get_logs(self, params: dict, max_range: Optional[int], max_results: Optional[int]) -> List[dict]:
+        from_block = self.block_param(params.get("fromBlock", "latest"))
+        to_block = self.block_param(params.get("toBlock", "latest"))
+        if from_block > to_block:
+            raise RpcError(INVALID_PARAMS, "invalid block range params")
+        if max_range is not None and to_block - from_block + 1 > max_range:
+            raise RpcError(
+                INVALID_PARAMS,
+                f"eth_getLogs is limited to a {max_range} block range; requested {to_block - from_block + 1}",
+            )
+        addresses = params.get("address")
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        wanted_addresses = {address.lower() for address in addresses} if addresses else None
+        topics = params.get("topics") or []
+        start = bisect.bisect_left(self.log_blocks, from_block)
+        stop = bisect.bisect_right(self.log_blocks, to_block)
+        results: List[dict] = []
+        for log in self.logs[start:stop]:
+            if wanted_addresses is not None and log["address"].lower() not in wanted_addresses:
+                continue
+            if not _topics_match(log["topics"], topics):
+                continue
+            results.append(log)
+            if max_results is not None and len(results) > max_results:
+                raise RpcError(LIMIT_EXCEEDED, f"query returned more than {max_results} results")
+        return results
+
+    def block_param(self, value: Any) -> int:
+        if value in ("latest", "safe", "finalized", "pending", None):
+            return self.head
+        if value == "earliest":
+            return self.first_block
+        try:
+            return int(value, 16) if isinstance(value, str) else int(value)
+        except ValueError:
+            raise RpcError(INVALID_PARAMS, f"invalid block number {value!r}") from None
+
+
+def _poisson(rng: random.Random, mean: float) -> int:
+    # Knuth's method is fine for the small per-block means used here.
+    if mean <= 0:
+        return 0
+    limit = math.exp(-mean)
+    count, product = 0, rng.random()
+    while product > limit:
+        count += 1
+        product *= rng.random()
+    return count
+
+
+def _log(number: int, log_index: int, address: str, topics: List[str], data: str, tx_hash: str) -> dict:
+    return {
+        "address": address,
+        "topics": topics,
+        "data": data,
+        "blockNumber": hex(number),
+        "blockHash": _block_hash(number),
+        "transactionHash": tx_hash,
+        "transactionIndex": hex(log_index),
+        "logIndex": hex(log_index),
+        "removed": False,
+    }
+
+
+def _topics_match(log_topics: List[str], wanted: List[Any]) -> bool:
+    for position, option in enumerate(wanted):
+        if option is None:
+            continue
+        if position >= len(log_topics):
+            return False
+        options = option if isinstance(option, list) else [option]
+        if log_topics[position].lower() not in {value.lower() for value in options}:
+            return False
+    return True
+
+
+class _RpcHandler(QuietHandler):
+    server: "FakeRpcServer"
+
+    def do_POST(self) -> None:  # noqa: N802 - http.server naming
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        status = self.server.admit()
+        if status == 429:
+            payload = {"jsonrpc": "2.0", "id": None, "error": {"code": 429, "message": "rate limit exceeded"}}
+            self.send_body(429, json.dumps(payload).encode("utf-8"), "application/json", {"Retry-After": "1"})
+            return
+        if status is not None:
+            self.send_body(status, b"service unavailable", "text/plain")
+            return
+        try:
+            request = json.loads(body)
+        except json.JSONDecodeError:
+            response: Any = _error(None, PARSE_ERROR, "parse error")
+        else:
+            if isinstance(request, list):
+                response = self.server.handle_batch(request)
+            else:
+                response = self.server.handle_call(request)
+        self.send_body(200, json.dumps(response).encode("utf-8"), "application/json")
+
+
+def _error(call_id: Any, code: int, message: str) -> dict:
+    return {"jsonrpc": "2.0", "id": call_id, "error": {"code": code, "message": message}}
+
+
+class FakeRpcServer(FakeServer):
+    """Ethereum JSON-RPC stand-in serving a ``FakeChain``.
+
+    Supports ``eth_blockNumber``, ``eth_getBlockByNumber``, ``eth_getLogs``,
+    ``eth_chainId``, ``net_version`` and ``web3_clientVersion``, single or
+    batched. ``max_block_range`` and ``behavior.max_results`` reproduce the
+    provider limits on ``eth_getLogs``; ``max_batch`` rejects larger batches.
+    """
+
+    def __init__(
+        self,
+        chain: FakeChain,
+        behavior: ServerBehavior = ServerBehavior(),
+        max_block_range: Optional[int] = None,
+        max_batch: Optional[int] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        super().__init__(_RpcHandler, behavior, host, port)
+        self.chain = chain
+        self.max_block_range = max_block_range
+        self.max_batch = max_batch
+
+    def handle_batch(self, calls: List[Any]) -> Any:
+        self.stats.count("batch")
+        if self.max_batch is not None and len(calls) > self.max_batch:
+            return _error(None, LIMIT_EXCEEDED, f"batch size {len(calls)} exceeds limit of {self.max_batch}")
+        return [self.handle_call(call) for call in calls]
+
+    def handle_call(self, call: Any) -> dict:
+        if not isinstance(call, dict) or "method" not in call:
+            return _error(None, -32600, "invalid request")
+        call_id = call.get("id")
+        method = call["method"]
+        params = call.get("params") or []
+        self.stats.count(method)
+        try:
+            result = self._dispatch(method, params)
+        except RpcError as exc:
+            return _error(call_id, exc.code, exc.message)
+        except (IndexError, TypeError, ValueError) as exc:
+            return _error(call_id, INVALID_PARAMS, f"invalid params: {exc}")
+        return {"jsonrpc": "2.0", "id": call_id, "result": result}
+
+    def _dispatch(self, method: str, params: List[Any]) -> Any:
+        if method == "eth_blockNumber":
+            return hex(self.chain.head)
+        if method == "eth_getBlockByNumber":
+            return self.chain.block(self.chain.block_param(params[0]))
+        if method == "eth_getLogs":
+            return self.chain.get_logs(params[0], self.max_block_range, self.behavior.max_results)
+        if method == "eth_chainId":
+            return "0x1"
+        if method == "net_version":
+            return "1"
+        if method == "web3_clientVersion":
+            return "defi-sentinel-fake-rpc/0.1"
+        raise RpcError(METHOD_NOT_FOUND, f"the method {method} does not exist/is not available")
+
+
+def chain_specs(streams: Sequence[Any], logs_per_block: float) -> List[LogSpec]:
+    """``LogSpec`` per ``OnchainStream`` so synthetic logs match the ingest filters."""
+    from web3 import Web3
+
+    return [
+        LogSpec(
+            address=Web3.to_checksum_address(stream.address),
+            topic0=Web3.to_hex(Web3.keccak(text=stream.signature)),
+            logs_per_block=logs_per_block,
+        )
+        for stream in streams
+    ]
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from xml.sax.saxutils import escape
+
+from bench.fake_server import FakeServer, QuietHandler, ServerBehavior
+from bench.synthetic import SyntheticConfig, generate_events
+from ingest.rss import RssFeed
+from ingest.segments import iter_lines
+
+
+def _rfc2822(value: str) -> str:
+    return format_datetime(datetime.fromisoformat(value.replace("Z", "+00:00")).astimezone(timezone.utc))
+
+
+def _feed_name(protocol: str, kind: str) -> str:
+    return f"{protocol}-{kind}"
+
+
+def render_feed(title: str, link: str, items: Iterable[dict]) -> bytes:
+    """RSS 2.0 document for ``items`` (dicts with title/link/guid/published/summary)."""
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<rss version="2.0"><channel>',
+        f"<title>{escape(title)}</title><link>{escape(link)}</link><description>{escape(title)}</description>",
+    ]
+    for item in items:
+        parts.append(
+            "<item>"
+            f"<title>{escape(item['title'])}</title>"
+            f"<link>{escape(item['link'])}</link>"
+            f'<guid isPermaLink="false">{escape(item["guid"])}</guid>'
+            f"<pubDate>{escape(item['published'])}</pubDate>"
+            f"<description>{escape(item.get('summary') or '')}</description>"
+            "</item>"
+        )
+    parts.append("</channel></rss>")
+    return "".join(parts).encode("utf-8")
+
+
+class FeedSet:
+    """Named feeds, each a newest-first list of items, keyed by (protocol, kind)."""
+
+    def __init__(self, feeds: Dict[str, List[dict]], kinds: Dict[str, RssFeed]) -> None:
+        self.feeds = feeds
+        self.kinds = kinds
+
+    @classmethod
+    def from_events(cls, events: Iterable[dict]) -> "FeedSet":
+        feeds: Dict[str, List[dict]] = {}
+        kinds: Dict[str, RssFeed] = {}
+        for event in events:
+            if event.get("source") != "offchain":
+                continue
+            name = _feed_name(event["protocol"], event["kind"])
+            kinds.setdefault(name, RssFeed(url=name, protocol=event["protocol"], kind=event["kind"]))
+            feeds.setdefault(name, []).append(
+                {
+                    "title": event["title"],
+                    "link": event["source_url"],
+                    "guid": event["source_url"],
+                    "published": _rfc2822(event["event_time"]),
+                    "summary": event.get("summary"),
+                }
+            )
+        for items in feeds.values():
+            items.reverse()
+        return cls(feeds, kinds)
+
+    @classmethod
+    def synthetic(cls, items_per_feed: int, seed: int = 7) -> "FeedSet":
+        """Off-chain items from the synthetic generator, ``items_per_feed`` per feed at most."""
+        config = SyntheticConfig(seed=seed, onchain_share=0.0, duplicate_share=0.0)
+        events = generate_events(items_per_feed * 8, config)
+        feed_set = cls.from_events(events)
+        for name, items in feed_set.feeds.items():
+            feed_set.feeds[name] = items[:items_per_feed]
+        return feed_set
+
+    @classmethod
+    def from_paths(cls, paths: Iterable[Path]) -> "FeedSet":
+        """Replay off-chain events recorded by ``scripts/ingest_rss.py`` or fixtures."""
+
+        def _events() -> Iterable[dict]:
+            for path in paths:
+                for line in iter_lines(path):
+                    if line.strip():
+                        yield json.loads(line)
+
+        return cls.from_events(_events())
+
+    def rss_feeds(self, base_url: str) -> List[RssFeed]:
+        """``RssFeed`` entries pointing at a server started with this feed set."""
+        return [
+            RssFeed(url=f"{base_url}/feeds/{name}.rss", protocol=feed.protocol, kind=feed.kind)
+            for name, feed in sorted(self.kinds.items())
+        ]
+
+
+class _RssHandler(QuietHandler):
+    server: "FakeRssServer"
+
+    def do_GET(self) -> None:  # noqa: N802 - http.server naming
+        status = self.server.admit()
+        if status is not None:
+            headers = {"Retry-After": "1"} if status == 429 else None
+            self.send_body(status, b"unavailable", "text/plain", headers)
+            return
+        path = self.path.split("?", 1)[0]
+        name = path[len("/feeds/") : -len(".rss")] if path.startswith("/feeds/") and path.endswith(".rss") else ""
+        body = self.server.render(name)
+        if body is None:
+            self.send_body(404, b"not found", "text/plain")
+            return
+        self.server.stats.count(name)
+        self.send_body(200, body, "application/rss+xml; charset=utf-8")
+
+
+class FakeRssServer(FakeServer):
+    """Serves each feed of a ``FeedSet`` at ``/feeds/<protocol>-<kind>.rss``.
+
+    ``behavior.max_results`` truncates every feed to its newest items, as
+    real feeds only carry the latest N entries. Rendered documents are cached.
+    """
+
+    def __init__(
+        self,
+        feed_set: FeedSet,
+        behavior: ServerBehavior = ServerBehavior(),
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        super().__init__(_RssHandler, behavior, host, port)
+        self.feed_set = feed_set
+        self._rendered: Dict[str, bytes] = {}
+
+    def render(self, name: str) -> Optional[bytes]:
+        items = self.feed_set.feeds.get(name)
+        if items is None:
+            return None
+        if name not in self._rendered:
+            limit = self.behavior.max_results
+            self._rendered[name] = render_feed(
+                f"Fake feed {name}", f"{self.url}/feeds/{name}.rss", items[:limit] if limit else items
+            )
+        return self._rendered[name]
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Optional
+
+
+@dataclass(frozen=True)
+class ServerBehavior:
+    """How a stand-in server misbehaves.
+
+    Every HTTP request sleeps ``latency_ms`` plus up to ``jitter_ms``.
+    ``rate_limit`` (requests per second, with ``burst`` capacity) answers
+    excess requests with 429. ``failure_rate`` is the chance a request fails
+    with a 503. ``max_results`` caps how many items one response may carry;
+    what happens past the cap is up to the server (JSON-RPC errors, RSS
+    truncates). Randomness is seeded so a run is reproducible.
+    """
+
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    rate_limit: Optional[float] = None
+    burst: int = 10
+    failure_rate: float = 0.0
+    max_results: Optional[int] = None
+    seed: int = 7
+
+
+class _RateLimiter:
+    def __init__(self, rate: Optional[float], burst: int) -> None:
+        self.rate = rate
+        self.capacity = float(max(1, burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        if self.rate is None:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1.0:
+                return False
+            self.tokens -= 1.0
+            return True
+
+
+@dataclass
+class ServerStats:
+    requests: int = 0
+    rate_limited: int = 0
+    failures: int = 0
+    calls: Dict[str, int] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + amount
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "rate_limited": self.rate_limited,
+                "failures": self.failures,
+                "calls": dict(self.calls),
+            }
+
+
+class FakeServer(ThreadingHTTPServer):
+    """Threaded HTTP server that applies a ``ServerBehavior`` before each request."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handler: type, behavior: ServerBehavior, host: str = "127.0.0.1", port: int = 0) -> None:
+        super().__init__((host, port), handler)
+        self.behavior = behavior
+        self.stats = ServerStats()
+        self._limiter = _RateLimiter(behavior.rate_limit, behavior.burst)
+        self._rng = random.Random(behavior.seed)
+        self._rng_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def admit(self) -> Optional[int]:
+        """Sleep for the configured latency; return an HTTP error status or None."""
+        behavior = self.behavior
+        with self._rng_lock:
+            jitter = self._rng.random() * behavior.jitter_ms
+            failed = self._rng.random() < behavior.failure_rate
+        with self.stats.lock:
+            self.stats.requests += 1
+        if behavior.latency_ms or jitter:
+            time.sleep((behavior.latency_ms + jitter) / 1000.0)
+        if not self._limiter.allow():
+            with self.stats.lock:
+                self.stats.rate_limited += 1
+            return 429
+        if failed:
+            with self.stats.lock:
+                self.stats.failures += 1
+            return 503
+        return None
+
+
+class QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, keep-alive
+    # clients stall ~40ms per request on delayed ACKs.
+    disable_nagle_algorithm = True
+    server: FakeServer
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002 - stdlib signature
+        return
+
+    def send_body(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@contextmanager
+def running(server: FakeServer) -> Iterator[FakeServer]:
+    """Serve on a background thread for the duration of the ``with`` block."""
+    thread = threading.Thread(target=server.serve_forever, name=type(server).__name__, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join(timeout=5)
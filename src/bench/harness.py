@@ -0,0 +1,409 @@
+from __future__ import annotations
+
+import json
+import math
+import multiprocessing
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+STAGES = ("normalize", "load", "features", "rag", "api")
+RESULTS_VERSION = 1
+PERCENTILES = (50, 95, 99)
+
+API_PATHS = (
+    "/health",
+    "/events?limit=50",
+    "/events?protocol=aave_v3&kind=governance&limit=200",
+    "/features/latest",
+    "/anomalies",
+    "/brief?limit=10",
+)
+
+
+@dataclass
+class BenchOptions:
+    events_path: Path
+    work_dir: Path
+    events: int
+    repeat: int = 3
+    rag_events: int = 20000
+    rag_queries: int = 100
+    api_requests: int = 200
+    embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+@dataclass
+class StageReport:
+    """Outcome of one stage run in its own process.
+
+    ``seconds`` is the median over repeats and ``rows_per_second`` is derived
+    from it. ``latency_ms`` holds percentiles of the stage's unit of work: a
+    full run for batch stages, one query or request for ``rag`` and ``api``.
+    ``peak_rss_mb`` is the child's high-water mark and ``base_rss_mb`` the
+    mark after imports, before the stage started.
+    """
+
+    stage: str
+    status: str  # "ok", "skipped" or "failed"
+    rows: int = 0
+    seconds: float = 0.0
+    rows_per_second: float = 0.0
+    latency_ms: Dict[str, float] = field(default_factory=dict)
+    peak_rss_mb: float = 0.0
+    base_rss_mb: float = 0.0
+    detail: Dict[str, Any] = field(default_factory=dict)
+    reason: str = ""
+
+
+def percentiles(samples: Sequence[float], points: Sequence[int] = PERCENTILES) -> Dict[str, float]:
+    """Nearest-rank percentiles, keyed ``p50``/``p95``/``p99``."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    return {
+        f"p{point}": round(ordered[max(0, math.ceil(point / 100.0 * len(ordered)) - 1)], 3)
+        for point in points
+    }
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux and bytes on macOS.
+    return round(peak / (1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0), 1)
+
+
+def _timed(repeat: int, run: Callable[[], Any]) -> List[float]:
+    samples = []
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def _median(samples: Sequence[float]) -> float:
+    ordered = sorted(samples)
+    return ordered[len(ordered) // 2] if ordered else 0.0
+
+
+def _batch_report(stage: str, rows: int, samples: Sequence[float], detail: Optional[dict] = None) -> StageReport:
+    seconds = _median(samples)
+    return StageReport(
+        stage=stage,
+        status="ok",
+        rows=rows,
+        seconds=round(seconds, 4),
+        rows_per_second=round(rows / seconds, 1) if seconds else 0.0,
+        latency_ms=percentiles([sample * 1000.0 for sample in samples]),
+        detail=dict(detail or {}, runs=len(samples)),
+    )
+
+
+# --- stages (each runs in a fresh child process) ----------------------------
+
+
+def _normalized_path(options: BenchOptions) -> Path:
+    return options.work_dir / "events_normalized.jsonl"
+
+
+def _db_path(options: BenchOptions) -> Path:
+    return options.work_dir / "feature_store.duckdb"
+
+
+def _features_dir(options: BenchOptions) -> Path:
+    return options.work_dir / "features"
+
+
+def _stage_normalize(options: BenchOptions) -> StageReport:
+    from features.store import normalize_events
+
+    output = _normalized_path(options)
+    samples = _timed(options.repeat, lambda: normalize_events([options.events_path], output))
+    return _batch_report("normalize", options.events, samples, {"bytes": output.stat().st_size})
+
+
+def _stage_load(options: BenchOptions) -> StageReport:
+    from features.store import load_events, open_store
+
+    inputs = [_normalized_path(options)]
+    conn = open_store(_db_path(options))
+
+    def _cold_load() -> None:
+        conn.execute("DROP TABLE IF EXISTS events")
+        load_events(conn, inputs)
+
+    try:
+        samples = _timed(options.repeat, _cold_load)
+        rows = conn.execute("SELECT count(*) FROM events").fetchone()[0]
+        # A second load of the same inputs is the idempotent merge path.
+        replay = _timed(1, lambda: load_events(conn, inputs))
+    finally:
+        conn.close()
+    return _batch_report("load", rows, samples, {"replay_seconds": round(replay[0], 4)})
+
+
+def _stage_features(options: BenchOptions) -> StageReport:
+    """Feature SQL is timed per repeat; outputs and the snapshot are written once, as a build does."""
+    from features.evidence import build_evidence, write_evidence
+    from features.snapshot import build_sections, publish_snapshot
+    from features.store import (
+        compute_features,
+        find_anomalies,
+        open_store,
+        write_anomalies,
+        write_brief,
+        write_outputs,
+    )
+    from normalize.batch import EventBatch
+
+    out_dir = _features_dir(options)
+    conn = open_store(_db_path(options))
+    try:
+        rows = conn.execute("SELECT count(*) FROM events").fetchone()[0]
+        features: list = []
+
+        def _compute() -> None:
+            features[:] = compute_features(conn)
+
+        samples = _timed(options.repeat, _compute)
+        started = time.perf_counter()
+        write_outputs(conn, features, out_dir)
+        anomalies = find_anomalies(features)
+        write_anomalies(anomalies, out_dir)
+        evidence = build_evidence(conn, anomalies)
+        write_evidence(evidence, out_dir)
+        write_brief(anomalies, out_dir, evidence)
+        events = EventBatch.from_jsonl([options.events_path])
+        publish_snapshot(out_dir / "snapshots", build_sections(features, anomalies, evidence, events))
+        write_seconds = time.perf_counter() - started
+    finally:
+        conn.close()
+    detail = {
+        "feature_rows": len(features),
+        "anomalies": len(anomalies),
+        "write_seconds": round(write_seconds, 4),
+    }
+    return _batch_report("features", rows, samples, detail)
+
+
+def _sample_events(options: BenchOptions, path: Path) -> int:
+    """Copy an evenly spaced sample of at most ``rag_events`` events."""
+    step = max(1, options.events // max(1, options.rag_events))
+    written = 0
+    with options.events_path.open("r", encoding="utf-8") as src, path.open("w", encoding="utf-8") as dst:
+        for index, line in enumerate(src):
+            if index % step == 0 and written < options.rag_events:
+                dst.write(line)
+                written += 1
+    return written
+
+
+def _stage_rag(options: BenchOptions) -> StageReport:
+    from rag.index import RagConfig, build_index, iter_documents, query_index
+
+    rag_dir = options.work_dir / "rag"
+    shutil.rmtree(rag_dir, ignore_errors=True)
+    rag_dir.mkdir(parents=True)
+    sample_path = rag_dir / "events.jsonl"
+    events = _sample_events(options, sample_path)
+    config = RagConfig(
+        persist_dir=rag_dir / "index",
+        collection_name="bench",
+        embedding_model=options.embedding_model,
+        backend="numpy",
+    )
+    started = time.perf_counter()
+    upserted = build_index(config, [sample_path])
+    build_seconds = time.perf_counter() - started
+    texts = [text for _, text, _ in iter_documents([sample_path], config.max_chars)]
+    queries = [" ".join(texts[index % len(texts)].split()[:8]) for index in range(0, options.rag_queries * 7, 7)]
+    query_index(config, queries[0])  # warm the model and the store
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        query_index(config, query)
+        latencies.append((time.perf_counter() - started) * 1000.0)
+    chunks = len(texts)
+    return StageReport(
+        stage="rag",
+        status="ok",
+        rows=chunks,
+        seconds=round(build_seconds, 4),
+        rows_per_second=round(chunks / build_seconds, 1) if build_seconds else 0.0,
+        latency_ms=percentiles(latencies),
+        detail={"events": events, "upserted": upserted, "queries": len(queries)},
+    )
+
+
+def _stage_api(options: BenchOptions) -> StageReport:
+    from fastapi.testclient import TestClient
+
+    import api.app as app_module
+    from features.snapshot import SnapshotReader
+
+    # Point the app at the benchmark outputs instead of data/.
+    out_dir = _features_dir(options)
+    app_module.FEATURES_DIR = out_dir
+    app_module.INGEST_DIR = options.events_path.parent
+    app_module.snapshots = SnapshotReader(out_dir / "snapshots")
+    client = TestClient(app_module.app)
+    per_path: Dict[str, List[float]] = {}
+    started = time.perf_counter()
+    for _ in range(options.api_requests):
+        for path in API_PATHS:
+            request_started = time.perf_counter()
+            response = client.get(path)
+            per_path.setdefault(path, []).append((time.perf_counter() - request_started) * 1000.0)
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {path} returned {response.status_code}")
+    seconds = time.perf_counter() - started
+    requests = options.api_requests * len(API_PATHS)
+    return StageReport(
+        stage="api",
+        status="ok",
+        rows=requests,
+        seconds=round(seconds, 4),
+        rows_per_second=round(requests / seconds, 1) if seconds else 0.0,
+        latency_ms=percentiles([sample for samples in per_path.values() for sample in samples]),
+        detail={"endpoints": {path: percentiles(samples) for path, samples in per_path.items()}},
+    )
+
+
+_STAGE_FUNCS: Dict[str, Callable[[BenchOptions], StageReport]] = {
+    "normalize": _stage_normalize,
+    "load": _stage_load,
+    "features": _stage_features,
+    "rag": _stage_rag,
+    "api": _stage_api,
+}
+
+
+def _run_in_child(stage: str, options: BenchOptions) -> StageReport:
+    base_rss = _peak_rss_mb()
+    try:
+        report = _STAGE_FUNCS[stage](options)
+    except ImportError as exc:
+        return StageReport(stage=stage, status="skipped", reason=f"missing dependency: {exc.name or exc}")
+    report.base_rss_mb = base_rss
+    report.peak_rss_mb = _peak_rss_mb()
+    return report
+
+
+def run_stage(stage: str, options: BenchOptions) -> StageReport:
+    """Run one stage in a fresh spawned process so peak RSS is its own."""
+    if stage not in _STAGE_FUNCS:
+        raise ValueError(f"unknown stage {stage!r}; expected one of {STAGES}")
+    options.work_dir.mkdir(parents=True, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        try:
+            return pool.submit(_run_in_child, stage, options).result()
+        except Exception as exc:  # surfaced as a failed stage
+            return StageReport(stage=stage, status="failed", reason=repr(exc))
+
+
+# --- results ------------------------------------------------------------------
+
+
+def _git(root: Path, *args: str) -> str:
+    try:
+        proc = subprocess.run(["git", *args], cwd=root, capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return ""
+    return proc.stdout.strip() if proc.returncode == 0 else ""
+
+
+def environment(root: Path) -> Dict[str, Any]:
+    """Where a result came from: code revision plus the machine it ran on."""
+    return {
+        "commit": _git(root, "rev-parse", "--short", "HEAD") or "unknown",
+        "describe": _git(root, "describe", "--always", "--dirty") or "unknown",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": multiprocessing.cpu_count(),
+    }
+
+
+def result_record(
+    root: Path,
+    scale: str,
+    seed: int,
+    options: BenchOptions,
+    reports: Sequence[StageReport],
+) -> Dict[str, Any]:
+    return {
+        "version": RESULTS_VERSION,
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "scale": scale,
+        "events": options.events,
+        "seed": seed,
+        "repeat": options.repeat,
+        "environment": environment(root),
+        "stages": {report.stage: asdict(report) for report in reports},
+    }
+
+
+def append_result(path: Path, record: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a", encoding="utf-8") as handle:
+        handle.write(json.dumps(record, separators=(",", ":"), default=str) + "\n")
+
+
+def previous_result(path: Path, seed: int) -> Optional[Dict[str, Any]]:
+    """Last stored record with the same seed (same input stream)."""
+    if not path.exists():
+        return None
+    last = None
+    with path.open("r", encoding="utf-8") as handle:
+        for line in handle:
+            text = line.strip()
+            if not text:
+                continue
+            record = json.loads(text)
+            if record.get("version") == RESULTS_VERSION and record.get("seed") == seed:
+                last = record
+    return last
+
+
+def compare(
+    previous: Dict[str, Any],
+    current: Dict[str, Any],
+    threshold: float = 0.2,
+) -> List[Dict[str, Any]]:
+    """Per-stage change in median seconds, p95 latency and peak RSS.
+
+    A metric is flagged ``regressed`` when it grew by more than
+    ``threshold`` (a fraction) against the previous record.
+    """
+    rows = []
+    for stage, report in current["stages"].items():
+        before = previous["stages"].get(stage)
+        if report.get("status") != "ok" or not before or before.get("status") != "ok":
+            continue
+        for metric, old, new in (
+            ("seconds", before.get("seconds"), report.get("seconds")),
+            ("p95_ms", before.get("latency_ms", {}).get("p95"), report.get("latency_ms", {}).get("p95")),
+            ("peak_rss_mb", before.get("peak_rss_mb"), report.get("peak_rss_mb")),
+        ):
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            rows.append(
+                {
+                    "stage": stage,
+                    "metric": metric,
+                    "previous": old,
+                    "current": new,
+                    "change": round(change, 4),
+                    "regressed": change > threshold,
+                }
+            )
+    return rows
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import json
+import random
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Deque, Dict, Iterator, Optional, Tuple
+
+SCALES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+
+BLOCK_SECONDS = 12
+START_BLOCK = 19_000_000
+
+ASSETS = ("WETH", "USDC", "USDT", "DAI", "WBTC", "LINK", "UNI", "AAVE", "wstETH", "GHO")
+
+# (protocol, raw event name, title label, weight)
+ONCHAIN_EVENTS = (
+    ("aave_v3", "Supply", "supply", 30),
+    ("aave_v3", "Borrow", "borrow", 20),
+    ("aave_v3", "Repay", "repay", 15),
+    ("aave_v3", "LiquidationCall", "liquidation", 5),
+    ("uniswap_v3", "Swap", "swap", 60),
+    ("uniswap_v3", "Mint", "liquidity add", 10),
+    ("uniswap_v3", "Burn", "liquidity removal", 10),
+)
+# (protocol, kind, url prefix, weight)
+OFFCHAIN_SOURCES = (
+    ("aave_v3", "governance", "https://governance.aave.com/t", 35),
+    ("uniswap_v3", "governance", "https://gov.uniswap.org/t", 25),
+    ("general", "advisory", "https://blog.openzeppelin.com", 15),
+    ("general", "advisory", "https://rekt.news", 10),
+    ("aave_v3", "advisory", "https://github.com/aave/aave-v3-core/security/advisories", 5),
+)
+GOVERNANCE_TOPICS = (
+    "risk parameter update for {a}",
+    "onboard {a} as collateral",
+    "adjust reserve factor on {a}",
+    "fee tier change for {a}/{b}",
+    "treasury allocation in {a}",
+    "temp check on {a} incentives",
+)
+ADVISORY_TOPICS = (
+    "oracle manipulation risk in {a} markets",
+    "reentrancy finding affecting {a} integrations",
+    "phishing campaign impersonating {a} front-ends",
+    "price feed delay on {a}/{b}",
+    "exploit post-mortem involving {a}",
+)
+SEVERITIES = ("info", "low", "medium", "high", "critical")
+SEVERITY_WEIGHTS = (20, 40, 25, 12, 3)
+
+
+@dataclass(frozen=True)
+class SyntheticConfig:
+    """Shape of a generated event stream.
+
+    Events arrive at a steady rate across ``duration``. With probability
+    ``burst_rate`` per event a burst starts: ``burst_size`` events from one
+    (protocol, source, kind) group packed ``burst_spacing`` times closer than
+    the base rate. The stream always ends with such a burst so the feature
+    build sees a surge at ``as_of``. ``late_share`` of events are written up to
+    ``late_max`` after their ``event_time``, and ``duplicate_share`` re-emit a
+    recent event unchanged, as overlapping ingest windows do.
+    """
+
+    seed: int = 7
+    start: datetime = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    duration: timedelta = timedelta(days=30)
+    onchain_share: float = 0.75
+    burst_rate: float = 0.0005
+    burst_size: Tuple[int, int] = (30, 300)
+    burst_spacing: float = 0.02
+    late_share: float = 0.03
+    late_max: timedelta = timedelta(hours=6)
+    duplicate_share: float = 0.005
+
+
+def _iso(epoch: float) -> str:
+    return datetime.fromtimestamp(int(epoch), tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _pair(rng: random.Random) -> Tuple[str, str]:
+    first, second = rng.sample(ASSETS, 2)
+    return first, second
+
+
+class _Groups:
+    """Weighted pickers over on-chain event types and off-chain sources."""
+
+    def __init__(self, rng: random.Random) -> None:
+        self.rng = rng
+        self.onchain = list(ONCHAIN_EVENTS)
+        self.onchain_weights = [item[3] for item in ONCHAIN_EVENTS]
+        self.offchain = list(OFFCHAIN_SOURCES)
+        self.offchain_weights = [item[3] for item in OFFCHAIN_SOURCES]
+
+    def pick(self, onchain: bool) -> tuple:
+        if onchain:
+            return self.rng.choices(self.onchain, self.onchain_weights)[0]
+        return self.rng.choices(self.offchain, self.offchain_weights)[0]
+
+
+def _onchain_event(
+    rng: random.Random,
+    group: tuple,
+    event_time: float,
+    ingest_time: float,
+    block_number: int,
+    burst: bool,
+) -> dict:
+    protocol, raw_name, label, _ = group
+    tx_hash = f"0x{rng.getrandbits(256):064x}"
+    log_index = rng.randrange(400)
+    first, second = _pair(rng)
+    amount = round(rng.lognormvariate(8, 2.5 if burst else 1.5), 2)
+    severity = "high" if burst and label == "liquidation" else rng.choices(SEVERITIES[:4], SEVERITY_WEIGHTS[:4])[0]
+    name = protocol.split("_")[0].capitalize()
+    return {
+        "schema_version": "0.1",
+        "event_id": f"onchain:{protocol}:{label.replace(' ', '_')}:{tx_hash}:{block_number}:{log_index}",
+        "source": "onchain",
+        "kind": "protocol_event",
+        "protocol": protocol,
+        "chain": "ethereum",
+        "event_time": _iso(event_time),
+        "ingest_time": _iso(ingest_time),
+        "severity": severity,
+        "title": f"{name} v3 {label} on {first}/{second}",
+        "summary": f"{raw_name} of {amount} {first} against {second} in block {block_number}.",
+        "tx_hash": tx_hash,
+        "block_number": block_number,
+        "log_index": log_index,
+        "entities": [f"0x{rng.getrandbits(160):040x}", first, second],
+        "tags": [label.split()[0], "burst"] if burst else [label.split()[0]],
+        "raw": {"event": raw_name, "amount": str(amount)},
+    }
+
+
+def _offchain_event(
+    rng: random.Random, group: tuple, event_time: float, ingest_time: float, serial: int
+) -> dict:
+    protocol, kind, url_prefix, _ = group
+    first, second = _pair(rng)
+    topics = GOVERNANCE_TOPICS if kind == "governance" else ADVISORY_TOPICS
+    topic = rng.choice(topics).format(a=first, b=second)
+    slug = topic.replace("/", "-").replace(" ", "-").lower()
+    severity = rng.choices(SEVERITIES, SEVERITY_WEIGHTS)[0]
+    if kind == "governance":
+        label = {"aave_v3": "Aave", "uniswap_v3": "Uniswap"}.get(protocol, "DeFi")
+        title = f"{label} governance: {topic}"
+    else:
+        title = f"Security advisory: {topic}"
+    return {
+        "schema_version": "0.1",
+        "event_id": f"offchain:{protocol}:{kind}:{slug}-{serial}",
+        "source": "offchain",
+        "kind": kind,
+        "protocol": protocol,
+        "event_time": _iso(event_time),
+        "ingest_time": _iso(ingest_time),
+        "severity": severity,
+        "title": title,
+        "summary": f"Discussion of {topic}; {rng.choice(ASSETS)} holders and integrators are affected.",
+        "source_url": f"{url_prefix}/{slug}/{serial}",
+        "entities": [first, second],
+        "tags": [kind, slug.split("-")[0]],
+        "raw": {"source": url_prefix.split("/")[2], "topic_id": serial},
+    }
+
+
+def generate_events(count: int, config: Optional[SyntheticConfig] = None) -> Iterator[dict]:
+    """Yield ``count`` schema-valid event dicts in ingest (arrival) order.
+
+    The stream is a pure function of ``count`` and ``config``: the same seed
+    always produces byte-identical output.
+    """
+    config = config or SyntheticConfig()
+    rng = random.Random(config.seed)
+    groups = _Groups(rng)
+    gap = config.duration.total_seconds() / max(1, count)
+    origin = clock = config.start.timestamp()
+    late_max = config.late_max.total_seconds()
+    final_burst = min(config.burst_size[1], max(1, count // 50))
+    recent: Deque[dict] = deque(maxlen=256)
+    burst_left = 0
+    burst_group: Optional[Tuple[bool, tuple]] = None
+    for index in range(count):
+        if burst_left == 0 and index == count - final_burst:
+            burst_left, burst_group = final_burst, (True, groups.pick(True))
+        elif burst_left == 0 and rng.random() < config.burst_rate:
+            onchain = rng.random() < config.onchain_share
+            burst_left, burst_group = rng.randint(*config.burst_size), (onchain, groups.pick(onchain))
+        if recent and burst_left == 0 and rng.random() < config.duplicate_share:
+            clock += gap
+            yield rng.choice(recent)
+            continue
+        in_burst = burst_left > 0
+        if in_burst:
+            burst_left -= 1
+            onchain, group = burst_group
+            clock += rng.expovariate(1.0 / (gap * config.burst_spacing))
+        else:
+            onchain = rng.random() < config.onchain_share
+            group = groups.pick(onchain)
+            clock += rng.expovariate(1.0 / gap)
+        ingest_time = clock + rng.uniform(2.0, 60.0)
+        event_time = clock
+        if not in_burst and rng.random() < config.late_share:
+            event_time = clock - rng.uniform(60.0, late_max)
+        if onchain:
+            block_number = START_BLOCK + int(event_time - origin) // BLOCK_SECONDS
+            event = _onchain_event(rng, group, event_time, ingest_time, block_number, in_burst)
+        else:
+            event = _offchain_event(rng, group, event_time, ingest_time, index)
+        recent.append(event)
+        yield event
+
+
+def write_events(path: Path, count: int, config: Optional[SyntheticConfig] = None) -> Dict[str, int]:
+    """Write a generated stream as JSONL and return per-source counts."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    counts: Dict[str, int] = {}
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with tmp_path.open("w", encoding="utf-8") as handle:
+        for event in generate_events(count, config):
+            handle.write(json.dumps(event, separators=(",", ":")) + "\n")
+            counts[event["source"]] = counts.get(event["source"], 0) + 1
+    tmp_path.replace(path)
+    return counts
@@ -0,0 +1,440 @@
+from __future__ import annotations
+
+import bisect
+import json
+import math
+import re
+import statistics
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from features.store import ANOMALY_MIN_COUNT_1H, ANOMALY_MIN_SURGE_RATIO, COUNTED_EVENTS, record_stage
+
+if TYPE_CHECKING:
+    import duckdb
+    import numpy as np
+
+# Feature windows in ``features.store.window_counts_sql``.
+WINDOWS = {"count_1h": timedelta(hours=1), "count_24h": timedelta(hours=24), "count_7d": timedelta(days=7)}
+DEFAULT_STEP = timedelta(hours=1)
+DEFAULT_MAX_LEAD = timedelta(hours=24)
+DEFAULT_GRACE = timedelta(hours=1)
+# Steps evaluated per block; bounds the size of the per-step feature arrays.
+STEP_BLOCK = 4096
+
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+Group = Tuple[str, str, str]
+
+
+def parse_duration(value: str) -> timedelta:
+    """``timedelta`` for ``"90s"``, ``"15m"``, ``"1h"``, ``"7d"`` or ``"2w"``."""
+    match = re.fullmatch(r"\s*([0-9]+(?:\.[0-9]+)?)\s*([smhdw])\s*", value.lower())
+    if match is None:
+        raise ValueError(f"invalid duration {value!r}; expected e.g. 15m, 1h or 7d")
+    return timedelta(seconds=float(match.group(1)) * _DURATION_UNITS[match.group(2)])
+
+
+def parse_time(value: str) -> datetime:
+    """Naive UTC ``datetime`` from an ISO 8601 string, matching ``event_time_ts``."""
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _micros(delta: timedelta) -> int:
+    return round(delta.total_seconds() * 1_000_000)
+
+
+@dataclass
+class FeatureHistory:
+    """Event counts per group in fixed buckets, precomputed once for a replay.
+
+    Bucket ``k`` holds events with ``(k - 1) * resolution < event_time <=
+    k * resolution`` (microseconds since the epoch), offset so row 0 is
+    ``first_bucket``. ``cumulative`` has one extra leading row of zeros, so
+    the count over buckets ``a+1..b`` is ``cumulative[b+1] - cumulative[a+1]``.
+    """
+
+    groups: List[Group]
+    resolution: timedelta
+    first_bucket: int
+    cumulative: "np.ndarray"
+    events: int
+
+    @property
+    def buckets(self) -> int:
+        return self.cumulative.shape[0] - 1
+
+    def bucket_end(self, index: int) -> datetime:
+        micros = (self.first_bucket + index) * _micros(self.resolution)
+        return datetime(1970, 1, 1) + timedelta(microseconds=micros)
+
+    def bucket_of(self, moment: datetime) -> int:
+        """Index of the bucket whose end is ``moment``, rounded down to the grid."""
+        micros = _micros(moment - datetime(1970, 1, 1))
+        return micros // _micros(self.resolution) - self.first_bucket
+
+
+def load_history(conn: duckdb.DuckDBPyConnection, resolution: timedelta) -> FeatureHistory:
+    """Aggregate the ``events`` table into ``resolution``-wide buckets per group.
+
+    One ``GROUP BY`` over the stored events; every later step of a replay
+    reads the cumulative sums instead of going back to SQL.
+    """
+    import numpy as np
+
+    started = time.perf_counter()
+    width = _micros(resolution)
+    if width <= 0:
+        raise ValueError("resolution must be positive")
+    rows = conn.execute(
+        f"""
+        SELECT
+            protocol,
+            source,
+            kind,
+            (epoch_us(event_time_ts) + {width - 1}) // {width} AS bucket,
+            count(*) AS events
+        FROM events
+        WHERE event_time_ts IS NOT NULL AND {COUNTED_EVENTS}
+        GROUP BY 1, 2, 3, 4
+        """
+    ).fetchall()
+    groups = sorted({(row[0], row[1], row[2]) for row in rows}, key=lambda group: tuple(str(part) for part in group))
+    if not rows:
+        return FeatureHistory(groups, resolution, 0, np.zeros((1, 0), dtype=np.int64), 0)
+    columns = {group: index for index, group in enumerate(groups)}
+    buckets = np.fromiter((row[3] for row in rows), dtype=np.int64, count=len(rows))
+    first = int(buckets.min())
+    counts = np.zeros((int(buckets.max()) - first + 2, len(groups)), dtype=np.int64)
+    group_index = np.fromiter((columns[(row[0], row[1], row[2])] for row in rows), dtype=np.int64, count=len(rows))
+    np.add.at(counts, (buckets - first + 1, group_index), np.fromiter((row[4] for row in rows), dtype=np.int64, count=len(rows)))
+    cumulative = np.cumsum(counts, axis=0, out=counts)
+    total = int(cumulative[-1].sum())
+    record_stage("backtest_history", total, started)
+    return FeatureHistory(groups, resolution, first, cumulative, total)
+
+
+@dataclass
+class FeatureFrame:
+    """``FeatureRow`` columns for a block of steps: arrays of shape ``(steps, groups)``.
+
+    ``protocol``, ``source`` and ``kind`` are per-group arrays that broadcast
+    against the feature columns; ``present`` marks groups with any event up
+    to the step, the rows ``compute_features`` would return.
+    """
+
+    times: List[datetime]
+    protocol: "np.ndarray"
+    source: "np.ndarray"
+    kind: "np.ndarray"
+    count_1h: "np.ndarray"
+    count_24h: "np.ndarray"
+    count_7d: "np.ndarray"
+    expected_1h: "np.ndarray"
+    surge_ratio: "np.ndarray"
+    present: "np.ndarray"
+
+
+Rule = Callable[[FeatureFrame], "np.ndarray"]
+
+
+def default_rule(frame: FeatureFrame) -> "np.ndarray":
+    """``find_anomalies`` as a vectorized predicate."""
+    return (frame.count_1h >= ANOMALY_MIN_COUNT_1H) & (frame.surge_ratio >= ANOMALY_MIN_SURGE_RATIO)
+
+
+@dataclass(frozen=True)
+class Incident:
+    """A labeled incident; ``source``/``kind`` narrow the matching groups when set."""
+
+    protocol: str
+    start: datetime
+    end: Optional[datetime] = None
+    source: Optional[str] = None
+    kind: Optional[str] = None
+    label: str = ""
+
+    def matches(self, group: Group) -> bool:
+        protocol, source, kind = group
+        return (
+            protocol == self.protocol
+            and (self.source is None or source == self.source)
+            and (self.kind is None or kind == self.kind)
+        )
+
+
+def read_incidents(path: Path) -> List[Incident]:
+    """Incidents from JSONL: ``protocol`` and ``start`` required; ``end``, ``source``, ``kind``, ``label`` optional."""
+    incidents: List[Incident] = []
+    with path.open("r", encoding="utf-8") as handle:
+        for number, line in enumerate(handle, start=1):
+            text = line.strip()
+            if not text or text.startswith("#"):
+                continue
+            item = json.loads(text)
+            try:
+                incidents.append(
+                    Incident(
+                        protocol=item["protocol"],
+                        start=parse_time(item["start"]),
+                        end=parse_time(item["end"]) if item.get("end") else None,
+                        source=item.get("source"),
+                        kind=item.get("kind"),
+                        label=item.get("label", ""),
+                    )
+                )
+            except (KeyError, ValueError) as exc:
+                raise ValueError(f"{path}:{number}: invalid incident ({exc})") from exc
+    return incidents
+
+
+@dataclass(frozen=True)
+class Alert:
+    """A rule firing: the condition became true for ``group`` at ``at``."""
+
+    protocol: str
+    source: str
+    kind: str
+    at: datetime
+    count_1h: int
+    surge_ratio: float
+
+    @property
+    def group(self) -> Group:
+        return (self.protocol, self.source, self.kind)
+
+
+@dataclass
+class BacktestReport:
+    start: datetime
+    end: datetime
+    step: timedelta
+    steps: int
+    groups: int
+    firing_steps: int
+    alerts: List[Alert]
+    incidents: int = 0
+    detected: int = 0
+    matched_alerts: int = 0
+    lead_seconds: List[float] = field(default_factory=list)
+    seconds: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def precision(self) -> Optional[float]:
+        return self.matched_alerts / len(self.alerts) if self.alerts and self.incidents else None
+
+    @property
+    def recall(self) -> Optional[float]:
+        return self.detected / self.incidents if self.incidents else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        by_group: Dict[str, int] = {}
+        for alert in self.alerts:
+            key = "/".join(str(part) for part in alert.group)
+            by_group[key] = by_group.get(key, 0) + 1
+        leads = self.lead_seconds
+        return {
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat(),
+            "step_seconds": self.step.total_seconds(),
+            "steps": self.steps,
+            "groups": self.groups,
+            "firing_steps": self.firing_steps,
+            "alerts": len(self.alerts),
+            "alerts_by_group": dict(sorted(by_group.items(), key=lambda item: item[1], reverse=True)),
+            "incidents": self.incidents,
+            "detected": self.detected,
+            "precision": self.precision,
+            "recall": self.recall,
+            "lead_seconds": {
+                "median": statistics.median(leads) if leads else None,
+                "mean": statistics.fmean(leads) if leads else None,
+                "min": min(leads) if leads else None,
+                "max": max(leads) if leads else None,
+            },
+            "seconds": self.seconds,
+            "alert_list": [
+                {
+                    "protocol": alert.protocol,
+                    "source": alert.source,
+                    "kind": alert.kind,
+                    "at": alert.at.isoformat(),
+                    "count_1h": alert.count_1h,
+                    "surge_ratio": alert.surge_ratio,
+                }
+                for alert in self.alerts
+            ],
+        }
+
+
+def bucket_resolution(step: timedelta) -> timedelta:
+    """Coarsest bucket width that divides both ``step`` and every feature window."""
+    micros = _micros(step)
+    if micros <= 0:
+        raise ValueError("step must be positive")
+    for window in WINDOWS.values():
+        micros = math.gcd(micros, _micros(window))
+    return timedelta(microseconds=micros)
+
+
+def replay(
+    history: FeatureHistory,
+    step: timedelta,
+    rule: Rule = default_rule,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> BacktestReport:
+    """Evaluate ``rule`` at every ``step`` between ``start`` and ``end``.
+
+    The simulated clock sits on multiples of ``step`` since the epoch and
+    defaults to the span of the history. At each tick the features are
+    what ``compute_features`` would report with that tick as ``as_of``,
+    except that windows are half-open: an event exactly one window before
+    the tick is not counted. Alerts are rising edges of the rule per group.
+    """
+    import numpy as np
+
+    started = time.perf_counter()
+    if _micros(step) % _micros(history.resolution):
+        raise ValueError("step must be a multiple of the history resolution")
+    stride = _micros(step) // _micros(history.resolution)
+    if history.buckets == 0 or not history.groups:
+        moment = start or end or datetime(1970, 1, 1)
+        return BacktestReport(moment, end or moment, step, 0, 0, 0, [])
+
+    first = history.bucket_of(start) if start is not None else 0
+    last = history.bucket_of(end) if end is not None else history.buckets - 1
+    # Ticks on the step grid: bucket indexes whose absolute number divides by ``stride``.
+    first += -(history.first_bucket + first) % stride
+    ticks = np.arange(first, last + 1, stride, dtype=np.int64)
+    if len(ticks) == 0:
+        moment = start or history.bucket_end(first)
+        return BacktestReport(moment, end or moment, step, 0, len(history.groups), 0, [])
+
+    cumulative = history.cumulative
+    limit = history.buckets
+    widths = {name: _micros(window) // _micros(history.resolution) for name, window in WINDOWS.items()}
+    protocols = np.array([group[0] for group in history.groups], dtype=object)
+    sources = np.array([group[1] for group in history.groups], dtype=object)
+    kinds = np.array([group[2] for group in history.groups], dtype=object)
+
+    alerts: List[Alert] = []
+    firing_steps = 0
+    previous = np.zeros(len(history.groups), dtype=bool)
+    for offset in range(0, len(ticks), STEP_BLOCK):
+        block = ticks[offset : offset + STEP_BLOCK]
+        upper = cumulative[np.clip(block + 1, 0, limit)]
+        counts = {
+            name: upper - cumulative[np.clip(block + 1 - width, 0, limit)]
+            for name, width in widths.items()
+        }
+        expected = counts["count_24h"] / 24.0
+        frame = FeatureFrame(
+            times=[history.bucket_end(int(index)) for index in block],
+            protocol=protocols,
+            source=sources,
+            kind=kinds,
+            count_1h=counts["count_1h"],
+            count_24h=counts["count_24h"],
+            count_7d=counts["count_7d"],
+            expected_1h=expected,
+            surge_ratio=(counts["count_1h"] + 1.0) / (expected + 1.0),
+            present=upper > 0,
+        )
+        firing = np.asarray(rule(frame), dtype=bool) & frame.present
+        firing_steps += int(firing.sum())
+        rising = firing & ~np.vstack([previous[None, :], firing[:-1]])
+        previous = firing[-1]
+        for row, column in zip(*np.nonzero(rising)):
+            protocol, source, kind = history.groups[column]
+            alerts.append(
+                Alert(
+                    protocol=protocol,
+                    source=source,
+                    kind=kind,
+                    at=frame.times[row],
+                    count_1h=int(frame.count_1h[row, column]),
+                    surge_ratio=round(float(frame.surge_ratio[row, column]), 6),
+                )
+            )
+    alerts.sort(key=lambda alert: (alert.at, alert.group))
+    report = BacktestReport(
+        start=history.bucket_end(int(ticks[0])),
+        end=history.bucket_end(int(ticks[-1])),
+        step=step,
+        steps=len(ticks),
+        groups=len(history.groups),
+        firing_steps=firing_steps,
+        alerts=alerts,
+    )
+    record_stage("backtest", len(ticks) * len(history.groups), started)
+    report.seconds["replay"] = round(time.perf_counter() - started, 6)
+    return report
+
+
+def score(
+    report: BacktestReport,
+    incidents: Sequence[Incident],
+    max_lead: timedelta = DEFAULT_MAX_LEAD,
+    grace: timedelta = DEFAULT_GRACE,
+) -> BacktestReport:
+    """Match alerts to incidents; fills precision, recall and lead times in place.
+
+    An alert matches an incident on a matching group from ``max_lead``
+    before its start until ``grace`` after its end (or start). Lead time is
+    the incident start minus its first matching alert, negative when the
+    alert came late. Incidents outside the replayed span are ignored.
+    """
+    scored = [
+        incident
+        for incident in incidents
+        if report.start - max_lead <= incident.start <= report.end + max_lead
+    ]
+    times = [alert.at for alert in report.alerts]
+    matched = set()
+    leads: List[float] = []
+    for incident in scored:
+        opens = bisect.bisect_left(times, incident.start - max_lead)
+        closes = bisect.bisect_right(times, (incident.end or incident.start) + grace)
+        first: Optional[datetime] = None
+        for index in range(opens, closes):
+            alert = report.alerts[index]
+            if incident.matches(alert.group):
+                matched.add(index)
+                if first is None:
+                    first = alert.at
+        if first is not None:
+            leads.append((incident.start - first).total_seconds())
+    report.incidents = len(scored)
+    report.detected = len(leads)
+    report.matched_alerts = len(matched)
+    report.lead_seconds = leads
+    return report
+
+
+def run_backtest(
+    conn: duckdb.DuckDBPyConnection,
+    step: timedelta = DEFAULT_STEP,
+    rule: Rule = default_rule,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    incidents: Sequence[Incident] = (),
+    max_lead: timedelta = DEFAULT_MAX_LEAD,
+    grace: timedelta = DEFAULT_GRACE,
+) -> BacktestReport:
+    """Load the bucketed history once, replay ``rule`` over it and score it."""
+    started = time.perf_counter()
+    history = load_history(conn, bucket_resolution(step))
+    loaded = time.perf_counter()
+    report = replay(history, step, rule, start, end)
+    report.seconds["history"] = round(loaded - started, 6)
+    if incidents:
+        score(report, incidents, max_lead, grace)
+    report.seconds["total"] = round(time.perf_counter() - started, 6)
+    return report
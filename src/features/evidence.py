@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import json
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from features.store import COUNTED_EVENTS, FeatureRow, feature_row_dict, record_stage
+
+if TYPE_CHECKING:
+    import duckdb
+
+    from rag.index import RagConfig
+
+EVIDENCE_NAME = "evidence.jsonl"
+EVIDENCE_WINDOW = timedelta(hours=1)
+EVIDENCE_EVENT_LIMIT = 10
+EVIDENCE_DOC_LIMIT = 5
+SNIPPET_CHARS = 280
+
+GroupKey = Tuple[str, str, str]
+
+_EVENT_FIELDS = ("event_id", "event_time", "title", "severity", "source_url", "tx_hash")
+
+
+def anomaly_key(row: FeatureRow) -> GroupKey:
+    return (row.protocol, row.source, row.kind)
+
+
+def window_events(
+    conn: duckdb.DuckDBPyConnection,
+    anomalies: Sequence[FeatureRow],
+    limit: int = EVIDENCE_EVENT_LIMIT,
+) -> Dict[GroupKey, List[dict]]:
+    """Latest events inside each anomaly's 1h window, fetched in one query."""
+    if not anomalies:
+        return {}
+    keys = ", ".join("(?, ?, ?, ?, ?)" for _ in anomalies)
+    params: List[Any] = []
+    for row in anomalies:
+        params.extend([row.protocol, row.source, row.kind, row.as_of - EVIDENCE_WINDOW, row.as_of])
+    columns = ", ".join(f"e.{name}" for name in _EVENT_FIELDS)
+    rows = conn.execute(
+        f"""
+        WITH anomaly(protocol, source, kind, window_start, window_end) AS (VALUES {keys}),
+        ranked AS (
+            SELECT
+                e.protocol, e.source, e.kind, {columns},
+                row_number() OVER (
+                    PARTITION BY e.protocol, e.source, e.kind
+                    ORDER BY e.event_time_ts DESC, e.event_id
+                ) AS rank
+            FROM events AS e
+            JOIN anomaly AS a
+              ON e.protocol = a.protocol AND e.source = a.source AND e.kind = a.kind
+             AND e.event_time_ts >= CAST(a.window_start AS TIMESTAMP)
+             AND e.event_time_ts <= CAST(a.window_end AS TIMESTAMP)
+            WHERE {COUNTED_EVENTS}
+        )
+        SELECT * EXCLUDE (rank) FROM ranked WHERE rank <= ? ORDER BY protocol, source, kind, rank
+        """,
+        params + [limit],
+    ).fetchall()
+    results: Dict[GroupKey, List[dict]] = {}
+    for row in rows:
+        event = {
+            name: value.isoformat() if hasattr(value, "isoformat") else value
+            for name, value in zip(_EVENT_FIELDS, row[3:])
+            if value is not None
+        }
+        results.setdefault((row[0], row[1], row[2]), []).append(event)
+    return results
+
+
+def _evidence_query(row: FeatureRow, events: Sequence[dict]) -> str:
+    titles = [str(event["title"]) for event in events[:3] if event.get("title")]
+    return " ".join([row.protocol, row.kind.replace("_", " "), *titles])
+
+
+def related_documents(
+    config: Optional[RagConfig],
+    anomalies: Sequence[FeatureRow],
+    events: Dict[GroupKey, List[dict]],
+    limit: int = EVIDENCE_DOC_LIMIT,
+) -> Dict[GroupKey, List[dict]]:
+    """Nearest RAG documents per anomaly, retrieved as one batch.
+
+    Returns an empty mapping when no index is configured, the RAG extras
+    are not installed or an index build is swapping the files underneath;
+    evidence then cites window events only.
+    """
+    if config is None or not anomalies or not config.persist_dir.exists():
+        return {}
+    try:
+        from rag.filters import QueryFilters
+        from rag.index import QueryRequest, query_many
+
+        requests = [
+            QueryRequest(
+                _evidence_query(row, events.get(anomaly_key(row), [])),
+                top_k=limit,
+                filters=QueryFilters(protocol=(row.protocol,), until=row.as_of),
+            )
+            for row in anomalies
+        ]
+        results = query_many(config, requests)
+    except (ImportError, FileNotFoundError):
+        return {}
+    documents: Dict[GroupKey, List[dict]] = {}
+    for row, result in zip(anomalies, results):
+        documents[anomaly_key(row)] = [
+            {
+                "doc_id": doc_id,
+                "event_id": meta.get("event_id"),
+                "source_url": meta.get("source_url"),
+                "event_time": meta.get("event_time"),
+                "snippet": text[:SNIPPET_CHARS],
+                "score": round(score, 6),
+            }
+            for doc_id, text, meta, score in zip(
+                result["ids"][0], result["documents"][0], result["metadatas"][0], result["scores"][0]
+            )
+        ]
+    return documents
+
+
+def _citations(events: Sequence[dict], documents: Sequence[dict]) -> List[dict]:
+    """Number events then documents; a document from an already-cited event reuses its ref."""
+    citations: List[dict] = []
+    event_refs: Dict[Any, int] = {}
+    for event in events:
+        event["ref"] = event_refs[event.get("event_id")] = len(citations) + 1
+        citations.append(
+            {
+                "ref": event["ref"],
+                "type": "event",
+                "event_id": event.get("event_id"),
+                "title": event.get("title"),
+                "url": event.get("source_url"),
+            }
+        )
+    for document in documents:
+        ref = event_refs.get(document.get("event_id"))
+        if ref is None:
+            ref = event_refs[document.get("event_id")] = len(citations) + 1
+            citations.append(
+                {
+                    "ref": ref,
+                    "type": "document",
+                    "event_id": document.get("event_id"),
+                    "doc_id": document.get("doc_id"),
+                    "url": document.get("source_url"),
+                }
+            )
+        document["ref"] = ref
+    return citations
+
+
+def build_evidence(
+    conn: duckdb.DuckDBPyConnection,
+    anomalies: Sequence[FeatureRow],
+    rag_config: Optional[RagConfig] = None,
+) -> Dict[GroupKey, dict]:
+    """Join each anomaly with its window events and related documents.
+
+    Bundles carry numbered ``citations`` and every event or document points at
+    its entry through ``ref``, so readers can render the evidence as is.
+    """
+    started = time.perf_counter()
+    events = window_events(conn, anomalies)
+    documents = related_documents(rag_config, anomalies, events)
+    bundles: Dict[GroupKey, dict] = {}
+    for row in anomalies:
+        key = anomaly_key(row)
+        row_events = [dict(event) for event in events.get(key, [])]
+        row_documents = [dict(document) for document in documents.get(key, [])]
+        bundles[key] = {
+            "anomaly": feature_row_dict(row),
+            "window": {
+                "start": (row.as_of - EVIDENCE_WINDOW).isoformat(),
+                "end": row.as_of.isoformat(),
+            },
+            "events": row_events,
+            "documents": row_documents,
+            "citations": _citations(row_events, row_documents),
+        }
+    record_stage("evidence", len(bundles), started)
+    return bundles
+
+
+def write_evidence(bundles: Dict[GroupKey, dict], out_dir: Path) -> Path:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / EVIDENCE_NAME
+    with path.open("w", encoding="utf-8") as handle:
+        for bundle in bundles.values():
+            handle.write(json.dumps(bundle, separators=(",", ":"), default=str) + "\n")
+    return path
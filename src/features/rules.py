@@ -0,0 +1,486 @@
+from __future__ import annotations
+
+import json
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from features.backtest import parse_duration, parse_time
+from features.store import ANOMALY_COUNT, FeatureRow, record_stage
+from observability.metrics import counter
+
+if TYPE_CHECKING:
+    import numpy as np
+
+    from features.backtest import FeatureFrame
+
+ALERTS = counter("sentinel_alerts_total", "Rule alerts emitted after dedup and cooldown", ("severity",))
+ALERTS_SUPPRESSED = counter(
+    "sentinel_alerts_suppressed_total", "Rule matches not emitted as alerts", ("reason",)
+)
+
+# Same order as ``normalize.schema.Severity``; later is more severe.
+SEVERITIES = ("info", "low", "medium", "high", "critical")
+KEY_COLUMNS = ("protocol", "source", "kind")
+FEATURE_COLUMNS = ("count_1h", "count_24h", "count_7d", "expected_1h", "surge_ratio")
+OPERATORS = {
+    ">=": "greater_equal",
+    ">": "greater",
+    "<=": "less_equal",
+    "<": "less",
+    "==": "equal",
+    "!=": "not_equal",
+}
+ANY = "*"
+
+
+@dataclass(frozen=True)
+class Condition:
+    column: str
+    op: str
+    value: float
+
+
+@dataclass(frozen=True)
+class Rule:
+    """One declarative alert rule.
+
+    ``match`` limits the rule to feature keys whose columns take one of the
+    listed values; columns it leaves out match anything. ``group`` names the
+    alert identity: among rules sharing a group, one alert per key and tick
+    (the most severe) survives, and ``cooldown`` applies to the group.
+    """
+
+    rule_id: str
+    conditions: Tuple[Condition, ...]
+    match: Tuple[Tuple[str, Tuple[str, ...]], ...] = ()
+    severity: str = "medium"
+    severity_field: str = "surge_ratio"
+    # (lower bound, severity) in ascending order; overrides ``severity`` from the first bound up.
+    severity_bands: Tuple[Tuple[float, str], ...] = ()
+    cooldown: timedelta = timedelta(0)
+    group: str = ""
+
+    @property
+    def alert_group(self) -> str:
+        return self.group or self.rule_id
+
+    def severity_for(self, value: float) -> str:
+        severity = self.severity
+        for bound, band in self.severity_bands:
+            if value >= bound:
+                severity = band
+        return severity
+
+
+def _severity(value: Any, where: str) -> str:
+    if value not in SEVERITIES:
+        raise ValueError(f"{where}: severity must be one of {', '.join(SEVERITIES)}")
+    return value
+
+
+def parse_rule(item: Mapping[str, Any], defaults: Mapping[str, Any], where: str) -> Rule:
+    """``Rule`` from one entry of a rules file; see docs/FEATURE_STORE.md for the format."""
+    merged = {**defaults, **item}
+    rule_id = merged.get("id")
+    if not rule_id or not isinstance(rule_id, str):
+        raise ValueError(f"{where}: every rule needs a string id")
+    where = f"{where} ({rule_id})"
+
+    conditions: List[Condition] = []
+    when = merged.get("when")
+    if not isinstance(when, Mapping) or not when:
+        raise ValueError(f"{where}: 'when' must map feature columns to thresholds")
+    for column, test in sorted(when.items()):
+        if column not in FEATURE_COLUMNS:
+            raise ValueError(f"{where}: unknown feature column {column!r}")
+        tests = test if isinstance(test, Mapping) else {">=": test}
+        for op, value in sorted(tests.items()):
+            if op not in OPERATORS:
+                raise ValueError(f"{where}: unknown operator {op!r}")
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{where}: threshold for {column} {op} must be a number")
+            conditions.append(Condition(column, op, float(value)))
+
+    match: List[Tuple[str, Tuple[str, ...]]] = []
+    for column, values in sorted((merged.get("match") or {}).items()):
+        options = (values,) if isinstance(values, str) else tuple(values)
+        if not options or not all(isinstance(value, str) for value in options):
+            raise ValueError(f"{where}: match values for {column} must be strings")
+        if ANY not in options:
+            match.append((column, tuple(sorted(set(options)))))
+
+    severity = merged.get("severity", "medium")
+    severity_field = "surge_ratio"
+    bands: Tuple[Tuple[float, str], ...] = ()
+    if isinstance(severity, Mapping):
+        severity_field = severity.get("field", severity_field)
+        if severity_field not in FEATURE_COLUMNS:
+            raise ValueError(f"{where}: unknown severity field {severity_field!r}")
+        raw_bands = severity.get("bands") or {}
+        items = raw_bands.items() if isinstance(raw_bands, Mapping) else raw_bands
+        try:
+            bands = tuple(sorted((float(bound), _severity(name, where)) for bound, name in items))
+        except (TypeError, ValueError) as exc:
+            raise ValueError(f"{where}: severity bands must map numbers to severities") from exc
+        if not bands:
+            raise ValueError(f"{where}: severity bands are empty")
+        severity = _severity(severity.get("default", bands[0][1]), where)
+    else:
+        severity = _severity(severity, where)
+
+    cooldown = merged.get("cooldown") or "0s"
+    return Rule(
+        rule_id=rule_id,
+        conditions=tuple(conditions),
+        match=tuple(match),
+        severity=severity,
+        severity_field=severity_field,
+        severity_bands=bands,
+        cooldown=parse_duration(cooldown) if isinstance(cooldown, str) else timedelta(seconds=float(cooldown)),
+        group=str(merged.get("group") or ""),
+    )
+
+
+def load_rules(path: Path) -> List[Rule]:
+    """Rules from a JSON file, or from every ``*.json`` file in a directory.
+
+    A file holds a list of rules or ``{"defaults": {...}, "rules": [...]}``,
+    where ``defaults`` fills keys a rule leaves out. Rule ids must be unique.
+    """
+    files = sorted(path.glob("*.json")) if path.is_dir() else [path]
+    rules: List[Rule] = []
+    seen: Dict[str, Path] = {}
+    for file in files:
+        payload = json.loads(file.read_text(encoding="utf-8"))
+        defaults: Mapping[str, Any] = {}
+        if isinstance(payload, Mapping):
+            defaults = payload.get("defaults") or {}
+            payload = payload.get("rules") or []
+        for index, item in enumerate(payload):
+            rule = parse_rule(item, defaults, f"{file}[{index}]")
+            if rule.rule_id in seen:
+                raise ValueError(f"rule id {rule.rule_id!r} is defined in {seen[rule.rule_id]} and {file}")
+            seen[rule.rule_id] = file
+            rules.append(rule)
+    return rules
+
+
+@dataclass
+class _Block:
+    """Rules with the same match columns and the same ``(column, op)`` conditions.
+
+    A rule matching several values of a column appears once per value
+    combination; ``codes`` holds each row's combined selector code, sorted.
+    """
+
+    columns: Tuple[str, ...]
+    signature: Tuple[Tuple[str, str], ...]
+    rules: "np.ndarray"
+    codes: "np.ndarray"
+    thresholds: "np.ndarray"
+
+
+@dataclass(frozen=True)
+class RuleAlert:
+    """A rule firing on row ``index`` of the evaluated batch."""
+
+    rule_id: str
+    group: str
+    severity: str
+    index: int
+
+
+@dataclass
+class AlertState:
+    """Last alert time per ``(group, key)`` for cooldowns, persisted between builds."""
+
+    last: Dict[str, datetime] = field(default_factory=dict)
+
+    @staticmethod
+    def key(group: str, values: Sequence[Any]) -> str:
+        return "\x1f".join([group, *(str(value) for value in values)])
+
+    @classmethod
+    def load(cls, path: Path) -> "AlertState":
+        if not path.exists():
+            return cls()
+        payload = json.loads(path.read_text(encoding="utf-8"))
+        return cls({key: parse_time(value) for key, value in payload.get("last", {}).items()})
+
+    def save(self, path: Path, now: datetime, keep: timedelta) -> None:
+        """Write the state, dropping entries older than ``keep`` (the longest cooldown)."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        last = {key: moment.isoformat() for key, moment in self.last.items() if now - moment < keep}
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(json.dumps({"last": last}, sort_keys=True) + "\n", encoding="utf-8")
+        tmp_path.replace(path)
+
+
+class RuleSet:
+    """Rules compiled into vectorized blocks.
+
+    Evaluation is one pass per block: each key column is encoded once, the
+    (rule, key) candidate pairs come from a sorted lookup of the keys'
+    selector codes, and every condition is a single numpy comparison over
+    all pairs of the block. Rules only cost work for keys they can match.
+    """
+
+    def __init__(self, rules: Sequence[Rule]) -> None:
+        import numpy as np
+
+        self.rules = list(rules)
+        self._vocab: Dict[str, Dict[str, int]] = {}
+        for rule in self.rules:
+            for column, values in rule.match:
+                vocab = self._vocab.setdefault(column, {})
+                for value in values:
+                    vocab.setdefault(value, len(vocab))
+        self._groups = {group: index for index, group in enumerate(dict.fromkeys(rule.alert_group for rule in self.rules))}
+        self._rule_group = np.array([self._groups[rule.alert_group] for rule in self.rules], dtype=np.int64)
+        self._fixed_rank = np.array([SEVERITIES.index(rule.severity) for rule in self.rules], dtype=np.int64)
+        # Severity bands padded to one width: bounds past a rule's last band are +inf.
+        width = max((len(rule.severity_bands) for rule in self.rules), default=0)
+        self._band_bounds = np.full((len(self.rules), width), np.inf)
+        self._band_ranks = np.zeros((len(self.rules), width), dtype=np.int64)
+        for index, rule in enumerate(self.rules):
+            for position, (bound, severity) in enumerate(rule.severity_bands):
+                self._band_bounds[index, position] = bound
+                self._band_ranks[index, position] = SEVERITIES.index(severity)
+        self._band_fields = sorted({rule.severity_field for rule in self.rules if rule.severity_bands})
+        self._rule_field = np.array(
+            [self._band_fields.index(rule.severity_field) if rule.severity_bands else -1 for rule in self.rules],
+            dtype=np.int64,
+        )
+
+        grouped: Dict[Tuple[Tuple[str, ...], Tuple[Tuple[str, str], ...]], List[Tuple[int, Tuple[str, ...]]]] = {}
+        for index, rule in enumerate(self.rules):
+            columns = tuple(column for column, _ in rule.match)
+            signature = tuple((condition.column, condition.op) for condition in rule.conditions)
+            rows = grouped.setdefault((columns, signature), [])
+            for combination in _combinations([values for _, values in rule.match]):
+                rows.append((index, combination))
+        self._blocks: List[_Block] = []
+        for (columns, signature), rows in grouped.items():
+            codes = np.array([self._code(columns, combination) for _, combination in rows], dtype=np.int64)
+            order = np.argsort(codes, kind="stable")
+            rule_index = np.array([index for index, _ in rows], dtype=np.int64)[order]
+            thresholds = np.array(
+                [[condition.value for condition in self.rules[index].conditions] for index in rule_index],
+                dtype=np.float64,
+            ).reshape(len(rule_index), len(signature))
+            self._blocks.append(_Block(columns, signature, rule_index, codes[order], thresholds))
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    @property
+    def longest_cooldown(self) -> timedelta:
+        return max((rule.cooldown for rule in self.rules), default=timedelta(0))
+
+    def _radix(self, columns: Tuple[str, ...]) -> List[int]:
+        return [len(self._vocab[column]) for column in columns]
+
+    def _code(self, columns: Tuple[str, ...], values: Sequence[str]) -> int:
+        code = 0
+        for column, value, size in zip(columns, values, self._radix(columns)):
+            code = code * size + self._vocab[column][value]
+        return code
+
+    def _encode_keys(self, keys: Mapping[str, Sequence[Any]]) -> Dict[str, "np.ndarray"]:
+        import numpy as np
+
+        encoded: Dict[str, np.ndarray] = {}
+        for column, vocab in self._vocab.items():
+            if column not in keys:
+                raise ValueError(f"rules match on {column!r}, which the feature keys do not have")
+            values = keys[column]
+            encoded[column] = np.fromiter((vocab.get(value, -1) for value in values), dtype=np.int64, count=len(values))
+        return encoded
+
+    def pairs(self, keys: Mapping[str, Sequence[Any]], size: int) -> List[Tuple[_Block, "np.ndarray", "np.ndarray"]]:
+        """Candidate ``(block, block_row, key_index)`` arrays for ``size`` keys."""
+        import numpy as np
+
+        encoded = self._encode_keys(keys)
+        result = []
+        everything = np.arange(size, dtype=np.int64)
+        for block in self._blocks:
+            if not block.columns:
+                rows = np.repeat(np.arange(len(block.rules), dtype=np.int64), size)
+                result.append((block, rows, np.tile(everything, len(block.rules))))
+                continue
+            code = np.zeros(size, dtype=np.int64)
+            valid = np.ones(size, dtype=bool)
+            for column, radix in zip(block.columns, self._radix(block.columns)):
+                values = encoded[column]
+                valid &= values >= 0
+                code = code * radix + values
+            lo = np.searchsorted(block.codes, code, side="left")
+            hi = np.searchsorted(block.codes, code, side="right")
+            counts = np.where(valid, hi - lo, 0)
+            total = int(counts.sum())
+            key_index = np.repeat(everything, counts)
+            offsets = np.arange(total, dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+            result.append((block, np.repeat(lo, counts) + offsets, key_index))
+        return result
+
+    def fired(
+        self, keys: Mapping[str, Sequence[Any]], features: Mapping[str, "np.ndarray"]
+    ) -> Tuple["np.ndarray", "np.ndarray"]:
+        """``(rule_index, key_index)`` of every rule whose conditions hold, in one pass per block.
+
+        ``features`` columns are 1-D arrays aligned with ``keys``.
+        """
+        import numpy as np
+
+        size = len(next(iter(features.values()))) if features else 0
+        rule_parts: List[np.ndarray] = []
+        key_parts: List[np.ndarray] = []
+        for block, rows, key_index in self.pairs(keys, size):
+            hit = np.ones(len(rows), dtype=bool)
+            for position, (column, op) in enumerate(block.signature):
+                compare = getattr(np, OPERATORS[op])
+                hit &= compare(features[column][key_index], block.thresholds[rows, position])
+            rule_parts.append(block.rules[rows[hit]])
+            key_parts.append(key_index[hit])
+        if not rule_parts:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        return np.concatenate(rule_parts), np.concatenate(key_parts)
+
+    def _rank(
+        self, rule_index: "np.ndarray", key_index: "np.ndarray", features: Mapping[str, "np.ndarray"]
+    ) -> "np.ndarray":
+        """Severity index of each fired pair: the fixed severity or the highest band reached."""
+        import numpy as np
+
+        rank = self._fixed_rank[rule_index]
+        for field_index, column in enumerate(self._band_fields):
+            banded = np.nonzero(self._rule_field[rule_index] == field_index)[0]
+            if not len(banded):
+                continue
+            rules = rule_index[banded]
+            values = features[column][key_index[banded]]
+            reached = (values[:, None] >= self._band_bounds[rules]).sum(axis=1)
+            top = self._band_ranks[rules, np.maximum(reached - 1, 0)]
+            rank[banded] = np.where(reached > 0, top, rank[banded])
+        return rank
+
+    def evaluate(
+        self,
+        keys: Mapping[str, Sequence[Any]],
+        features: Mapping[str, "np.ndarray"],
+        now: datetime,
+        state: Optional[AlertState] = None,
+    ) -> Tuple[List[RuleAlert], List[int]]:
+        """Alerts after dedup and cooldown, plus the indexes of every key any rule matched.
+
+        Per key and alert group only the most severe firing rule is kept
+        (ties go to the rule listed first). With ``state``, a group that
+        alerted on a key less than its rule's ``cooldown`` ago is suppressed,
+        and emitted alerts update ``state``.
+        """
+        import numpy as np
+
+        started = time.perf_counter()
+        rule_index, key_index = self.fired(keys, features)
+        matched = sorted(set(key_index.tolist()))
+        rank = self._rank(rule_index, key_index, features)
+        group = self._rule_group[rule_index]
+        order = np.lexsort((rule_index, -rank, group, key_index))
+        first = np.ones(len(order), dtype=bool)
+        if len(order) > 1:
+            first[1:] = (key_index[order][1:] != key_index[order][:-1]) | (group[order][1:] != group[order][:-1])
+        kept = order[first]
+        ALERTS_SUPPRESSED.inc(len(order) - len(kept), reason="duplicate")
+
+        key_columns = list(keys)
+        alerts: List[RuleAlert] = []
+        cooled = 0
+        for position in kept.tolist():
+            rule = self.rules[int(rule_index[position])]
+            index = int(key_index[position])
+            if state is not None:
+                state_key = AlertState.key(rule.alert_group, [keys[column][index] for column in key_columns])
+                last = state.last.get(state_key)
+                if last is not None and now - last < rule.cooldown:
+                    cooled += 1
+                    continue
+                state.last[state_key] = now
+            alerts.append(RuleAlert(rule.rule_id, rule.alert_group, SEVERITIES[int(rank[position])], index))
+        for severity, count in Counter(alert.severity for alert in alerts).items():
+            ALERTS.inc(count, severity=severity)
+        ALERTS_SUPPRESSED.inc(cooled, reason="cooldown")
+        record_stage("rules", len(rule_index), started)
+        return alerts, matched
+
+    def evaluate_rows(
+        self, rows: Sequence[FeatureRow], state: Optional[AlertState] = None
+    ) -> Tuple[List[RuleAlert], List[FeatureRow]]:
+        """``evaluate`` over a ``FeatureRow`` batch; the rows any rule matched are the anomalies."""
+        import numpy as np
+
+        keys = {column: [getattr(row, column) for row in rows] for column in KEY_COLUMNS}
+        features = {
+            column: np.fromiter((getattr(row, column) for row in rows), dtype=np.float64, count=len(rows))
+            for column in FEATURE_COLUMNS
+        }
+        now = max((row.as_of for row in rows), default=datetime(1970, 1, 1))
+        alerts, matched = self.evaluate(keys, features, now, state)
+        anomalies = [rows[index] for index in matched]
+        ANOMALY_COUNT.set(len(anomalies))
+        return alerts, anomalies
+
+    def mask(self, frame: FeatureFrame) -> "np.ndarray":
+        """Backtest rule: whether any rule holds, per step and group of ``frame``."""
+        import numpy as np
+
+        keys = {"protocol": frame.protocol, "source": frame.source, "kind": frame.kind}
+        size = len(frame.protocol)
+        result = np.zeros(frame.count_1h.shape, dtype=bool)
+        for block, rows, key_index in self.pairs(keys, size):
+            if not len(rows):
+                continue
+            hit = np.ones((result.shape[0], len(rows)), dtype=bool)
+            for position, (column, op) in enumerate(block.signature):
+                compare = getattr(np, OPERATORS[op])
+                hit &= compare(getattr(frame, column)[:, key_index], block.thresholds[rows, position])
+            np.logical_or.at(result.T, key_index, hit.T)
+        return result
+
+
+def _combinations(options: Sequence[Tuple[str, ...]]) -> List[Tuple[str, ...]]:
+    combinations: List[Tuple[str, ...]] = [()]
+    for values in options:
+        combinations = [combination + (value,) for combination in combinations for value in values]
+    return combinations
+
+
+def alert_dicts(alerts: Sequence[RuleAlert], rows: Sequence[FeatureRow]) -> List[dict]:
+    return [
+        {
+            "rule_id": alert.rule_id,
+            "group": alert.group,
+            "severity": alert.severity,
+            "protocol": rows[alert.index].protocol,
+            "source": rows[alert.index].source,
+            "kind": rows[alert.index].kind,
+            "count_1h": rows[alert.index].count_1h,
+            "surge_ratio": rows[alert.index].surge_ratio,
+            "as_of": rows[alert.index].as_of.isoformat(),
+        }
+        for alert in alerts
+    ]
+
+
+def write_alerts(alerts: Sequence[RuleAlert], rows: Sequence[FeatureRow], out_dir: Path) -> Path:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / "alerts.jsonl"
+    with path.open("w", encoding="utf-8") as handle:
+        for item in alert_dicts(alerts, rows):
+            handle.write(json.dumps(item, separators=(",", ":")) + "\n")
+    return path
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+from features.store import FeatureRow, build_brief, feature_row_dict
+
+if TYPE_CHECKING:
+    from normalize.batch import EventBatch
+
+MAGIC = b"DSNAP001"
+POINTER_NAME = "CURRENT"
+KEEP_SNAPSHOTS = 3
+_HEADER_LEN = struct.Struct("<Q")
+_OFFSET = struct.Struct("<Q")
+_ALIGN = 8
+EVENTS_PREFIX = "events."
+
+# Snapshot layout: MAGIC, u64 header length, JSON header, then raw sections.
+# The header maps section name -> [offset, length] relative to the end of the header.
+# JSON array sections come with a "<name>.idx" section of u64 end offsets so a
+# reader can serve the first N items by slicing, without parsing anything.
+# Sections start on 8-byte boundaries, so the "events.*" column buffers of an
+# EventBatch can be cast in place.
+
+
+def _encode_json_array(items: Sequence[dict], opening: bytes = b"[", closing: bytes = b"]") -> Tuple[bytes, bytes]:
+    parts = [opening]
+    ends: List[int] = []
+    size = len(opening)
+    for position, item in enumerate(items):
+        encoded = json.dumps(item, separators=(",", ":")).encode("utf-8")
+        if position:
+            parts.append(b",")
+            size += 1
+        parts.append(encoded)
+        size += len(encoded)
+        ends.append(size)
+    parts.append(closing)
+    return b"".join(parts), b"".join(_OFFSET.pack(end) for end in ends)
+
+
+def _encode_brief(brief: dict) -> Tuple[bytes, bytes]:
+    # ``top_anomalies`` goes last, so a shorter brief is a prefix of this one plus "]}".
+    head = json.dumps(
+        {key: value for key, value in brief.items() if key != "top_anomalies"}, separators=(",", ":")
+    ).encode("utf-8")
+    opening = head[:-1] + (b',"top_anomalies":[' if head != b"{}" else b'"top_anomalies":[')
+    return _encode_json_array(brief["top_anomalies"], opening, b"]}")
+
+
+def build_sections(
+    feature_rows: Sequence[FeatureRow],
+    anomaly_rows: Sequence[FeatureRow],
+    evidence: Optional[Dict[Tuple[str, str, str], dict]] = None,
+    events: Optional[EventBatch] = None,
+) -> Dict[str, bytes]:
+    """Snapshot sections for the API; ``events`` adds the batch ``/events`` serves."""
+    sections: Dict[str, bytes] = {}
+    features = [feature_row_dict(row) for row in feature_rows]
+    anomalies = [feature_row_dict(row) for row in anomaly_rows]
+    sections["features"], sections["features.idx"] = _encode_json_array(features)
+    sections["anomalies"], sections["anomalies.idx"] = _encode_json_array(anomalies)
+    sections["brief"], sections["brief.idx"] = _encode_brief(build_brief(anomalies, evidence=evidence))
+    if events is not None:
+        for name, buffer in events.to_buffers().items():
+            sections[EVENTS_PREFIX + name] = buffer
+    return sections
+
+
+def publish_snapshot(snapshot_dir: Path, sections: Dict[str, bytes]) -> Path:
+    """Write an immutable snapshot file and atomically repoint ``CURRENT`` at it.
+
+    The version is a hash of the section contents, so rebuilding unchanged
+    data reuses the existing file. Readers that still map an older snapshot
+    keep a valid view until they swap; pruned files stay readable through
+    existing mappings.
+    """
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    names = sorted(sections)
+    digest = hashlib.sha256()
+    for name in names:
+        digest.update(name.encode("utf-8") + b"\0" + _OFFSET.pack(len(sections[name])))
+        digest.update(sections[name])
+    version = digest.hexdigest()[:16]
+    path = snapshot_dir / f"{version}.snap"
+    if not path.exists():
+        header: Dict[str, List[int]] = {}
+        offset = 0
+        for name in names:
+            header[name] = [offset, len(sections[name])]
+            offset += _padded(len(sections[name]))
+        encoded = json.dumps({"version": version, "sections": header}).encode("utf-8")
+        start = len(MAGIC) + _HEADER_LEN.size
+        encoded += b" " * (_padded(start + len(encoded)) - start - len(encoded))
+        tmp_path = path.with_suffix(".snap.tmp")
+        with tmp_path.open("wb") as handle:
+            handle.write(MAGIC)
+            handle.write(_HEADER_LEN.pack(len(encoded)))
+            handle.write(encoded)
+            for name in names:
+                handle.write(sections[name])
+                handle.write(bytes(_padded(len(sections[name])) - len(sections[name])))
+            handle.flush()
+            os.fsync(handle.fileno())
+        tmp_path.replace(path)
+
+    pointer = snapshot_dir / POINTER_NAME
+    tmp_pointer = snapshot_dir / f"{POINTER_NAME}.tmp"
+    tmp_pointer.write_text(path.name, encoding="utf-8")
+    tmp_pointer.replace(pointer)
+    _prune(snapshot_dir, keep=path.name)
+    return path
+
+
+def _padded(size: int) -> int:
+    return -(-size // _ALIGN) * _ALIGN
+
+
+def _prune(snapshot_dir: Path, keep: str) -> None:
+    snapshots = sorted(snapshot_dir.glob("*.snap"), key=lambda item: item.stat().st_mtime_ns)
+    stale = [item for item in snapshots if item.name != keep][: max(0, len(snapshots) - KEEP_SNAPSHOTS)]
+    for item in stale:
+        item.unlink(missing_ok=True)
+
+
+@dataclass
+class Snapshot:
+    version: str
+    path: Path
+    _map: mmap.mmap
+    _sections: Dict[str, Tuple[int, int]]
+    _events: Optional[EventBatch] = None
+
+    def has(self, name: str) -> bool:
+        return name in self._sections
+
+    def section(self, name: str) -> memoryview:
+        offset, length = self._sections[name]
+        return memoryview(self._map)[offset : offset + length]
+
+    def array_prefix(self, name: str, limit: int) -> bytes:
+        """Return the section with its indexed array cut to the first ``limit`` items.
+
+        For a plain JSON array section ``limit`` may be 0; sections with
+        content after the array (``brief``) need ``limit >= 1``.
+        """
+        index = self.section(f"{name}.idx")
+        count = len(index) // _OFFSET.size
+        if limit >= count:
+            return bytes(self.section(name))
+        if limit <= 0:
+            return b"[]"
+        (end,) = _OFFSET.unpack_from(index, (limit - 1) * _OFFSET.size)
+        (last,) = _OFFSET.unpack_from(index, (count - 1) * _OFFSET.size)
+        section = self.section(name)
+        return bytes(section[:end]) + bytes(section[last:])
+
+    def events(self) -> Optional[EventBatch]:
+        """The snapshot's events as a read-only ``EventBatch`` over the mapping, if it has them."""
+        if self._events is None and self.has(EVENTS_PREFIX + "meta"):
+            from normalize.batch import EventBatch  # pydantic schema; loaded on the first /events call
+
+            self._events = EventBatch.from_buffers(
+                {
+                    name[len(EVENTS_PREFIX) :]: self.section(name)
+                    for name in self._sections
+                    if name.startswith(EVENTS_PREFIX)
+                }
+            )
+        return self._events
+
+
+def open_snapshot(path: Path) -> Snapshot:
+    with path.open("rb") as handle:
+        mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapped[: len(MAGIC)] != MAGIC:
+        mapped.close()
+        raise ValueError(f"{path} is not a feature snapshot")
+    (header_len,) = _HEADER_LEN.unpack_from(mapped, len(MAGIC))
+    start = len(MAGIC) + _HEADER_LEN.size
+    header = json.loads(mapped[start : start + header_len])
+    base = start + header_len
+    sections = {name: (base + value[0], value[1]) for name, value in header["sections"].items()}
+    return Snapshot(version=header["version"], path=path, _map=mapped, _sections=sections)
+
+
+class SnapshotReader:
+    """Per-process handle on the current snapshot, refreshed at most once per poll.
+
+    Every worker maps the same immutable file, so the OS page cache holds a
+    single copy no matter how many workers run; events are read from the
+    mapping in place. Swapping versions is a single
+    reference assignment; requests already holding the old snapshot finish
+    against it.
+    """
+
+    def __init__(self, snapshot_dir: Path, poll_seconds: float = 1.0) -> None:
+        self.snapshot_dir = snapshot_dir
+        self.poll_seconds = poll_seconds
+        self._current: Optional[Snapshot] = None
+        self._pointer: Optional[str] = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[Snapshot]:
+        now = time.monotonic()
+        if now - self._checked_at < self.poll_seconds:
+            return self._current
+        with self._lock:
+            if now - self._checked_at < self.poll_seconds:
+                return self._current
+            self._checked_at = now
+            try:
+                name = (self.snapshot_dir / POINTER_NAME).read_text(encoding="utf-8").strip()
+            except FileNotFoundError:
+                return self._current
+            if name != self._pointer:
+                try:
+                    self._current = open_snapshot(self.snapshot_dir / name)
+                    self._pointer = name
+                except (FileNotFoundError, ValueError):
+                    pass
+            return self._current
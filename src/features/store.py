@@ -3,11 +3,14 @@ from __future__ import annotations
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Iterable, List, Sequence
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
+import hashlib
 import json
+import time
 
-import duckdb
+from ingest.segments import iter_lines
+from observability.metrics import counter, gauge, histogram
 
 CANONICAL_KEYS = [
     "schema_version",
@@ -46,6 +49,27 @@ DEFAULTS = {
 }
 
 
+if TYPE_CHECKING:
+    import duckdb
+
+STAGE_SECONDS = histogram(
+    "sentinel_feature_stage_seconds", "Wall time per feature build stage", ("stage",)
+)
+STAGE_ROWS = counter("sentinel_feature_rows_total", "Rows processed per feature build stage", ("stage",))
+ROWS_PER_SECOND = gauge(
+    "sentinel_feature_rows_per_second", "Throughput of the last run of each feature stage", ("stage",)
+)
+EVENTS_LOADED = counter(
+    "sentinel_feature_events_loaded_total", "Events merged into the feature store by outcome", ("outcome",)
+)
+ANOMALY_COUNT = gauge("sentinel_anomalies", "Anomalies flagged by the last feature build")
+
+BRIEF_TOP_LIMIT = 20
+MANIFEST_NAME = "manifest.json"
+CHANGES_NAME = "changes.jsonl"
+CHANGE_LOG_MAX = 10000
+
+
 @dataclass(frozen=True)
 class FeatureRow:
     protocol: str
@@ -59,69 +83,318 @@ class FeatureRow:
     as_of: datetime
 
 
+def record_stage(stage: str, rows: int, started: float) -> None:
+    elapsed = time.perf_counter() - started
+    STAGE_SECONDS.observe(elapsed, stage=stage)
+    STAGE_ROWS.inc(rows, stage=stage)
+    ROWS_PER_SECOND.set(rows / elapsed if elapsed > 0 else 0.0, stage=stage)
+
+
+# ``find_anomalies`` thresholds; ``features.backtest.default_rule`` applies the same ones.
+ANOMALY_MIN_COUNT_1H = 3
+ANOMALY_MIN_SURGE_RATIO = 4.0
+
+# Column types of the persistent ``events`` table, in CANONICAL_KEYS order.
+EVENT_COLUMN_TYPES = {
+    "schema_version": "VARCHAR",
+    "event_id": "VARCHAR",
+    "source": "VARCHAR",
+    "kind": "VARCHAR",
+    "protocol": "VARCHAR",
+    "chain": "VARCHAR",
+    "event_time": "VARCHAR",
+    "ingest_time": "VARCHAR",
+    "severity": "VARCHAR",
+    "title": "VARCHAR",
+    "summary": "VARCHAR",
+    "source_url": "VARCHAR",
+    "tx_hash": "VARCHAR",
+    "block_number": "BIGINT",
+    "log_index": "BIGINT",
+    "entities": "VARCHAR[]",
+    "tags": "VARCHAR[]",
+    "raw": "JSON",
+}
+# Loads that add more than this share of rows older than the newest stored event
+# rewrite the table in event_time order, so zone maps keep pruning time ranges.
+COMPACT_LATE_FRACTION = 0.1
+STAGING_TABLE = "events_staging"
+GROUPS_TABLE = "event_groups"
+
+
 def _build_union_query(paths: Sequence[Path]) -> tuple[str, list[str]]:
+    columns = "{" + ", ".join(f"'{name}': '{kind}'" for name, kind in EVENT_COLUMN_TYPES.items()) + "}"
     selects = []
     params: list[str] = []
     for path in paths:
-        selects.append("SELECT * FROM read_json_auto(?)")
+        selects.append(f"SELECT * FROM read_json(?, format = 'newline_delimited', columns = {columns})")
         params.append(str(path))
     return " UNION ALL ".join(selects), params
 
 
 def normalize_events(inputs: Sequence[Path], output_path: Path) -> None:
+    started = time.perf_counter()
+    rows = 0
     output_path.parent.mkdir(parents=True, exist_ok=True)
     with output_path.open("w", encoding="utf-8") as out_handle:
         for path in inputs:
-            with path.open("r", encoding="utf-8") as in_handle:
-                for line in in_handle:
-                    text = line.strip()
-                    if not text:
-                        continue
-                    payload = json.loads(text)
-                    for key in CANONICAL_KEYS:
-                        if key not in payload:
-                            payload[key] = DEFAULTS.get(key)
-                    if payload.get("entities") is None:
-                        payload["entities"] = []
-                    if payload.get("tags") is None:
-                        payload["tags"] = []
-                    if payload.get("raw") is None:
-                        payload["raw"] = {}
-                    out_handle.write(json.dumps(payload) + "\n")
+            for line in iter_lines(path):
+                text = line.strip()
+                if not text:
+                    continue
+                payload = json.loads(text)
+                for key in CANONICAL_KEYS:
+                    if key not in payload:
+                        payload[key] = DEFAULTS.get(key)
+                if payload.get("entities") is None:
+                    payload["entities"] = []
+                if payload.get("tags") is None:
+                    payload["tags"] = []
+                if payload.get("raw") is None:
+                    payload["raw"] = {}
+                out_handle.write(json.dumps(payload) + "\n")
+                rows += 1
+    record_stage("normalize", rows, started)
+
+
+def _has_events_table(conn: duckdb.DuckDBPyConnection) -> bool:
+    return bool(
+        conn.execute(
+            "SELECT count(*) FROM duckdb_tables() WHERE table_name = 'events' AND NOT temporary"
+        ).fetchone()[0]
+    )
+
+
+def _sorted_events_sql(select_sql: str) -> str:
+    return f"SELECT * FROM ({select_sql}) ORDER BY event_time_ts, event_id"
+
+
+def _stage_events(conn: duckdb.DuckDBPyConnection, paths: Sequence[Path]) -> int:
+    """Write ``paths`` to ``events_staging`` in time order, one row per ``event_id``.
+
+    Of rows sharing an id the one with the latest ``ingest_time`` is kept.
+    Duplicates are deleted in place through a narrow ``rowid`` aggregate
+    rather than with a window over whole rows, which DuckDB cannot spill.
+    Returns the number of input rows.
+    """
+    union_sql, params = _build_union_query(paths)
+    conn.execute(
+        f"CREATE OR REPLACE TABLE {STAGING_TABLE} AS "
+        + _sorted_events_sql(f"SELECT *, CAST(event_time AS TIMESTAMP) AS event_time_ts FROM ({union_sql})"),
+        params,
+    )
+    loaded = conn.execute(f"SELECT count(*) FROM {STAGING_TABLE}").fetchone()[0]
+    conn.execute(
+        f"DELETE FROM {STAGING_TABLE} WHERE rowid NOT IN ("
+        f"SELECT arg_max(rowid, coalesce(ingest_time, '')) FROM {STAGING_TABLE} GROUP BY event_id)"
+    )
+    return loaded
+
+
+def ensure_events_table(conn: duckdb.DuckDBPyConnection) -> None:
+    """Drop an ``events`` table from before it was keyed by ``event_id``.
+
+    Older stores rebuilt ``events`` from the inputs on every load, so the
+    unkeyed table holds nothing the next load does not bring back. The
+    keyed table itself is created by the first ``load_events``.
+    """
+    if not _has_events_table(conn):
+        return
+    keyed = conn.execute(
+        "SELECT count(*) FROM duckdb_constraints() "
+        "WHERE table_name = 'events' AND constraint_type = 'PRIMARY KEY'"
+    ).fetchone()[0]
+    if not keyed:
+        conn.execute("DROP TABLE events")
+        conn.execute(f"DROP TABLE IF EXISTS {GROUPS_TABLE}")
+
+
+def _has_groups_table(conn: duckdb.DuckDBPyConnection) -> bool:
+    return bool(
+        conn.execute(
+            f"SELECT count(*) FROM duckdb_tables() WHERE table_name = '{GROUPS_TABLE}' AND NOT temporary"
+        ).fetchone()[0]
+    )
+
+
+def _record_groups(conn: duckdb.DuckDBPyConnection, relation: str) -> None:
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {GROUPS_TABLE} (protocol VARCHAR, source VARCHAR, kind VARCHAR)"
+    )
+    conn.execute(
+        f"INSERT INTO {GROUPS_TABLE} "
+        f"SELECT DISTINCT protocol, source, kind FROM {relation} WHERE {COUNTED_EVENTS} "
+        f"EXCEPT SELECT protocol, source, kind FROM {GROUPS_TABLE}"
+    )
+
+
+def ensure_event_groups(conn: duckdb.DuckDBPyConnection) -> None:
+    """Fill ``event_groups`` from ``events`` for stores loaded before it existed.
+
+    ``event_groups`` holds every (protocol, source, kind) that has a counted
+    event. ``load_events`` adds the groups of each load, so feature builds
+    only scan the last window and still give groups with only older events
+    their row. Groups are never removed.
+    """
+    if _has_events_table(conn) and not _has_groups_table(conn):
+        _record_groups(conn, "events")
+
+
+def compact_events(conn: duckdb.DuckDBPyConnection) -> None:
+    """Rewrite ``events`` sorted by ``event_time_ts``."""
+    started = time.perf_counter()
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        conn.execute("DROP TABLE IF EXISTS events_compacted")
+        conn.execute("CREATE TABLE events_compacted AS " + _sorted_events_sql("SELECT * FROM events"))
+        conn.execute("ALTER TABLE events_compacted ADD PRIMARY KEY (event_id)")
+        conn.execute("DROP TABLE events")
+        conn.execute("ALTER TABLE events_compacted RENAME TO events")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    rows = conn.execute("SELECT count(*) FROM events").fetchone()[0]
+    record_stage("compact", rows, started)
 
 
 def load_events(conn: duckdb.DuckDBPyConnection, paths: Sequence[Path]) -> None:
+    """Merge ``paths`` into the persistent ``events`` table, keyed by ``event_id``.
+
+    Rows repeated within the inputs collapse to the one with the latest
+    ``ingest_time``; a row whose id is already stored replaces it only when
+    its ``ingest_time`` is newer. Replaying the same inputs is therefore a
+    no-op, and overlapping sources (ingest plus fixtures, backfills) are
+    counted once. Rows are written in ``event_time`` order, and the table
+    is compacted when a load adds many rows older than the newest stored
+    event.
+    """
     if not paths:
         raise ValueError("no input files provided")
-    union_sql, params = _build_union_query(paths)
-    sql = (
-        "CREATE OR REPLACE TABLE events AS "
-        "SELECT *, CAST(event_time AS TIMESTAMP) AS event_time_ts "
-        f"FROM ({union_sql})"
+    started = time.perf_counter()
+    ensure_events_table(conn)
+    ensure_event_groups(conn)
+    loaded = _stage_events(conn, paths)
+    _record_groups(conn, STAGING_TABLE)
+    if not _has_events_table(conn):
+        # Building the key index in bulk over sorted rows is much cheaper than
+        # checking it row by row on insert.
+        conn.execute(f"ALTER TABLE {STAGING_TABLE} RENAME TO events")
+        conn.execute("ALTER TABLE events ADD PRIMARY KEY (event_id)")
+        # Checkpointing writes the key index out, so it is not held in memory
+        # until the next load probes it.
+        conn.execute("CHECKPOINT")
+        rows = conn.execute("SELECT count(*) FROM events").fetchone()[0]
+        EVENTS_LOADED.inc(rows, outcome="inserted")
+        EVENTS_LOADED.inc(loaded - rows, outcome="duplicate")
+        record_stage("load", rows, started)
+        return
+
+    before, newest = conn.execute("SELECT count(*), max(event_time_ts) FROM events").fetchone()
+    older_sql = "SELECT count(*) FROM events WHERE event_time_ts < ?"
+    older_before = conn.execute(older_sql, [newest]).fetchone()[0] if newest is not None else 0
+    updates = ", ".join(
+        f"{column} = EXCLUDED.{column}"
+        for column in [*EVENT_COLUMN_TYPES, "event_time_ts"]
+        if column != "event_id"
+    )
+    # Replayed rows are dropped with a plain join first; conflict handling
+    # keeps every conflicting row in memory, so only real updates reach it.
+    conn.execute(
+        f"DELETE FROM {STAGING_TABLE} AS s USING events AS e "
+        "WHERE s.event_id = e.event_id AND COALESCE(s.ingest_time, '') <= COALESCE(e.ingest_time, '')"
+    )
+    conn.execute(
+        f"INSERT INTO events SELECT * FROM {STAGING_TABLE} "
+        f"ON CONFLICT (event_id) DO UPDATE SET {updates} "
+        "WHERE COALESCE(EXCLUDED.ingest_time, '') > COALESCE(events.ingest_time, '')"
     )
-    conn.execute(sql, params)
+    conn.execute(f"DROP TABLE {STAGING_TABLE}")
+    rows = conn.execute("SELECT count(*) FROM events").fetchone()[0]
+    EVENTS_LOADED.inc(rows - before, outcome="inserted")
+    EVENTS_LOADED.inc(loaded - (rows - before), outcome="duplicate")
+    if newest is not None:
+        late = conn.execute(older_sql, [newest]).fetchone()[0] - older_before
+        if late > COMPACT_LATE_FRACTION * rows:
+            compact_events(conn)
+    conn.execute("CHECKPOINT")
+    record_stage("load", rows, started)
 
 
-def compute_features(conn: duckdb.DuckDBPyConnection) -> List[FeatureRow]:
-    as_of = conn.execute("SELECT max(event_time_ts) FROM events").fetchone()[0]
-    if as_of is None:
-        return []
+# Longest feature window; feature builds scan only the events inside it.
+LONGEST_WINDOW = "7 days"
+
+# Near-duplicates (see ``ingest.neardup``) repeat an event already counted.
+COUNTED_EVENTS = "NOT coalesce(list_contains(tags, 'near_duplicate'), false)"
+
+
+def window_counts_sql(as_of_literal: str, relation: str) -> str:
+    """Per-group 1h/24h/7d event counts up to ``as_of`` over ``relation``.
+
+    Counts are plain sums, so results over disjoint slices of the events add
+    up to the result over all of them.
+    """
+    return f"""
+        SELECT
+            protocol,
+            source,
+            kind,
+            SUM(CASE WHEN event_time_ts >= TIMESTAMP '{as_of_literal}' - INTERVAL '1 hour' THEN 1 ELSE 0 END) AS count_1h,
+            SUM(CASE WHEN event_time_ts >= TIMESTAMP '{as_of_literal}' - INTERVAL '24 hours' THEN 1 ELSE 0 END) AS count_24h,
+            SUM(CASE WHEN event_time_ts >= TIMESTAMP '{as_of_literal}' - INTERVAL '{LONGEST_WINDOW}' THEN 1 ELSE 0 END) AS count_7d
+        FROM {relation}
+        GROUP BY 1, 2, 3
+    """
+
+
+def with_group_rows(counts_sql: str) -> str:
+    """Sum ``counts_sql`` with a zero row per ``event_groups`` entry.
+
+    Every group gets a feature row even when none of its events fall inside
+    the longest window and so were not scanned.
+    """
+    return f"""
+        SELECT
+            protocol,
+            source,
+            kind,
+            SUM(count_1h) AS count_1h,
+            SUM(count_24h) AS count_24h,
+            SUM(count_7d) AS count_7d
+        FROM (
+            {counts_sql}
+            UNION ALL
+            SELECT protocol, source, kind, 0, 0, 0 FROM {GROUPS_TABLE}
+        )
+        GROUP BY 1, 2, 3
+    """
 
-    as_of_literal = as_of.isoformat(sep=" ", timespec="seconds")
+
+def as_of_literal(as_of: datetime) -> str:
+    """``as_of`` as the SQL timestamp literal every feature query compares against."""
+    return as_of.isoformat(sep=" ", timespec="seconds")
+
+
+def window_events_sql(as_of: datetime) -> str:
+    """Counted events inside the longest window before ``as_of``."""
+    return (
+        f"SELECT * FROM events WHERE {COUNTED_EVENTS} "
+        f"AND event_time_ts >= TIMESTAMP '{as_of_literal(as_of)}' - INTERVAL '{LONGEST_WINDOW}'"
+    )
+
+
+def events_as_of(conn: duckdb.DuckDBPyConnection) -> Optional[datetime]:
+    return conn.execute("SELECT max(event_time_ts) FROM events").fetchone()[0]
+
+
+def snapshot_features(
+    conn: duckdb.DuckDBPyConnection, as_of: datetime, agg_sql: str, started: float
+) -> List[FeatureRow]:
+    """Derive ``feature_snapshot`` from the window counts produced by ``agg_sql``."""
     conn.execute(
         f"""
         CREATE OR REPLACE TEMP VIEW feature_snapshot AS
-        WITH agg AS (
-            SELECT
-                protocol,
-                source,
-                kind,
-                SUM(CASE WHEN event_time_ts >= TIMESTAMP '{as_of_literal}' - INTERVAL '1 hour' THEN 1 ELSE 0 END) AS count_1h,
-                SUM(CASE WHEN event_time_ts >= TIMESTAMP '{as_of_literal}' - INTERVAL '24 hours' THEN 1 ELSE 0 END) AS count_24h,
-                SUM(CASE WHEN event_time_ts >= TIMESTAMP '{as_of_literal}' - INTERVAL '7 days' THEN 1 ELSE 0 END) AS count_7d
-            FROM events
-            GROUP BY 1, 2, 3
-        )
+        WITH agg AS ({agg_sql})
         SELECT
             protocol,
             source,
@@ -131,7 +404,7 @@ def compute_features(conn: duckdb.DuckDBPyConnection) -> List[FeatureRow]:
             count_7d,
             (count_24h / 24.0) AS expected_1h,
             (count_1h + 1.0) / (count_24h / 24.0 + 1.0) AS surge_ratio,
-            TIMESTAMP '{as_of_literal}' AS as_of
+            TIMESTAMP '{as_of_literal(as_of)}' AS as_of
         FROM agg
         """
     )
@@ -146,14 +419,26 @@ def compute_features(conn: duckdb.DuckDBPyConnection) -> List[FeatureRow]:
     results: List[FeatureRow] = []
     for row in rows:
         results.append(FeatureRow(*row))
+    record_stage("compute", len(results), started)
     return results
 
 
+def compute_features(conn: duckdb.DuckDBPyConnection) -> List[FeatureRow]:
+    started = time.perf_counter()
+    as_of = events_as_of(conn)
+    if as_of is None:
+        return []
+    ensure_event_groups(conn)
+    counts_sql = window_counts_sql(as_of_literal(as_of), f"({window_events_sql(as_of)})")
+    return snapshot_features(conn, as_of, with_group_rows(counts_sql), started)
+
+
 def find_anomalies(rows: Iterable[FeatureRow]) -> List[FeatureRow]:
     anomalies: List[FeatureRow] = []
     for row in rows:
-        if row.count_1h >= 3 and row.surge_ratio >= 4.0:
+        if row.count_1h >= ANOMALY_MIN_COUNT_1H and row.surge_ratio >= ANOMALY_MIN_SURGE_RATIO:
             anomalies.append(row)
+    ANOMALY_COUNT.set(len(anomalies))
     return anomalies
 
 
@@ -208,6 +493,245 @@ def write_anomalies(rows: Sequence[FeatureRow], out_dir: Path) -> Path:
     return path
 
 
-def open_store(db_path: Path) -> duckdb.DuckDBPyConnection:
+def read_feature_dicts(path: Path) -> List[dict]:
+    if not path.exists():
+        return []
+    items: List[dict] = []
+    with path.open("r", encoding="utf-8") as handle:
+        for line in handle:
+            text = line.strip()
+            if text:
+                items.append(json.loads(text))
+    return items
+
+
+def _group_key(item: dict) -> Tuple[str, str, str]:
+    return (str(item.get("protocol")), str(item.get("source")), str(item.get("kind")))
+
+
+def _last_change_id(path: Path) -> int:
+    """Id of the last readable message, scanning back past damaged lines (e.g. a torn write)."""
+    if not path.exists():
+        return 0
+    with path.open("rb") as handle:
+        end = handle.seek(0, 2)
+        carry = b""
+        while end > 0:
+            start = max(0, end - 65536)
+            handle.seek(start)
+            lines = (handle.read(end - start) + carry).split(b"\n")
+            # The first piece may be the tail of a line that starts in the previous block.
+            carry = lines.pop(0) if start > 0 else b""
+            for line in reversed(lines):
+                text = line.strip()
+                if not text:
+                    continue
+                try:
+                    return int(json.loads(text)["id"])
+                except (ValueError, KeyError, TypeError):
+                    continue
+            end = start
+    return 0
+
+
+def _torn_tail(path: Path) -> bool:
+    with path.open("rb") as handle:
+        end = handle.seek(0, 2)
+        if end == 0:
+            return False
+        handle.seek(end - 1)
+        return handle.read(1) != b"\n"
+
+
+def _compact_change_log(path: Path) -> None:
+    with path.open("r", encoding="utf-8") as handle:
+        lines = handle.readlines()
+    if len(lines) <= 2 * CHANGE_LOG_MAX:
+        return
+    tmp_path = path.with_suffix(".jsonl.tmp")
+    tmp_path.write_text("".join(lines[-CHANGE_LOG_MAX:]), encoding="utf-8")
+    tmp_path.replace(path)
+
+
+def append_changes(
+    previous_features: Sequence[dict],
+    previous_anomalies: Sequence[dict],
+    feature_rows: Sequence[FeatureRow],
+    anomaly_rows: Sequence[FeatureRow],
+    out_dir: Path,
+) -> int:
+    """Append feature-change and new-anomaly messages to the change log.
+
+    Each message gets a monotonically increasing ``id`` so subscribers can
+    resume after a disconnect. A feature message is emitted when a group's
+    window counts differ from the previous build; an anomaly message when a
+    group becomes anomalous. Returns the number of messages appended.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / CHANGES_NAME
+    counts = ("count_1h", "count_24h", "count_7d")
+    before = {_group_key(item): item for item in previous_features}
+    was_anomalous = {_group_key(item) for item in previous_anomalies}
+
+    messages: List[Tuple[str, dict]] = []
+    for row in feature_rows:
+        current = feature_row_dict(row)
+        prior = before.get(_group_key(current))
+        if prior is None or any(prior.get(name) != current[name] for name in counts):
+            messages.append(("feature", current))
+    for row in anomaly_rows:
+        current = feature_row_dict(row)
+        if _group_key(current) not in was_anomalous:
+            messages.append(("anomaly", current))
+    if not messages:
+        return 0
+
+    next_id = _last_change_id(path)
+    with path.open("a", encoding="utf-8") as handle:
+        if _torn_tail(path):
+            handle.write("\n")  # keep new messages off the damaged line
+        for message_type, data in messages:
+            next_id += 1
+            handle.write(
+                json.dumps({"id": next_id, "type": message_type, "data": data}, separators=(",", ":"))
+                + "\n"
+            )
+    _compact_change_log(path)
+    return len(messages)
+
+
+@dataclass(frozen=True)
+class StoreLimits:
+    """DuckDB resource settings for a build; unset fields keep DuckDB's defaults."""
+
+    threads: Optional[int] = None
+    memory_limit: Optional[str] = None
+    temp_dir: Optional[Path] = None
+
+
+def open_store(db_path: Path, limits: Optional[StoreLimits] = None) -> duckdb.DuckDBPyConnection:
+    import duckdb
+
     db_path.parent.mkdir(parents=True, exist_ok=True)
-    return duckdb.connect(database=str(db_path))
+    conn = duckdb.connect(database=str(db_path))
+    if limits is not None:
+        configure_store(conn, limits)
+    return conn
+
+
+def _sql_string(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def configure_store(conn: duckdb.DuckDBPyConnection, limits: StoreLimits) -> None:
+    """Bound DuckDB's threads and memory; past ``memory_limit`` it spills to ``temp_dir``."""
+    if limits.threads:
+        conn.execute(f"SET threads = {int(limits.threads)}")
+    if limits.memory_limit:
+        conn.execute(f"SET memory_limit = {_sql_string(limits.memory_limit)}")
+    if limits.temp_dir is not None:
+        limits.temp_dir.mkdir(parents=True, exist_ok=True)
+        conn.execute(f"SET temp_directory = {_sql_string(limits.temp_dir.as_posix())}")
+
+
+def feature_row_dict(row: FeatureRow) -> dict:
+    return {
+        "protocol": row.protocol,
+        "source": row.source,
+        "kind": row.kind,
+        "count_1h": row.count_1h,
+        "count_24h": row.count_24h,
+        "count_7d": row.count_7d,
+        "expected_1h": row.expected_1h,
+        "surge_ratio": row.surge_ratio,
+        "as_of": row.as_of.isoformat(),
+    }
+
+
+def count_by(items: Iterable[dict], key: str) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for item in items:
+        value = str(item.get(key, "unknown"))
+        counts[value] = counts.get(value, 0) + 1
+    return counts
+
+
+def top_anomalies(items: Sequence[dict], limit: int) -> List[dict]:
+    def _score(item: dict) -> Tuple[float, int]:
+        ratio = float(item.get("surge_ratio") or 0.0)
+        count_1h = int(item.get("count_1h") or 0)
+        return (ratio, count_1h)
+
+    ranked = sorted(items, key=_score, reverse=True)
+    return ranked[:limit]
+
+
+def build_brief(
+    items: Sequence[dict],
+    limit: int = BRIEF_TOP_LIMIT,
+    evidence: Optional[Dict[Tuple[str, str, str], dict]] = None,
+) -> dict:
+    top = top_anomalies(items, limit)
+    if evidence:
+        top = [
+            dict(item, evidence={k: v for k, v in evidence[_group_key(item)].items() if k != "anomaly"})
+            if _group_key(item) in evidence
+            else item
+            for item in top
+        ]
+    return {
+        "total_anomalies": len(items),
+        "by_protocol": count_by(items, "protocol"),
+        "by_kind": count_by(items, "kind"),
+        "top_anomalies": top,
+    }
+
+
+def write_brief(
+    rows: Sequence[FeatureRow],
+    out_dir: Path,
+    evidence: Optional[Dict[Tuple[str, str, str], dict]] = None,
+) -> Path:
+    """Materialize the /brief payload so the API can serve it without recomputing.
+
+    The top list is ranked up to ``BRIEF_TOP_LIMIT``; readers slice it down to
+    the requested limit. ``evidence`` bundles (see ``features.evidence``) are
+    attached to the top anomalies they belong to.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / "brief.json"
+    payload = build_brief([feature_row_dict(row) for row in rows], evidence=evidence)
+    path.write_text(json.dumps(payload, separators=(",", ":")), encoding="utf-8")
+    return path
+
+
+def _sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_manifest(out_dir: Path, paths: Sequence[Path], as_of: datetime) -> Path:
+    """Record content hashes for the build outputs plus an overall version.
+
+    The version changes if and only if one of the listed outputs changes, so
+    consumers can use it to detect a new build without re-reading the data.
+    """
+    files: Dict[str, dict] = {}
+    version = hashlib.sha256()
+    for path in sorted(paths, key=lambda item: item.name):
+        sha = _sha256_file(path)
+        files[path.name] = {"sha256": sha, "bytes": path.stat().st_size}
+        version.update(f"{path.name}:{sha}\n".encode("utf-8"))
+    manifest = {
+        "version": version.hexdigest()[:16],
+        "as_of": as_of.isoformat(),
+        "files": files,
+    }
+    path = out_dir / MANIFEST_NAME
+    tmp_path = path.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    tmp_path.replace(path)
+    return path
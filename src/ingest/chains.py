@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from ingest.onchain import BLOCK_TIME_SOURCES, DEFAULT_UNISWAP_V3_POOL
+from ingest.rpc import RetryPolicy, RpcClient, parse_endpoints
+
+# chain name -> EIP-155 chain id. Names must match ``normalize.schema.Chain``.
+CHAIN_IDS: Dict[str, int] = {
+    "ethereum": 1,
+    "optimism": 10,
+    "polygon": 137,
+    "base": 8453,
+    "arbitrum": 42161,
+}
+# Settings that fall back to the unprefixed variable on every chain.
+SHARED_KEYS = (
+    "ONCHAIN_LOOKBACK_BLOCKS",
+    "ONCHAIN_CHUNK_BLOCKS",
+    "ONCHAIN_SHARDS",
+    "ONCHAIN_BLOCK_TIME",
+    "RPC_RATE_LIMIT",
+    "RPC_TIMEOUT",
+    "RPC_MAX_ATTEMPTS",
+    "RPC_HEDGE_MS",
+)
+
+EnvLookup = Callable[[str], Optional[str]]
+
+
+@dataclass(frozen=True)
+class ChainConfig:
+    """Everything one chain's ingest workers need; picklable for spawned processes."""
+
+    name: str
+    chain_id: int
+    rpc_urls: Optional[str]
+    aave_pool: Optional[str] = None
+    uniswap_pool: Optional[str] = None
+    start_block: Optional[int] = None
+    end_block: Optional[int] = None
+    lookback_blocks: int = 10
+    chunk_blocks: int = 10
+    shards: int = 1
+    block_time: str = "rpc"
+    rate_limit: Optional[float] = 10.0
+    timeout: float = 10.0
+    max_attempts: int = 5
+    hedge_ms: Optional[float] = None
+
+    def build_client(self) -> RpcClient:
+        if not self.rpc_urls:
+            raise ValueError(f"no RPC endpoints configured for {self.name}")
+        return RpcClient(
+            parse_endpoints(self.rpc_urls, default_rate=self.rate_limit, timeout=self.timeout),
+            retry=RetryPolicy(max_attempts=self.max_attempts),
+            hedge_after=self.hedge_ms / 1000.0 if self.hedge_ms else None,
+        )
+
+
+def _int(value: Optional[str], name: str) -> Optional[int]:
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except ValueError as exc:
+        raise ValueError(f"{name} must be an integer") from exc
+
+
+def _float(value: Optional[str], name: str) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError as exc:
+        raise ValueError(f"{name} must be a number") from exc
+
+
+def _ethereum_rpc_urls(env: EnvLookup) -> Optional[str]:
+    # Single-chain settings from before multi-chain support.
+    raw = env("RPC_URLS") or env("ALCHEMY_RPC_URL")
+    if raw:
+        return raw
+    api_key = env("ALCHEMY_API_KEY")
+    return f"https://eth-mainnet.g.alchemy.com/v2/{api_key}" if api_key else None
+
+
+def chain_config(name: str, env: EnvLookup) -> ChainConfig:
+    """Settings for ``name`` from ``<CHAIN>_*`` variables, then shared ones.
+
+    Ethereum also reads the single-chain variables (``RPC_URLS``,
+    ``AAVE_V3_POOL_ADDRESS``, ``START_BLOCK``, ...), so existing
+    configurations keep working unchanged.
+    """
+    if name not in CHAIN_IDS:
+        raise ValueError(f"unknown chain {name!r}; expected one of {', '.join(CHAIN_IDS)}")
+    prefix = name.upper()
+
+    def value(key: str, legacy: Optional[str] = None) -> Optional[str]:
+        prefixed = env(f"{prefix}_{key.removeprefix('ONCHAIN_')}")
+        if prefixed:
+            return prefixed
+        if key in SHARED_KEYS:
+            return env(key)
+        if name == "ethereum" and legacy:
+            return env(legacy)
+        return None
+
+    block_time = value("ONCHAIN_BLOCK_TIME") or "rpc"
+    if block_time not in BLOCK_TIME_SOURCES:
+        raise ValueError(f"{prefix}_BLOCK_TIME must be one of {', '.join(BLOCK_TIME_SOURCES)}")
+    rate = _float(value("RPC_RATE_LIMIT"), f"{prefix}_RPC_RATE_LIMIT")
+    if rate is None:
+        rate = 10.0
+    lookback = _int(value("ONCHAIN_LOOKBACK_BLOCKS"), f"{prefix}_LOOKBACK_BLOCKS") or 10
+    if lookback < 1:
+        raise ValueError(f"{prefix}_LOOKBACK_BLOCKS must be >= 1")
+    uniswap_pool = value("UNISWAP_V3_POOL", "UNISWAP_V3_WETH_USDC_POOL")
+    if name == "ethereum" and uniswap_pool is None:
+        uniswap_pool = DEFAULT_UNISWAP_V3_POOL
+    config = ChainConfig(
+        name=name,
+        chain_id=CHAIN_IDS[name],
+        rpc_urls=value("RPC_URLS") or (_ethereum_rpc_urls(env) if name == "ethereum" else None),
+        aave_pool=value("AAVE_V3_POOL_ADDRESS", "AAVE_V3_POOL_ADDRESS"),
+        uniswap_pool=uniswap_pool,
+        start_block=_int(value("START_BLOCK", "START_BLOCK"), f"{prefix}_START_BLOCK"),
+        end_block=_int(value("END_BLOCK", "END_BLOCK"), f"{prefix}_END_BLOCK"),
+        lookback_blocks=lookback,
+        chunk_blocks=_int(value("ONCHAIN_CHUNK_BLOCKS"), f"{prefix}_CHUNK_BLOCKS") or 10,
+        shards=max(1, _int(value("ONCHAIN_SHARDS"), f"{prefix}_SHARDS") or 1),
+        block_time=block_time,
+        rate_limit=rate if rate > 0 else None,
+        timeout=_float(value("RPC_TIMEOUT"), f"{prefix}_RPC_TIMEOUT") or 10.0,
+        max_attempts=_int(value("RPC_MAX_ATTEMPTS"), f"{prefix}_RPC_MAX_ATTEMPTS") or 5,
+        hedge_ms=_float(value("RPC_HEDGE_MS"), f"{prefix}_RPC_HEDGE_MS"),
+    )
+    if config.start_block is not None and config.end_block is not None and config.start_block > config.end_block:
+        raise ValueError(f"{prefix}_START_BLOCK must be <= {prefix}_END_BLOCK")
+    return config
+
+
+def chain_configs(env: EnvLookup) -> List[ChainConfig]:
+    """One config per name in ``ONCHAIN_CHAINS`` (default ``ethereum``)."""
+    names = [name.strip() for name in (env("ONCHAIN_CHAINS") or "ethereum").split(",") if name.strip()]
+    if len(set(names)) != len(names):
+        raise ValueError("ONCHAIN_CHAINS lists a chain twice")
+    return [chain_config(name, env) for name in names]
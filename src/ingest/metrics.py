@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+from observability.metrics import LAG_BUCKETS, counter, histogram
+
+# Shared by the RSS and on-chain ingesters; the source label tells them apart.
+EVENTS_INGESTED = counter("sentinel_events_ingested_total", "Events produced by ingest", ("source",))
+EVENTS_DEDUPED = counter(
+    "sentinel_events_deduplicated_total", "Events dropped as duplicate ids during ingest", ("source",)
+)
+INGEST_LAG = histogram(
+    "sentinel_ingest_lag_seconds",
+    "Delay between event_time and ingest_time",
+    ("source",),
+    buckets=LAG_BUCKETS,
+)
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import hashlib
+import html
+import random
+import re
+from array import array
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from normalize.schema import Event
+from observability.metrics import counter
+
+NEAR_DUPLICATES = counter(
+    "sentinel_events_near_duplicate_total", "Events linked to an earlier near-duplicate", ("source",)
+)
+
+DUPLICATE_TAG = "near_duplicate"
+DEFAULT_THRESHOLD = 0.8
+NUM_PERM = 128
+BANDS = 16  # 16 bands of 8 rows: pairs at Jaccard 0.8 become candidates ~95% of the time
+# Character shingles tolerate small edits better than word shingles: a one-word
+# edit keeps Jaccard around 0.85, a post about another market lands near 0.7.
+SHINGLE_CHARS = 5
+# Shorter texts ("Weekly update") say too little to call two events the same.
+MIN_WORDS = 8
+# Events held back to be classified oldest first; bounds memory while streaming.
+WINDOW_EVENTS = 1024
+SEED = 1
+_PRIME = (1 << 31) - 1  # keeps a * x + b below 2**62, so the numpy path cannot overflow
+SIGNATURES_NAME = "signatures.u32"
+ENTRIES_NAME = "entries.tsv"
+
+_TAG = re.compile(r"<[^>]+>")
+_URL = re.compile(r"https?://\S+|www\.\S+")
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_text(title: str, summary: Optional[str]) -> List[str]:
+    """Lower-cased words of title and summary without markup, entities or URLs."""
+    text = html.unescape(_TAG.sub(" ", f"{title} {summary or ''}")).lower()
+    return _NON_WORD.sub(" ", _URL.sub(" ", text)).split()
+
+
+def shingles(words: Sequence[str], size: int = SHINGLE_CHARS) -> List[int]:
+    """31-bit hashes of the distinct ``size``-character shingles of the joined words."""
+    text = " ".join(words)
+    grams = {text[index : index + size] for index in range(max(1, len(text) - size + 1))}
+    return [
+        int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=4).digest(), "little") % _PRIME
+        for gram in sorted(grams)
+    ]
+
+
+def _permutations(count: int, seed: int) -> Tuple[List[int], List[int]]:
+    rng = random.Random(seed)
+    return (
+        [rng.randrange(1, _PRIME) for _ in range(count)],
+        [rng.randrange(0, _PRIME) for _ in range(count)],
+    )
+
+
+_A, _B = _permutations(NUM_PERM, SEED)
+
+
+def minhash(hashes: Sequence[int]) -> array:
+    """``NUM_PERM`` MinHash values of a non-empty shingle set; numpy when available, same values either way."""
+    try:
+        import numpy as np
+    except ImportError:
+        return array("I", [min((a * x + b) % _PRIME for x in hashes) for a, b in zip(_A, _B)])
+    values = np.asarray(hashes, dtype=np.uint64)
+    a = np.asarray(_A, dtype=np.uint64)[:, None]
+    b = np.asarray(_B, dtype=np.uint64)[:, None]
+    return array("I", ((a * values + b) % _PRIME).min(axis=1).astype(np.uint32).tobytes())
+
+
+def similarity(left: array, right: array) -> float:
+    """Estimated Jaccard similarity: the share of equal MinHash values."""
+    return sum(1 for x, y in zip(left, right) if x == y) / NUM_PERM
+
+
+@dataclass(frozen=True)
+class Match:
+    duplicate_of: str
+    similarity: float
+
+
+class NearDuplicateIndex:
+    """Persistent MinHash/LSH index of canonical offchain events.
+
+    ``entries.tsv`` records every event id seen with the canonical id it
+    duplicates (empty for canonicals); ``signatures.u32`` holds the
+    signatures of canonicals in the same order. Both files are append-only,
+    so a run only hashes events it has not seen before.
+    """
+
+    def __init__(self, directory: Path, threshold: float = DEFAULT_THRESHOLD) -> None:
+        self.directory = directory
+        self.threshold = threshold
+        self.seen: Dict[str, str] = {}
+        self._canonical: List[str] = []
+        self._signatures: List[array] = []
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+        self._pending: List[Tuple[str, str, Optional[array]]] = []
+        self._rewrite = False
+        self.duplicates = 0
+        self._load()
+
+    def _load(self) -> None:
+        entries = self.directory / ENTRIES_NAME
+        if not entries.exists():
+            return
+        blob = array("I")
+        signatures = self.directory / SIGNATURES_NAME
+        if signatures.exists():
+            blob.frombytes(signatures.read_bytes())
+        stored = len(blob) // NUM_PERM
+        for line in entries.read_text(encoding="utf-8").splitlines():
+            event_id, _, duplicate_of = line.partition("\t")
+            if not event_id or event_id in self.seen:
+                continue
+            if not duplicate_of:
+                if len(self._canonical) >= stored:
+                    continue  # signature missing; the event is hashed again
+                start = len(self._canonical) * NUM_PERM
+                self._add(event_id, blob[start : start + NUM_PERM])
+            self.seen[event_id] = duplicate_of
+        # An interrupted save leaves the files out of step; the next save rewrites them.
+        self._rewrite = len(self._canonical) != stored
+
+    def _add(self, event_id: str, signature: array) -> None:
+        position = len(self._canonical)
+        self._canonical.append(event_id)
+        self._signatures.append(signature)
+        for band, key in enumerate(_band_keys(signature)):
+            self._buckets[(band, key)].append(position)
+
+    def __len__(self) -> int:
+        return len(self._canonical)
+
+    def lookup(self, signature: array) -> Optional[Match]:
+        """Most similar canonical at or above the threshold; the earliest wins ties."""
+        candidates = set()
+        for band, key in enumerate(_band_keys(signature)):
+            candidates.update(self._buckets.get((band, key), ()))
+        best: Optional[Tuple[float, int]] = None
+        for position in sorted(candidates):
+            score = similarity(signature, self._signatures[position])
+            if score >= self.threshold and (best is None or score > best[0]):
+                best = (score, position)
+        if best is None:
+            return None
+        return Match(self._canonical[best[1]], best[0])
+
+    def classify(self, event_id: str, title: str, summary: Optional[str]) -> Optional[Match]:
+        """Link ``event_id`` to an earlier near-duplicate, or index it as a canonical.
+
+        Texts under ``MIN_WORDS`` words are neither linked nor indexed.
+        """
+        if event_id in self.seen:
+            duplicate_of = self.seen[event_id]
+            return Match(duplicate_of, 1.0) if duplicate_of else None
+        words = normalize_text(title, summary)
+        if len(words) < MIN_WORDS:
+            return None
+        signature = minhash(shingles(words))
+        match = self.lookup(signature)
+        if match is None:
+            self._add(event_id, signature)
+            self.seen[event_id] = ""
+            self._pending.append((event_id, "", signature))
+        else:
+            self.seen[event_id] = match.duplicate_of
+            self._pending.append((event_id, match.duplicate_of, None))
+        return match
+
+    def mark(self, events: Iterable[Event], window: int = WINDOW_EVENTS) -> Iterator[Event]:
+        """Tag near-duplicates and point ``raw.duplicate_of`` at their canonical event.
+
+        Events are read in windows of ``window`` and classified oldest first
+        within each, so copies that arrive close together keep the earliest
+        published one as canonical. Yields each window in that order.
+        """
+        pending: List[Event] = []
+        for event in events:
+            pending.append(event)
+            if len(pending) >= window:
+                yield from self._mark_window(pending)
+                pending = []
+        yield from self._mark_window(pending)
+
+    def _mark_window(self, events: List[Event]) -> List[Event]:
+        events.sort(key=lambda event: (event.event_time, event.event_id))
+        duplicates = 0
+        for event in events:
+            match = self.classify(event.event_id, event.title, event.summary)
+            if match is None:
+                continue
+            duplicates += 1
+            if DUPLICATE_TAG not in event.tags:
+                event.tags.append(DUPLICATE_TAG)
+            event.raw["duplicate_of"] = match.duplicate_of
+        if duplicates:
+            NEAR_DUPLICATES.inc(duplicates, source="offchain")
+            self.duplicates += duplicates
+        return events
+
+    def save(self) -> None:
+        """Append what this run added; signatures first, so entries never outrun them."""
+        if self._rewrite:
+            self._save_all()
+        elif self._pending:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with (self.directory / SIGNATURES_NAME).open("ab") as handle:
+                for _, _, signature in self._pending:
+                    if signature is not None:
+                        handle.write(signature.tobytes())
+            with (self.directory / ENTRIES_NAME).open("a", encoding="utf-8") as handle:
+                for event_id, duplicate_of, _ in self._pending:
+                    handle.write(f"{event_id}\t{duplicate_of}\n")
+        self._pending = []
+
+    def _save_all(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        signatures = self.directory / SIGNATURES_NAME
+        entries = self.directory / ENTRIES_NAME
+        tmp_signatures = signatures.with_name(signatures.name + ".tmp")
+        tmp_entries = entries.with_name(entries.name + ".tmp")
+        tmp_signatures.write_bytes(b"".join(signature.tobytes() for signature in self._signatures))
+        tmp_entries.write_text(
+            "".join(f"{event_id}\t{duplicate_of}\n" for event_id, duplicate_of in self.seen.items()),
+            encoding="utf-8",
+        )
+        tmp_signatures.replace(signatures)
+        tmp_entries.replace(entries)
+        self._rewrite = False
+
+
+def _band_keys(signature: array) -> List[bytes]:
+    rows = NUM_PERM // BANDS
+    return [signature[band * rows : (band + 1) * rows].tobytes() for band in range(BANDS)]
@@ -2,17 +2,26 @@ from __future__ import annotations
 
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Dict, Iterable, List, Optional
-
-from web3 import Web3
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
+from ingest.metrics import EVENTS_INGESTED, INGEST_LAG
 from normalize.schema import Event
+from observability.metrics import counter, histogram
+
+if TYPE_CHECKING:
+    from web3 import Web3
+
+RPC_CALLS = counter("sentinel_rpc_calls_total", "JSON-RPC calls made by on-chain ingest", ("method",))
+RPC_LATENCY = histogram(
+    "sentinel_rpc_latency_seconds", "JSON-RPC call latency for on-chain ingest", ("method",)
+)
 
 DEFAULT_UNISWAP_V3_POOL = "0x88e6A0c2dDD26FEEb64F039a2c41296FcB3f5640"
 AAVE_LIQUIDATION_SIGNATURE = (
     "LiquidationCall(address,address,address,uint256,uint256,address,bool)"
 )
 UNISWAP_SWAP_SIGNATURE = "Swap(address,address,int256,int256,uint160,uint128,int24)"
+BLOCK_TIME_SOURCES = ("rpc", "interpolate")
 
 
 @dataclass(frozen=True)
@@ -24,49 +33,95 @@ class OnchainStream:
     severity: str = "medium"
     title: str = "On-chain event"
     tags: List[str] = field(default_factory=list)
+    chain: str = "ethereum"
 
 
 def build_default_streams(
     aave_pool_address: Optional[str],
     uniswap_pool_address: Optional[str],
+    chain: str = "ethereum",
 ) -> List[OnchainStream]:
+    # Stream names are part of event ids; Ethereum keeps the original names.
+    prefix = "" if chain == "ethereum" else f"{chain}_"
     streams: List[OnchainStream] = []
     if aave_pool_address:
         streams.append(
             OnchainStream(
-                name="aave_v3_liquidation",
+                name=f"{prefix}aave_v3_liquidation",
                 protocol="aave_v3",
                 address=aave_pool_address,
                 signature=AAVE_LIQUIDATION_SIGNATURE,
                 severity="high",
                 title="Aave v3 LiquidationCall",
                 tags=["liquidation"],
+                chain=chain,
             )
         )
     if uniswap_pool_address:
         streams.append(
             OnchainStream(
-                name="uniswap_v3_swap",
+                name=f"{prefix}uniswap_v3_swap",
                 protocol="uniswap_v3",
                 address=uniswap_pool_address,
                 signature=UNISWAP_SWAP_SIGNATURE,
                 severity="medium",
                 title="Uniswap v3 Swap",
                 tags=["swap"],
+                chain=chain,
             )
         )
     return streams
 
 
 def _topic0(signature: str) -> str:
+    from web3 import Web3
+
     return Web3.to_hex(Web3.keccak(text=signature))
 
 
-def _block_time(w3: Web3, block_number: int, cache: Dict[int, datetime]) -> datetime:
-    if block_number not in cache:
-        block = w3.eth.get_block(block_number)
-        cache[block_number] = datetime.fromtimestamp(block["timestamp"], timezone.utc)
-    return cache[block_number]
+class BlockClock:
+    """Block timestamps for one chain.
+
+    ``source="rpc"`` looks up every block with ``eth_getBlockByNumber``.
+    ``source="interpolate"`` looks up only the ends of each range passed to
+    ``prime`` and spaces the blocks in between evenly, which is exact on
+    chains with a fixed block time and saves one call per block. The cache is
+    cleared on every ``prime`` so memory does not grow with the range.
+    """
+
+    def __init__(self, w3: Web3, source: str = "rpc") -> None:
+        if source not in BLOCK_TIME_SOURCES:
+            raise ValueError(f"block time source must be one of {', '.join(BLOCK_TIME_SOURCES)}")
+        self.w3 = w3
+        self.source = source
+        self._cache: Dict[int, datetime] = {}
+        self._span: Optional[Tuple[int, float, int, float]] = None
+
+    def _lookup(self, block_number: int) -> datetime:
+        if block_number not in self._cache:
+            RPC_CALLS.inc(method="eth_getBlockByNumber")
+            with RPC_LATENCY.time(method="eth_getBlockByNumber"):
+                block = self.w3.eth.get_block(block_number)
+            self._cache[block_number] = datetime.fromtimestamp(block["timestamp"], timezone.utc)
+        return self._cache[block_number]
+
+    def prime(self, from_block: int, to_block: int) -> None:
+        self._cache.clear()
+        self._span = None
+        if self.source == "interpolate":
+            start = self._lookup(from_block).timestamp()
+            end = self._lookup(to_block).timestamp() if to_block != from_block else start
+            self._span = (from_block, start, to_block, end)
+
+    def time(self, block_number: int) -> datetime:
+        span = self._span
+        if span is None or not span[0] <= block_number <= span[2]:
+            return self._lookup(block_number)
+        first, start, last, end = span
+        if last == first:
+            return datetime.fromtimestamp(start, timezone.utc)
+        seconds = start + (end - start) * (block_number - first) / (last - first)
+        return datetime.fromtimestamp(round(seconds), timezone.utc)
 
 
 def fetch_stream_events(
@@ -74,7 +129,10 @@ def fetch_stream_events(
     stream: OnchainStream,
     from_block: int,
     to_block: int,
+    clock: Optional[BlockClock] = None,
 ) -> List[Event]:
+    from web3 import Web3
+
     from_block_hex = hex(from_block)
     to_block_hex = hex(to_block)
     address = Web3.to_checksum_address(stream.address)
@@ -85,16 +143,19 @@ def fetch_stream_events(
         "address": address,
         "topics": [topic0],
     }
-    logs = w3.eth.get_logs(filter_params)
+    RPC_CALLS.inc(method="eth_getLogs")
+    with RPC_LATENCY.time(method="eth_getLogs"):
+        logs = w3.eth.get_logs(filter_params)
     ingest_time = datetime.now(timezone.utc)
-    block_cache: Dict[int, datetime] = {}
+    if clock is None:
+        clock = BlockClock(w3)
     events: List[Event] = []
 
     for log in logs:
         block_number = log["blockNumber"]
         log_index = log["logIndex"]
         tx_hash = Web3.to_hex(log["transactionHash"])
-        event_time = _block_time(w3, block_number, block_cache)
+        event_time = clock.time(block_number)
         topics = [Web3.to_hex(topic) for topic in log["topics"]]
         events.append(
             Event(
@@ -105,7 +166,7 @@ def fetch_stream_events(
                 source="onchain",
                 kind="protocol_event",
                 protocol=stream.protocol,
-                chain="ethereum",
+                chain=stream.chain,
                 event_time=event_time,
                 ingest_time=ingest_time,
                 severity=stream.severity,
@@ -125,4 +186,36 @@ def fetch_stream_events(
             )
         )
 
+    INGEST_LAG.observe_many(
+        [(ingest_time - event.event_time).total_seconds() for event in events], source="onchain"
+    )
+    EVENTS_INGESTED.inc(len(events), source="onchain")
     return events
+
+
+def block_chunks(from_block: int, to_block: int, chunk_blocks: int) -> List[Tuple[int, int]]:
+    """Inclusive ``[start, end]`` ranges of at most ``chunk_blocks`` blocks."""
+    step = max(1, chunk_blocks)
+    return [(start, min(to_block, start + step - 1)) for start in range(from_block, to_block + 1, step)]
+
+
+def iter_range_events(
+    w3: Web3,
+    streams: Sequence[OnchainStream],
+    from_block: int,
+    to_block: int,
+    chunk_blocks: int,
+    block_time: str = "rpc",
+) -> Iterator[Event]:
+    """Yield events for every stream, one ``chunk_blocks`` slice at a time.
+
+    Only one slice's logs are held in memory, so memory does not grow with
+    the range, and events come out roughly in block order. Event ids embed
+    the stream, transaction and log index, so slices never overlap. Streams
+    share one ``BlockClock`` per slice, so a block's timestamp is fetched once.
+    """
+    clock = BlockClock(w3, block_time)
+    for start, end in block_chunks(from_block, to_block, chunk_blocks):
+        clock.prime(start, end)
+        for stream in streams:
+            yield from fetch_stream_events(w3, stream, start, end, clock)
@@ -0,0 +1,430 @@
+from __future__ import annotations
+
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from observability.metrics import counter, histogram
+
+if TYPE_CHECKING:
+    from web3 import Web3
+
+PROVIDER_LATENCY = histogram(
+    "sentinel_rpc_provider_latency_seconds", "HTTP round trip per JSON-RPC provider", ("provider",)
+)
+PROVIDER_ERRORS = counter(
+    "sentinel_rpc_provider_errors_total", "Failed JSON-RPC attempts by provider and error class", ("provider", "error")
+)
+RPC_RETRIES = counter("sentinel_rpc_retries_total", "JSON-RPC attempts retried, by error class", ("error",))
+RPC_HEDGES = counter("sentinel_rpc_hedges_total", "Hedged JSON-RPC requests by which attempt won", ("winner",))
+THROTTLE_WAIT = histogram(
+    "sentinel_rpc_throttle_seconds", "Time spent waiting on a provider's token bucket", ("provider",)
+)
+
+# Error classes. Only these are retried; anything else is returned or raised at once.
+RETRYABLE = ("rate_limited", "timeout", "connection", "server")
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    """One JSON-RPC provider.
+
+    ``weight`` sets its share of traffic among healthy endpoints. ``rate``
+    (requests per second, ``burst`` deep) is enforced client-side so parallel
+    callers stay under the provider's quota instead of collecting 429s.
+    """
+
+    name: str
+    url: str
+    weight: float = 1.0
+    rate: Optional[float] = None
+    burst: int = 10
+    timeout: float = 10.0
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Jittered exponential backoff, with a base delay per error class.
+
+    Attempt ``n`` sleeps a uniform random time in ``[0, min(max_delay,
+    base * 2**n)]`` ("full jitter"); a 429's ``Retry-After`` is a floor.
+    """
+
+    max_attempts: int = 5
+    max_delay: float = 8.0
+    base_delays: Dict[str, float] = field(
+        default_factory=lambda: {"rate_limited": 1.0, "timeout": 0.25, "connection": 0.25, "server": 0.5}
+    )
+
+    def delay(self, error: str, attempt: int, rng: random.Random, floor: float = 0.0) -> float:
+        base = self.base_delays.get(error, 0.5)
+        return max(floor, rng.uniform(0.0, min(self.max_delay, base * 2**attempt)))
+
+
+class RpcTransportError(OSError):
+    """A request that failed (HTTP error, timeout or rate limit) on its last allowed attempt."""
+
+    def __init__(self, error: str, provider: str, message: str, retry_after: float = 0.0) -> None:
+        super().__init__(f"{provider}: {error}: {message}")
+        self.error = error
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Client-side rate limiter; ``pause`` stops refilling until a 429 has passed."""
+
+    def __init__(self, rate: Optional[float], burst: int) -> None:
+        self.rate = rate
+        self.capacity = float(max(1, burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until one is available; returns seconds waited."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now >= self.updated:
+                    if self.rate is None:
+                        return waited
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1.0:
+                        self.tokens -= 1.0
+                        return waited
+                    pause = (1.0 - self.tokens) / self.rate
+                else:
+                    pause = self.updated - now
+            time.sleep(pause)
+            waited += pause
+
+    def pause(self, seconds: float) -> None:
+        """Empty the bucket and hold it empty for ``seconds``, so callers resume at the steady rate."""
+        with self.lock:
+            self.tokens = 0.0
+            self.updated = max(self.updated, time.monotonic() + seconds)
+
+
+@dataclass
+class _ProviderState:
+    endpoint: Endpoint
+    bucket: TokenBucket
+    session: Any
+    failures: int = 0
+    cooldown_until: float = 0.0
+    requests: int = 0
+    errors: Dict[str, int] = field(default_factory=dict)
+    latencies: List[float] = field(default_factory=list)
+
+
+def classify_response(status: int, body: Any) -> Optional[str]:
+    """Error class for an HTTP status and decoded body, or None when usable."""
+    if status == 429:
+        return "rate_limited"
+    if status >= 500:
+        return "server"
+    if status >= 400:
+        return "client"
+    error = body.get("error") if isinstance(body, dict) else None
+    if isinstance(error, dict):
+        message = str(error.get("message", "")).lower()
+        if error.get("code") == 429 or (error.get("code") == -32005 and "rate" in message):
+            return "rate_limited"
+    return None
+
+
+class RpcClient:
+    """JSON-RPC over pooled keep-alive sessions with throttling, retries and failover.
+
+    Each attempt picks an endpoint at random by ``weight`` among those not
+    cooling down, waits on that endpoint's token bucket, and posts through its
+    ``requests.Session`` (one connection pool per endpoint). Retryable
+    failures (see ``RETRYABLE``) put the endpoint in a cooldown that doubles
+    with consecutive failures and move the retry elsewhere. With
+    ``hedge_after`` set, a request still unanswered after that many seconds is
+    sent to a second endpoint too and the first usable answer wins; all
+    supported methods are reads, so duplicates are harmless.
+
+    JSON-RPC errors other than rate limits are returned to the caller
+    unchanged, the same way a single ``HTTPProvider`` would.
+    """
+
+    LATENCY_WINDOW = 2048
+
+    def __init__(
+        self,
+        endpoints: Sequence[Endpoint],
+        retry: RetryPolicy = RetryPolicy(),
+        hedge_after: Optional[float] = None,
+        pool_size: int = 8,
+        cooldown: float = 1.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        if not endpoints:
+            raise ValueError("at least one RPC endpoint is required")
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.retry = retry
+        self.hedge_after = hedge_after
+        self.cooldown = cooldown
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.providers: List[_ProviderState] = []
+        for endpoint in endpoints:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({"Content-Type": "application/json"})
+            self.providers.append(_ProviderState(endpoint, TokenBucket(endpoint.rate, endpoint.burst), session))
+        self._hedge_pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="rpc-hedge") if hedge_after else None
+
+    # --- public API -----------------------------------------------------------
+
+    def call(self, method: str, params: Sequence[Any] = ()) -> dict:
+        """One JSON-RPC call; returns the response object (``result`` or ``error``)."""
+        return self.post({"jsonrpc": "2.0", "id": self._next_id(), "method": method, "params": list(params)})
+
+    def batch(self, calls: Sequence[Tuple[str, Sequence[Any]]]) -> List[dict]:
+        """Several calls in one HTTP request; responses come back in call order."""
+        payload = [
+            {"jsonrpc": "2.0", "id": self._next_id(), "method": method, "params": list(params)}
+            for method, params in calls
+        ]
+        response = self.post(payload)
+        if not isinstance(response, list):
+            return [response] * len(payload)
+        by_id = {item.get("id"): item for item in response}
+        return [by_id.get(item["id"], {"error": {"code": -32603, "message": "missing"}}) for item in payload]
+
+    def post(self, payload: Any) -> Any:
+        return self.post_raw(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+
+    def post_raw(self, body: bytes) -> Any:
+        """Send an encoded request (single or batch) and return the decoded response."""
+        last: Optional[RpcTransportError] = None
+        excluded: Optional[_ProviderState] = None
+        for attempt in range(max(1, self.retry.max_attempts)):
+            provider = self._pick(excluded)
+            try:
+                if self._hedge_pool is not None and len(self.providers) > 1:
+                    return self._hedged(provider, body)
+                return self._attempt(provider, body)
+            except RpcTransportError as exc:
+                last = exc
+                if exc.error not in RETRYABLE or attempt + 1 >= self.retry.max_attempts:
+                    break
+                RPC_RETRIES.inc(error=exc.error)
+                excluded = self._state(exc.provider)
+                time.sleep(self.retry.delay(exc.error, attempt, self._rng, exc.retry_after))
+        assert last is not None
+        raise last
+
+    def stats(self) -> Dict[str, dict]:
+        """Per-provider request, error and latency figures since the client was built."""
+        report: Dict[str, dict] = {}
+        for provider in self.providers:
+            with self._lock:
+                latencies = list(provider.latencies)
+                errors = dict(provider.errors)
+                requests_made = provider.requests
+            report[provider.endpoint.name] = {
+                "requests": requests_made,
+                "errors": errors,
+                "latency_ms": {
+                    f"p{point}": _percentile_ms(latencies, point) for point in (50, 95, 99)
+                } if latencies else {},
+            }
+        return report
+
+    def close(self) -> None:
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+        for provider in self.providers:
+            provider.session.close()
+
+    # --- internals --------------------------------------------------------------
+
+    def _next_id(self) -> int:
+        with self._lock:
+            return next(self._ids)
+
+    def _state(self, name: str) -> Optional[_ProviderState]:
+        return next((provider for provider in self.providers if provider.endpoint.name == name), None)
+
+    def _pick(self, excluded: Optional[_ProviderState] = None) -> _ProviderState:
+        now = time.monotonic()
+        with self._lock:
+            healthy = [p for p in self.providers if p.cooldown_until <= now and p is not excluded]
+            if not healthy:
+                # Everyone is cooling down: use whoever recovers first.
+                candidates = [p for p in self.providers if p is not excluded] or self.providers
+                return min(candidates, key=lambda p: p.cooldown_until)
+            weights = [max(p.endpoint.weight, 0.0) for p in healthy]
+            if not any(weights):
+                return healthy[0]
+            return self._rng.choices(healthy, weights)[0]
+
+    def _attempt(self, provider: _ProviderState, body: bytes) -> Any:
+        import requests
+
+        endpoint = provider.endpoint
+        waited = provider.bucket.acquire()
+        if waited:
+            THROTTLE_WAIT.observe(waited, provider=endpoint.name)
+        started = time.perf_counter()
+        retry_after = 0.0
+        try:
+            response = provider.session.post(endpoint.url, data=body, timeout=endpoint.timeout)
+            try:
+                decoded = response.json()
+            except ValueError:
+                decoded = None
+            error = classify_response(response.status_code, decoded)
+            if error is None and decoded is None:
+                error = "server"
+            retry_after = _retry_after(response.headers.get("Retry-After"))
+            message = f"HTTP {response.status_code}"
+        except requests.Timeout as exc:
+            error, message, decoded = "timeout", str(exc), None
+        except requests.ConnectionError as exc:
+            error, message, decoded = "connection", str(exc), None
+        elapsed = time.perf_counter() - started
+        PROVIDER_LATENCY.observe(elapsed, provider=endpoint.name)
+        with self._lock:
+            provider.requests += 1
+            provider.latencies.append(elapsed)
+            if len(provider.latencies) > self.LATENCY_WINDOW:
+                del provider.latencies[: -self.LATENCY_WINDOW]
+            if error is None:
+                provider.failures = 0
+                provider.cooldown_until = 0.0
+            else:
+                provider.errors[error] = provider.errors.get(error, 0) + 1
+                if error == "rate_limited":
+                    provider.bucket.pause(retry_after or self.retry.base_delays.get(error, 1.0))
+                if error in RETRYABLE:
+                    provider.failures += 1
+                    pause = max(retry_after, self.cooldown * 2 ** (provider.failures - 1))
+                    provider.cooldown_until = time.monotonic() + min(pause, self.retry.max_delay)
+        if error is not None:
+            PROVIDER_ERRORS.inc(provider=endpoint.name, error=error)
+            raise RpcTransportError(error, endpoint.name, message, retry_after)
+        return decoded
+
+    def _hedged(self, primary: _ProviderState, body: bytes) -> Any:
+        assert self._hedge_pool is not None
+        first: Future = self._hedge_pool.submit(self._attempt, primary, body)
+        done, _ = wait([first], timeout=self.hedge_after)
+        if done:
+            return first.result()
+        backup = self._pick(primary)
+        if backup is primary:
+            return first.result()
+        second: Future = self._hedge_pool.submit(self._attempt, backup, body)
+        pending = {first: "primary", second: "hedge"}
+        failure: Optional[BaseException] = None
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                winner = pending.pop(future)
+                exc = future.exception()
+                if exc is None:
+                    RPC_HEDGES.inc(winner=winner)
+                    return future.result()
+                failure = exc
+        assert failure is not None
+        raise failure
+
+
+def _percentile_ms(samples: List[float], point: int) -> float:
+    ordered = sorted(samples)
+    return round(ordered[max(0, math.ceil(point / 100.0 * len(ordered)) - 1)] * 1000.0, 3)
+
+
+def _retry_after(value: Optional[str]) -> float:
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return 0.0
+
+
+def parse_endpoints(
+    raw: Optional[str],
+    default_rate: Optional[float] = None,
+    timeout: float = 10.0,
+) -> List[Endpoint]:
+    """Parse ``url|weight|rate`` entries separated by commas (weight and rate optional)."""
+    endpoints: List[Endpoint] = []
+    for position, item in enumerate((raw or "").split(",")):
+        text = item.strip()
+        if not text:
+            continue
+        parts = [part.strip() for part in text.split("|")]
+        if len(parts) > 3:
+            raise ValueError("RPC endpoints must be url|weight|rate")
+        weight = float(parts[1]) if len(parts) > 1 and parts[1] else 1.0
+        rate = float(parts[2]) if len(parts) > 2 and parts[2] else default_rate
+        endpoints.append(
+            Endpoint(
+                name=_endpoint_name(parts[0], position),
+                url=parts[0],
+                weight=weight,
+                rate=rate,
+                timeout=timeout,
+            )
+        )
+    return endpoints
+
+
+def _endpoint_name(url: str, position: int) -> str:
+    # Host only: URLs often embed API keys, which must not end up in metric labels.
+    from urllib.parse import urlsplit
+
+    host = urlsplit(url).netloc or url
+    return f"{position}:{host.rsplit('@', 1)[-1]}"
+
+
+def connect(client: RpcClient) -> "Web3":
+    """``Web3`` instance whose requests all go through ``client``."""
+    from web3 import Web3
+
+    return Web3(_pooled_provider(client))
+
+
+def _pooled_provider(client: RpcClient) -> Any:
+    from web3.providers.base import JSONBaseProvider
+
+    class PooledProvider(JSONBaseProvider):
+        def make_request(self, method: Any, params: Any) -> Any:
+            return client.post_raw(self.encode_rpc_request(method, params))
+
+        def make_batch_request(self, requests: List[Tuple[Any, Any]]) -> Any:
+            response = client.post_raw(self.encode_batch_rpc_request(requests))
+            if not isinstance(response, list):
+                return response
+            return sorted(response, key=lambda item: item.get("id") or 0)
+
+        def is_connected(self, show_traceback: bool = False) -> bool:
+            try:
+                response = client.call("web3_clientVersion")
+            except OSError:
+                if show_traceback:
+                    raise
+                return False
+            return "result" in response
+
+    return PooledProvider()
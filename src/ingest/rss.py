@@ -3,11 +3,15 @@ from __future__ import annotations
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from email.utils import parsedate_to_datetime
-from typing import Iterable, List, Optional
+from typing import Iterable, Iterator, List, Optional
 
 import feedparser
 
+from ingest.metrics import EVENTS_DEDUPED, EVENTS_INGESTED, INGEST_LAG
 from normalize.schema import Event
+from observability.metrics import histogram
+
+FEED_FETCH = histogram("sentinel_feed_fetch_seconds", "Time to fetch and parse one RSS feed", ("feed",))
 
 
 @dataclass(frozen=True)
@@ -57,7 +61,9 @@ def _entries(feed_url: str) -> Iterable[dict]:
 def fetch_feed(feed: RssFeed) -> List[Event]:
     events: List[Event] = []
     ingest_time = datetime.now(timezone.utc)
-    for entry in _entries(feed.url):
+    with FEED_FETCH.time(feed=feed.url):
+        entries = list(_entries(feed.url))
+    for entry in entries:
         title = entry.get("title", "")
         summary = entry.get("summary", None)
         source_url = entry.get("link", None)
@@ -84,16 +90,24 @@ def fetch_feed(feed: RssFeed) -> List[Event]:
                 },
             )
         )
+    INGEST_LAG.observe_many(
+        [(ingest_time - event.event_time).total_seconds() for event in events], source="offchain"
+    )
+    EVENTS_INGESTED.inc(len(events), source="offchain")
     return events
 
 
-def fetch_all(feeds: Iterable[RssFeed] = DEFAULT_FEEDS) -> List[Event]:
-    events: List[Event] = []
+def iter_all(feeds: Iterable[RssFeed] = DEFAULT_FEEDS) -> Iterator[Event]:
+    """Yield events feed by feed, dropping ids already seen in an earlier feed."""
     seen = set()
     for feed in feeds:
         for event in fetch_feed(feed):
             if event.event_id in seen:
+                EVENTS_DEDUPED.inc(source="offchain")
                 continue
             seen.add(event.event_id)
-            events.append(event)
-    return events
+            yield event
+
+
+def fetch_all(feeds: Iterable[RssFeed] = DEFAULT_FEEDS) -> List[Event]:
+    return list(iter_all(feeds))
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+from observability.metrics import counter
+
+SEGMENTS_WRITTEN = counter(
+    "sentinel_ingest_segments_written_total", "Compressed event segments written by ingest"
+)
+SEGMENTS_SKIPPED = counter(
+    "sentinel_ingest_segments_skipped_total", "Event segments skipped by index lookups"
+)
+
+EVENT_SUFFIXES = (".jsonl", ".jsonl.gz")
+INDEX_SUFFIX = ".idx.json"
+DEFAULT_SEGMENT_EVENTS = 2048
+INDEX_VERSION = 1
+
+
+@dataclass
+class Segment:
+    """One independently decompressible gzip member of an event file."""
+
+    offset: int
+    length: int
+    events: int
+    min_time: Optional[str]
+    max_time: Optional[str]
+    min_block: Optional[int]
+    max_block: Optional[int]
+
+    def overlaps(
+        self,
+        since: Optional[datetime],
+        until: Optional[datetime],
+        min_block: Optional[int],
+        max_block: Optional[int],
+    ) -> bool:
+        if since is not None and self.max_time is not None and _parse_time(self.max_time) < since:
+            return False
+        if until is not None and self.min_time is not None and _parse_time(self.min_time) > until:
+            return False
+        if min_block is not None or max_block is not None:
+            if self.max_block is None:
+                return False
+            if min_block is not None and self.max_block < min_block:
+                return False
+            if max_block is not None and self.min_block is not None and self.min_block > max_block:
+                return False
+        return True
+
+
+def _parse_time(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def index_path(path: Path) -> Path:
+    return path.with_name(path.name + INDEX_SUFFIX)
+
+
+def is_compressed(path: Path) -> bool:
+    return path.name.endswith(".gz")
+
+
+def event_files(directory: Path) -> List[Path]:
+    """Event files under ``directory``: plain ``*.jsonl`` and segmented ``*.jsonl.gz``.
+
+    Subdirectories are included, so per-chain partitions such as
+    ``onchain/<chain>/*.jsonl.gz`` are picked up with the flat files.
+    """
+    if not directory.exists():
+        return []
+    return sorted(
+        path
+        for path in directory.rglob("*")
+        if path.is_file() and path.name.endswith(EVENT_SUFFIXES)
+    )
+
+
+class SegmentWriter:
+    """Stream events into a file of gzip members with a sidecar block index.
+
+    Every ``segment_events`` events are compressed as their own gzip member,
+    so the file is still a valid ``.gz`` for ``zcat``, ``gzip.open`` and
+    DuckDB, while ``iter_events`` can seek straight to the members covering
+    a time or block range. Only one segment is buffered at a time. Output
+    goes to a temporary file that replaces ``path`` on ``close``; if the
+    ``with`` block raises, the previous file is left untouched.
+    """
+
+    def __init__(self, path: Path, segment_events: int = DEFAULT_SEGMENT_EVENTS, level: int = 6) -> None:
+        self.path = path
+        self.segment_events = max(1, segment_events)
+        self.level = level
+        self.count = 0
+        self.segments: List[Segment] = []
+        self._tmp_path = path.with_name(path.name + ".tmp")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._handle = self._tmp_path.open("wb")
+        self._offset = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        self._lines: List[bytes] = []
+        self._min_time: Optional[Tuple[datetime, str]] = None
+        self._max_time: Optional[Tuple[datetime, str]] = None
+        self._min_block: Optional[int] = None
+        self._max_block: Optional[int] = None
+
+    def write(self, event: Any) -> None:
+        """Append an ``Event`` (or an already-serialised dict)."""
+        payload = event.model_dump(mode="json") if hasattr(event, "model_dump") else event
+        self._lines.append(json.dumps(payload).encode("utf-8") + b"\n")
+        event_time = payload.get("event_time")
+        if event_time:
+            parsed = _parse_time(event_time)
+            if self._min_time is None or parsed < self._min_time[0]:
+                self._min_time = (parsed, event_time)
+            if self._max_time is None or parsed > self._max_time[0]:
+                self._max_time = (parsed, event_time)
+        block = payload.get("block_number")
+        if block is not None:
+            self._min_block = block if self._min_block is None else min(self._min_block, block)
+            self._max_block = block if self._max_block is None else max(self._max_block, block)
+        self.count += 1
+        if len(self._lines) >= self.segment_events:
+            self._flush()
+
+    def write_all(self, events: Iterable[Any]) -> int:
+        for event in events:
+            self.write(event)
+        return self.count
+
+    def _flush(self) -> None:
+        if not self._lines:
+            return
+        data = gzip.compress(b"".join(self._lines), compresslevel=self.level, mtime=0)
+        self._handle.write(data)
+        self.segments.append(
+            Segment(
+                offset=self._offset,
+                length=len(data),
+                events=len(self._lines),
+                min_time=self._min_time[1] if self._min_time else None,
+                max_time=self._max_time[1] if self._max_time else None,
+                min_block=self._min_block,
+                max_block=self._max_block,
+            )
+        )
+        self._offset += len(data)
+        SEGMENTS_WRITTEN.inc()
+        self._reset()
+
+    def close(self) -> None:
+        if self._handle.closed:
+            return
+        self._flush()
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+        self._handle.close()
+        os.replace(self._tmp_path, self.path)
+        index = {
+            "version": INDEX_VERSION,
+            "size": self._offset,
+            "events": self.count,
+            "segments": [asdict(segment) for segment in self.segments],
+        }
+        target = index_path(self.path)
+        tmp_index = target.with_name(target.name + ".tmp")
+        tmp_index.write_text(json.dumps(index, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp_index, target)
+
+    def abort(self) -> None:
+        if not self._handle.closed:
+            self._handle.close()
+        self._tmp_path.unlink(missing_ok=True)
+
+    def __enter__(self) -> "SegmentWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def read_index(path: Path) -> Optional[List[Segment]]:
+    """Segments of ``path``, or None when the index is missing or stale."""
+    try:
+        index = json.loads(index_path(path).read_text(encoding="utf-8"))
+        size = path.stat().st_size
+    except (FileNotFoundError, ValueError):
+        return None
+    if index.get("version") != INDEX_VERSION or index.get("size") != size:
+        return None
+    return [Segment(**segment) for segment in index["segments"]]
+
+
+def read_segment(path: Path, offset: int, length: int) -> bytes:
+    """Decompressed bytes of the gzip member at ``[offset, offset + length)``."""
+    with path.open("rb") as handle:
+        handle.seek(offset)
+        return gzip.decompress(handle.read(length))
+
+
+def iter_lines(path: Path) -> Iterator[str]:
+    """Lines of a plain or gzip-compressed JSONL file, streamed."""
+    if is_compressed(path):
+        with gzip.open(path, "rt", encoding="utf-8") as handle:
+            yield from handle
+    else:
+        with path.open("r", encoding="utf-8") as handle:
+            yield from handle
+
+
+def read_bytes(path: Path) -> bytes:
+    """Whole decompressed contents of a plain or gzip-compressed file."""
+    data = path.read_bytes()
+    return gzip.decompress(data) if is_compressed(path) else data
+
+
+def iter_events(
+    path: Path,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    min_block: Optional[int] = None,
+    max_block: Optional[int] = None,
+) -> Iterator[dict]:
+    """Events of ``path`` with ``since <= event_time <= until`` and a block in range.
+
+    Bounds are inclusive and optional; a block bound drops events without a
+    ``block_number``. With a valid index only the overlapping segments are
+    read and decompressed; otherwise the file is scanned.
+    """
+    segments = read_index(path) if is_compressed(path) else None
+    if segments is None:
+        lines: Iterable[Any] = iter_lines(path)
+    else:
+        lines = _segment_lines(path, segments, since, until, min_block, max_block)
+    for line in lines:
+        text = line.strip()
+        if not text:
+            continue
+        payload = json.loads(text)
+        if since is not None or until is not None:
+            event_time = _parse_time(payload["event_time"])
+            if (since is not None and event_time < since) or (until is not None and event_time > until):
+                continue
+        if min_block is not None or max_block is not None:
+            block = payload.get("block_number")
+            if block is None or (min_block is not None and block < min_block):
+                continue
+            if max_block is not None and block > max_block:
+                continue
+        yield payload
+
+
+def _segment_lines(
+    path: Path,
+    segments: List[Segment],
+    since: Optional[datetime],
+    until: Optional[datetime],
+    min_block: Optional[int],
+    max_block: Optional[int],
+) -> Iterator[bytes]:
+    with path.open("rb") as handle:
+        for segment in segments:
+            if not segment.overlaps(since, until, min_block, max_block):
+                SEGMENTS_SKIPPED.inc()
+                continue
+            handle.seek(segment.offset)
+            yield from gzip.decompress(handle.read(segment.length)).splitlines()
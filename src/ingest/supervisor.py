@@ -0,0 +1,424 @@
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+import dataclasses
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection, wait
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ingest.chains import ChainConfig
+from ingest.metrics import EVENTS_INGESTED
+from ingest.onchain import block_chunks
+from ingest.segments import DEFAULT_SEGMENT_EVENTS, SEGMENTS_WRITTEN, SegmentWriter, index_path, iter_events
+from observability import profiling
+from observability.metrics import counter, histogram
+
+SHARD_RUNS = counter(
+    "sentinel_ingest_shards_total", "On-chain ingest shards by final status", ("chain", "status")
+)
+SHARD_SECONDS = histogram(
+    "sentinel_ingest_shard_seconds", "Wall time of one on-chain ingest shard", ("chain",)
+)
+
+CURSOR_NAME = "cursor.json"
+PARTITION_SUFFIX = ".jsonl.gz"
+# Single-file output of the ethereum-only ingest, newest format first.
+LEGACY_NAMES = ("onchain_events.jsonl.gz", "onchain_events.jsonl")
+LEGACY_CHAIN = "ethereum"
+
+
+@dataclass(frozen=True)
+class ShardTask:
+    chain: ChainConfig
+    index: int
+    from_block: int
+    to_block: int
+    output: Path
+    segment_events: int = DEFAULT_SEGMENT_EVENTS
+
+
+@dataclass
+class ShardResult:
+    chain: str
+    index: int
+    from_block: int
+    to_block: int
+    status: str = "ok"
+    events: int = 0
+    segments: int = 0
+    seconds: float = 0.0
+    error: str = ""
+    rpc: Dict[str, dict] = field(default_factory=dict)
+
+
+def chain_dir(root: Path, chain: str) -> Path:
+    return root / "onchain" / chain
+
+
+def partition_path(root: Path, chain: str, from_block: int, to_block: int) -> Path:
+    # Zero-padded so partitions sort in block order.
+    return chain_dir(root, chain) / f"{from_block:012d}-{to_block:012d}{PARTITION_SUFFIX}"
+
+
+def staging_path(partition: Path, run_id: str) -> Path:
+    """Where run ``run_id`` writes a shard before it is committed as ``partition``.
+
+    The name does not end in an event suffix, so readers never pick it up.
+    """
+    return partition.with_name(f"{partition.name}.{run_id}")
+
+
+def partition_range(path: Path) -> Optional[Tuple[int, int]]:
+    stem = path.name[: -len(PARTITION_SUFFIX)] if path.name.endswith(PARTITION_SUFFIX) else ""
+    first, _, last = stem.partition("-")
+    if not (first.isdigit() and last.isdigit()):
+        return None
+    return int(first), int(last)
+
+
+def migrate_legacy(root: Path) -> int:
+    """Move the single-file output of older runs into an ethereum partition.
+
+    The legacy file becomes ``<first>-<last>`` over its block range, so later
+    runs trim and replace it like any other partition. Legacy files are only
+    deleted once the partition is written. Returns the events carried over.
+    """
+    legacy = [root / name for name in LEGACY_NAMES if (root / name).exists()]
+    if not legacy:
+        return 0
+    first: Optional[int] = None
+    last: Optional[int] = None
+    for event in iter_events(legacy[0]):
+        block = event.get("block_number")
+        if block is not None:
+            first = block if first is None else min(first, block)
+            last = block if last is None else max(last, block)
+    moved = 0
+    if first is not None and last is not None:
+        target = partition_path(root, LEGACY_CHAIN, first, last)
+        with SegmentWriter(target) as writer:
+            moved = writer.write_all(iter_events(legacy[0]))
+    # An older .jsonl next to the .gz is a leftover of the same run.
+    for path in legacy:
+        path.unlink(missing_ok=True)
+        index_path(path).unlink(missing_ok=True)
+    return moved
+
+
+def read_cursor(root: Path, chain: str) -> Optional[int]:
+    """Next block to ingest for ``chain``, or None before the first run."""
+    try:
+        payload = json.loads((chain_dir(root, chain) / CURSOR_NAME).read_text(encoding="utf-8"))
+        return int(payload["next_block"])
+    except (FileNotFoundError, KeyError, ValueError):
+        return None
+
+
+def write_cursor(root: Path, chain: str, next_block: int) -> None:
+    path = chain_dir(root, chain) / CURSOR_NAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    payload = {
+        "chain": chain,
+        "next_block": next_block,
+        "updated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    tmp_path.write_text(json.dumps(payload), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def resolve_range(config: ChainConfig, head: int, cursor: Optional[int]) -> Optional[Tuple[int, int]]:
+    """Explicit START/END first, then resume from the cursor, else the lookback window."""
+    end = config.end_block if config.end_block is not None else head
+    if config.start_block is not None:
+        start = config.start_block
+    elif cursor is not None:
+        start = cursor
+    else:
+        start = max(0, end - (config.lookback_blocks - 1))
+    return (start, end) if start <= end else None
+
+
+def split_range(from_block: int, to_block: int, shards: int, chunk_blocks: int) -> List[Tuple[int, int]]:
+    """Up to ``shards`` contiguous ranges whose boundaries fall on chunk edges."""
+    chunks = block_chunks(from_block, to_block, chunk_blocks)
+    shards = max(1, min(shards, len(chunks)))
+    per_shard, extra = divmod(len(chunks), shards)
+    ranges: List[Tuple[int, int]] = []
+    position = 0
+    for index in range(shards):
+        size = per_shard + (1 if index < extra else 0)
+        ranges.append((chunks[position][0], chunks[position + size - 1][1]))
+        position += size
+    return ranges
+
+
+def chain_head(config: ChainConfig) -> int:
+    from ingest.rpc import connect
+
+    client = config.build_client()
+    try:
+        return connect(client).eth.block_number
+    finally:
+        client.close()
+
+
+def _head_failure(config: ChainConfig, status: str, error: str) -> ShardResult:
+    return ShardResult(config.name, 0, -1, -1, status, error=error)
+
+
+def plan_tasks(
+    configs: Sequence[ChainConfig],
+    root: Path,
+    run_id: str,
+    segment_events: int = DEFAULT_SEGMENT_EVENTS,
+    head_timeout: Optional[float] = None,
+) -> Tuple[List[ShardTask], List[ShardResult]]:
+    """Shard every chain's block range; chains whose head lookup fails are reported, not raised.
+
+    Heads are looked up concurrently, so one unreachable chain costs at most
+    ``head_timeout`` (or its RPC retry budget) and does not delay the rest.
+    Each shard writes to its ``staging_path`` for ``run_id``; only
+    ``commit_results`` moves it into place.
+    """
+    tasks: List[ShardTask] = []
+    failures: List[ShardResult] = []
+    pool = ThreadPoolExecutor(max_workers=max(1, len(configs)), thread_name_prefix="chain-head")
+    try:
+        futures = {config.name: pool.submit(chain_head, config) for config in configs if config.end_block is None}
+        deadline = time.monotonic() + head_timeout if head_timeout else None
+        for config in configs:
+            head = config.end_block
+            future = futures.get(config.name)
+            if future is not None:
+                try:
+                    remaining = max(0.0, deadline - time.monotonic()) if deadline else None
+                    head = future.result(timeout=remaining)
+                except FutureTimeout:
+                    failures.append(_head_failure(config, "timeout", "head lookup timed out"))
+                    continue
+                except Exception as exc:  # reported per chain
+                    failures.append(_head_failure(config, "failed", f"{type(exc).__name__}: {exc}"))
+                    continue
+            span = resolve_range(config, head, read_cursor(root, config.name))
+            if span is None:
+                continue
+            for index, (start, end) in enumerate(split_range(*span, config.shards, config.chunk_blocks)):
+                output = staging_path(partition_path(root, config.name, start, end), run_id)
+                tasks.append(ShardTask(config, index, start, end, output, segment_events))
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return tasks, failures
+
+
+def run_shard(task: ShardTask) -> ShardResult:
+    """Fetch one shard into its partition file. Runs inside a worker process."""
+    from ingest.onchain import build_default_streams, iter_range_events
+    from ingest.rpc import connect
+
+    config = task.chain
+    result = ShardResult(config.name, task.index, task.from_block, task.to_block)
+    started = time.perf_counter()
+    client = config.build_client()
+    try:
+        streams = build_default_streams(config.aave_pool, config.uniswap_pool, config.name)
+        w3 = connect(client)
+        with SegmentWriter(task.output, task.segment_events) as writer:
+            writer.write_all(
+                iter_range_events(
+                    w3, streams, task.from_block, task.to_block, config.chunk_blocks, config.block_time
+                )
+            )
+        result.events = writer.count
+        result.segments = len(writer.segments)
+    except Exception as exc:  # reported to the supervisor
+        result.status = "failed"
+        result.error = f"{type(exc).__name__}: {exc}"
+    finally:
+        result.rpc = client.stats()
+        client.close()
+    result.seconds = round(time.perf_counter() - started, 3)
+    return result
+
+
+def _shard_main(
+    task: ShardTask, sender: Connection, profile: Optional[profiling.ProfileConfig] = None
+) -> None:
+    if profile is not None:
+        profiling.configure(
+            dataclasses.replace(profile, script=f"{profile.script}-{task.chain.name}-{task.index}")
+        )
+    with profiling.profile("ingest"):
+        result = run_shard(task)
+    sender.send(result)
+    sender.close()
+
+
+def supervise(tasks: Sequence[ShardTask], workers: int, timeout: Optional[float] = None) -> List[ShardResult]:
+    """Run each task in its own spawned process, at most ``workers`` at once.
+
+    A worker that crashes or exceeds ``timeout`` seconds is recorded as
+    ``failed``/``timeout`` and its partial output removed; the others carry
+    on. Results come back in task order. Workers inherit the active
+    profiling config, so a profiled ``ingest`` stage is recorded per shard.
+    """
+    context = multiprocessing.get_context("spawn")
+    profile = profiling.current()
+    pending = list(enumerate(tasks))
+    pending.reverse()
+    running: Dict[Connection, Tuple[int, ShardTask, object, float]] = {}
+    results: Dict[int, ShardResult] = {}
+
+    def finish(receiver: Connection, result: ShardResult) -> None:
+        key, task, process, _ = running.pop(receiver)
+        receiver.close()
+        process.join(timeout=5)  # type: ignore[attr-defined]
+        if result.status != "ok":
+            task.output.with_name(task.output.name + ".tmp").unlink(missing_ok=True)
+        results[key] = result
+
+    while pending or running:
+        while pending and len(running) < max(1, workers):
+            key, task = pending.pop()
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_shard_main, args=(task, sender, profile), name=f"ingest-{task.chain.name}-{task.index}"
+            )
+            process.start()
+            sender.close()
+            running[receiver] = (key, task, process, time.monotonic())
+        for receiver in wait(list(running), timeout=0.5):
+            task = running[receiver][1]
+            try:
+                result = receiver.recv()
+            except EOFError:
+                process = running[receiver][2]
+                process.join(timeout=5)  # type: ignore[attr-defined]
+                exit_code = process.exitcode  # type: ignore[attr-defined]
+                result = ShardResult(
+                    task.chain.name, task.index, task.from_block, task.to_block, "failed",
+                    error=f"worker exited with code {exit_code}",
+                )
+            finish(receiver, result)
+        if timeout:
+            now = time.monotonic()
+            for receiver, (_, task, process, started) in list(running.items()):
+                if now - started > timeout:
+                    process.terminate()  # type: ignore[attr-defined]
+                    finish(
+                        receiver,
+                        ShardResult(
+                            task.chain.name, task.index, task.from_block, task.to_block, "timeout",
+                            seconds=round(now - started, 3), error=f"exceeded {timeout:g}s",
+                        ),
+                    )
+    return [results[key] for key in range(len(tasks))]
+
+
+def _trim_partition(
+    root: Path, chain: str, path: Path, span: Tuple[int, int], from_block: int, to_block: int
+) -> None:
+    """Remove blocks ``from_block..to_block`` from an older partition.
+
+    Blocks outside the range are rewritten into partitions of their own,
+    so re-fetching part of a partition never drops the rest of it.
+    """
+    if span[1] < from_block or span[0] > to_block:
+        return
+    for first, last in ((span[0], from_block - 1), (to_block + 1, span[1])):
+        if first > last:
+            continue
+        with SegmentWriter(partition_path(root, chain, first, last)) as writer:
+            writer.write_all(iter_events(path, min_block=first, max_block=last))
+    path.unlink(missing_ok=True)
+    index_path(path).unlink(missing_ok=True)
+
+
+def _install(staged: Path, target: Path) -> None:
+    # The old index goes first, so a reader never pairs it with the new file.
+    index_path(target).unlink(missing_ok=True)
+    os.replace(staged, target)
+    if index_path(staged).exists():
+        os.replace(index_path(staged), index_path(target))
+
+
+def commit_results(root: Path, results: Sequence[ShardResult], run_id: str) -> Dict[str, Optional[int]]:
+    """Advance cursors and move the output this run can keep into place.
+
+    A chain's cursor only moves past shards that all succeeded in order.
+    Those shards' staged output (see ``staging_path``) replaces the
+    partitions at their paths, and older partitions that overlap them lose
+    the blocks they cover. Staged output of later shards is deleted, so the
+    next run refetches those blocks without duplicating them; partitions
+    already on disk are never removed because a shard failed.
+    Returns the new cursor per chain (None when it did not move).
+    """
+    cursors: Dict[str, Optional[int]] = {}
+    by_chain: Dict[str, List[ShardResult]] = {}
+    for result in results:
+        by_chain.setdefault(result.chain, []).append(result)
+    for chain, shard_results in by_chain.items():
+        shard_results.sort(key=lambda item: item.from_block)
+        kept: List[ShardResult] = []
+        for result in shard_results:
+            if result.status != "ok" or (kept and kept[-1].to_block + 1 != result.from_block):
+                break
+            kept.append(result)
+        kept_outputs = {partition_path(root, chain, item.from_block, item.to_block) for item in kept}
+        for result in shard_results:
+            if result.from_block < 0:
+                continue
+            path = partition_path(root, chain, result.from_block, result.to_block)
+            staged = staging_path(path, run_id)
+            if path in kept_outputs:
+                _install(staged, path)
+            else:
+                staged.unlink(missing_ok=True)
+                index_path(staged).unlink(missing_ok=True)
+        if kept:
+            for path in sorted(chain_dir(root, chain).glob(f"*{PARTITION_SUFFIX}")):
+                span = partition_range(path)
+                if path not in kept_outputs and span is not None:
+                    _trim_partition(root, chain, path, span, kept[0].from_block, kept[-1].to_block)
+        cursors[chain] = None
+        if kept:
+            next_block = max(kept[-1].to_block + 1, read_cursor(root, chain) or 0)
+            write_cursor(root, chain, next_block)
+            cursors[chain] = next_block
+        for result in shard_results:
+            SHARD_RUNS.inc(chain=chain, status=result.status)
+            if result.seconds:
+                SHARD_SECONDS.observe(result.seconds, chain=chain)
+            if result.status == "ok":
+                # Workers' own registries die with them; fold their counts in here.
+                EVENTS_INGESTED.inc(result.events, source="onchain")
+                SEGMENTS_WRITTEN.inc(result.segments)
+    return cursors
+
+
+def run_chains(
+    configs: Sequence[ChainConfig],
+    root: Path,
+    workers: Optional[int] = None,
+    timeout: Optional[float] = None,
+    segment_events: int = DEFAULT_SEGMENT_EVENTS,
+) -> Tuple[List[ShardResult], Dict[str, Optional[int]]]:
+    """Plan, run and commit one ingest pass over ``configs``.
+
+    ``workers`` defaults to one process per shard. Returns every shard
+    result (including chains whose head lookup failed) and the new cursors.
+    """
+    run_id = f"run-{uuid.uuid4().hex[:12]}"
+    tasks, failures = plan_tasks(configs, root, run_id, segment_events, head_timeout=timeout)
+    results = supervise(tasks, workers or len(tasks), timeout) if tasks else []
+    cursors = commit_results(root, results, run_id)
+    for failure in failures:
+        SHARD_RUNS.inc(chain=failure.chain, status=failure.status)
+    return failures + results, cursors
@@ -0,0 +1,543 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from array import array
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence
+
+from normalize.schema import Event
+
+if TYPE_CHECKING:
+    import duckdb
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+NULL_INT = -(2**63)
+TX_HASH_BYTES = 32
+CATEGORICAL = ("schema_version", "source", "kind", "protocol", "chain", "severity")
+TIMESTAMPS = ("event_time", "ingest_time")
+INTEGERS = ("block_number", "log_index")
+STRINGS = ("event_id", "title", "summary", "source_url", "raw")
+LISTS = ("entities", "tags")
+COLUMNS = (
+    "schema_version",
+    "event_id",
+    "source",
+    "kind",
+    "protocol",
+    "chain",
+    "event_time",
+    "ingest_time",
+    "severity",
+    "title",
+    "summary",
+    "source_url",
+    "tx_hash",
+    "block_number",
+    "log_index",
+    "entities",
+    "tags",
+    "raw",
+)
+
+
+def _to_micros(value: Any) -> int:
+    if value is None:
+        return NULL_INT
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    delta = value - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _from_micros(value: int) -> Optional[datetime]:
+    if value == NULL_INT:
+        return None
+    return EPOCH + timedelta(microseconds=value)
+
+
+def _iso(value: int) -> Optional[str]:
+    # Matches Event.model_dump(mode="json") for UTC timestamps.
+    moment = _from_micros(value)
+    if moment is None:
+        return None
+    text = moment.strftime("%Y-%m-%dT%H:%M:%S")
+    if moment.microsecond:
+        text += f".{moment.microsecond:06d}"
+    return text + "Z"
+
+
+class _Vocabulary:
+    """Interned values of one categorical column; code 0 is always None."""
+
+    def __init__(self) -> None:
+        self.values: List[Any] = [None]
+        self.codes: Dict[Any, int] = {None: 0}
+
+    def code(self, value: Any) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class _Strings:
+    """UTF-8 values packed end to end, with offsets and a null flag per row."""
+
+    def __init__(self) -> None:
+        self.data = bytearray()
+        self.offsets = array("q", [0])
+        self.nulls = bytearray()
+
+    def append(self, value: Optional[str]) -> None:
+        if value is not None:
+            self.data += value.encode("utf-8")
+        self.offsets.append(len(self.data))
+        self.nulls.append(value is None)
+
+    def get(self, index: int) -> Optional[str]:
+        if self.nulls[index]:
+            return None
+        return str(self.data[self.offsets[index] : self.offsets[index + 1]], "utf-8")
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.data) + self.offsets.itemsize * len(self.offsets) + len(self.nulls)
+
+
+class _PackedValues:
+    """Read-only vocabulary values decoded from packed strings on access."""
+
+    def __init__(self, strings: _Strings) -> None:
+        self.strings = strings
+
+    def __len__(self) -> int:
+        return len(self.strings.nulls)
+
+    def __getitem__(self, index: int) -> Optional[str]:
+        return self.strings.get(index)
+
+    def __iter__(self) -> Iterator[Optional[str]]:
+        return (self.strings.get(index) for index in range(len(self)))
+
+
+class _Lists:
+    """Lists of interned strings: one code per element plus row offsets."""
+
+    def __init__(self) -> None:
+        self.vocabulary = _Vocabulary()
+        self.codes = array("I")
+        self.offsets = array("q", [0])
+
+    def append(self, values: Optional[Sequence[str]]) -> None:
+        for value in values or ():
+            self.codes.append(self.vocabulary.code(value))
+        self.offsets.append(len(self.codes))
+
+    def get(self, index: int) -> List[str]:
+        values = self.vocabulary.values
+        return [values[code] for code in self.codes[self.offsets[index] : self.offsets[index + 1]]]
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.itemsize * len(self.codes) + self.offsets.itemsize * len(self.offsets)
+
+
+class EventBatch:
+    """Column-wise store of canonical events.
+
+    Categorical fields (source, kind, protocol, chain, severity, schema
+    version) are one-byte codes into a per-batch vocabulary; timestamps are
+    int64 microseconds since the epoch; ``tx_hash`` is 32 raw bytes per row;
+    free text and the compact JSON of ``raw`` are packed UTF-8 with offsets;
+    ``entities`` and ``tags`` are interned codes with offsets. A row costs
+    roughly its text plus a few dozen bytes, against a few KB as a dict or
+    ``Event``.
+
+    Rows read back as the dicts ``Event.model_dump(mode="json")`` produces,
+    with timestamps normalised to UTC. Batches are append-only; batches made
+    by ``from_buffers`` are read-only.
+    """
+
+    def __init__(self) -> None:
+        self._vocabularies = {name: _Vocabulary() for name in CATEGORICAL}
+        self._categories = {name: array("B") for name in CATEGORICAL}
+        self._times = {name: array("q") for name in TIMESTAMPS}
+        self._integers = {name: array("q") for name in INTEGERS}
+        self._strings = {name: _Strings() for name in STRINGS}
+        self._lists = {name: _Lists() for name in LISTS}
+        self._tx_hashes = bytearray()
+        self._tx_nulls = bytearray()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    # --- building -------------------------------------------------------------
+
+    def append(self, event: Any) -> None:
+        """Add an ``Event`` or a canonical event dict (JSON or Python values)."""
+        payload = event.model_dump(mode="json") if isinstance(event, Event) else event
+        # Decoded before any column grows, so a bad hash leaves the batch unchanged.
+        tx_hash = payload.get("tx_hash")
+        tx_bytes = bytes(TX_HASH_BYTES) if tx_hash is None else bytes.fromhex(tx_hash[2:])
+        if len(tx_bytes) != TX_HASH_BYTES:
+            raise ValueError(f"tx_hash must be {TX_HASH_BYTES} bytes, got {len(tx_bytes)}")
+        for name in CATEGORICAL:
+            code = self._vocabularies[name].code(payload.get(name))
+            if code > 255:
+                raise ValueError(f"{name} has more than 255 distinct values")
+            self._categories[name].append(code)
+        for name in TIMESTAMPS:
+            self._times[name].append(_to_micros(payload.get(name)))
+        for name in INTEGERS:
+            value = payload.get(name)
+            self._integers[name].append(NULL_INT if value is None else int(value))
+        for name in STRINGS:
+            value = payload.get(name)
+            if name == "raw":
+                value = json.dumps(value or {}, separators=(",", ":"), sort_keys=True)
+            self._strings[name].append(value)
+        for name in LISTS:
+            self._lists[name].append(payload.get(name))
+        self._tx_hashes += tx_bytes
+        self._tx_nulls.append(tx_hash is None)
+        self._size += 1
+
+    def extend(self, events: Iterable[Any]) -> "EventBatch":
+        for event in events:
+            self.append(event)
+        return self
+
+    @classmethod
+    def from_events(cls, events: Iterable[Any]) -> "EventBatch":
+        return cls().extend(events)
+
+    @classmethod
+    def from_jsonl(cls, paths: Iterable[Path]) -> "EventBatch":
+        """Load event files (plain or segmented gzip) without materialising them."""
+        from ingest.segments import iter_lines
+
+        batch = cls()
+        for path in paths:
+            for line in iter_lines(path):
+                text = line.strip()
+                if text:
+                    batch.append(json.loads(text))
+        return batch
+
+    @classmethod
+    def from_duckdb(cls, conn: "duckdb.DuckDBPyConnection", sql: str, params: Sequence[Any] = ()) -> "EventBatch":
+        """Run ``sql`` and batch its rows; columns are matched by name."""
+        cursor = conn.execute(sql, list(params))
+        names = [column[0] for column in cursor.description]
+        batch = cls()
+        while True:
+            rows = cursor.fetchmany(10_000)
+            if not rows:
+                return batch
+            for row in rows:
+                payload = dict(zip(names, row))
+                if isinstance(payload.get("raw"), str):
+                    payload["raw"] = json.loads(payload["raw"])
+                batch.append(payload)
+
+    # --- reading --------------------------------------------------------------
+
+    def _category(self, name: str, index: int) -> Any:
+        return self._vocabularies[name].values[self._categories[name][index]]
+
+    def tx_hash(self, index: int) -> Optional[str]:
+        if self._tx_nulls[index]:
+            return None
+        start = index * TX_HASH_BYTES
+        return "0x" + self._tx_hashes[start : start + TX_HASH_BYTES].hex()
+
+    def row(self, index: int) -> Dict[str, Any]:
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+        payload: Dict[str, Any] = {}
+        for name in COLUMNS:
+            if name in self._categories:
+                payload[name] = self._category(name, index)
+            elif name in self._times:
+                payload[name] = _iso(self._times[name][index])
+            elif name in self._integers:
+                value = self._integers[name][index]
+                payload[name] = None if value == NULL_INT else value
+            elif name == "raw":
+                payload[name] = json.loads(self._strings[name].get(index) or "{}")
+            elif name in self._strings:
+                payload[name] = self._strings[name].get(index)
+            elif name in self._lists:
+                payload[name] = self._lists[name].get(index)
+            else:
+                payload[name] = self.tx_hash(index)
+        return payload
+
+    def rows(self, indices: Optional[Iterable[int]] = None) -> Iterator[Dict[str, Any]]:
+        for index in range(self._size) if indices is None else indices:
+            yield self.row(index)
+
+    def to_events(self, indices: Optional[Iterable[int]] = None) -> Iterator[Event]:
+        for payload in self.rows(indices):
+            yield Event.model_validate(payload)
+
+    def event_times(self) -> array:
+        """``event_time`` as int64 microseconds since the epoch (a view, not a copy)."""
+        return self._times["event_time"]
+
+    def select(self, limit: Optional[int] = None, **equals: Optional[str]) -> List[int]:
+        """Row indices whose categorical columns equal the given values.
+
+        ``None`` values are ignored, so ``select(source=source)`` with an
+        unset filter matches every row. Comparison is on codes only.
+        """
+        wanted = []
+        for name, value in equals.items():
+            if name not in self._vocabularies:
+                raise KeyError(f"{name} is not a categorical column")
+            if value is None:
+                continue
+            code = self._vocabularies[name].codes.get(value)
+            if code is None:
+                return []
+            wanted.append((self._categories[name], code))
+        matches: List[int] = []
+        for index in range(self._size):
+            if all(codes[index] == code for codes, code in wanted):
+                matches.append(index)
+                if limit is not None and len(matches) >= limit:
+                    break
+        return matches
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate bytes held by the columns (vocabularies excluded)."""
+        total = len(self._tx_hashes) + len(self._tx_nulls)
+        total += sum(codes.itemsize * len(codes) for codes in self._categories.values())
+        total += sum(values.itemsize * len(values) for values in self._times.values())
+        total += sum(values.itemsize * len(values) for values in self._integers.values())
+        total += sum(column.nbytes for column in self._strings.values())
+        total += sum(column.nbytes for column in self._lists.values())
+        return total
+
+    # --- interchange ----------------------------------------------------------
+
+    def to_buffers(self) -> Dict[str, bytes]:
+        """The columns as flat native-endian buffers, plus JSON ``meta`` with the vocabularies."""
+        meta = {
+            "rows": self._size,
+            "categorical": {name: self._vocabularies[name].values for name in CATEGORICAL},
+        }
+        buffers = {"meta": json.dumps(meta, separators=(",", ":")).encode("utf-8")}
+        for name in CATEGORICAL:
+            buffers[name] = self._categories[name].tobytes()
+        for name in TIMESTAMPS:
+            buffers[name] = self._times[name].tobytes()
+        for name in INTEGERS:
+            buffers[name] = self._integers[name].tobytes()
+        for name in STRINGS:
+            strings = self._strings[name]
+            buffers[name] = bytes(strings.data)
+            buffers[f"{name}.offsets"] = strings.offsets.tobytes()
+            buffers[f"{name}.nulls"] = bytes(strings.nulls)
+        for name in LISTS:
+            lists = self._lists[name]
+            # Packed like a text column: list vocabularies (entities) can be large.
+            values = _Strings()
+            for value in lists.vocabulary.values:
+                values.append(value)
+            buffers[name] = lists.codes.tobytes()
+            buffers[f"{name}.offsets"] = lists.offsets.tobytes()
+            buffers[f"{name}.values"] = bytes(values.data)
+            buffers[f"{name}.values.offsets"] = values.offsets.tobytes()
+            buffers[f"{name}.values.nulls"] = bytes(values.nulls)
+        buffers["tx_hash"] = bytes(self._tx_hashes)
+        buffers["tx_hash.nulls"] = bytes(self._tx_nulls)
+        return buffers
+
+    @classmethod
+    def from_buffers(cls, buffers: Mapping[str, Any]) -> "EventBatch":
+        """A read-only batch over ``to_buffers`` output, e.g. memoryviews into a mapped file.
+
+        Columns are cast in place rather than copied. Only the categorical
+        vocabularies are parsed; list vocabularies are decoded on access.
+        """
+        meta = json.loads(bytes(buffers["meta"]))
+        batch = cls()
+        batch._size = meta["rows"]
+        for name in CATEGORICAL:
+            vocabulary = batch._vocabularies[name]
+            vocabulary.values = meta["categorical"][name]
+            vocabulary.codes = {value: code for code, value in enumerate(vocabulary.values)}
+            batch._categories[name] = memoryview(buffers[name]).cast("B")
+        for name in TIMESTAMPS:
+            batch._times[name] = memoryview(buffers[name]).cast("q")
+        for name in INTEGERS:
+            batch._integers[name] = memoryview(buffers[name]).cast("q")
+        for name in STRINGS:
+            batch._strings[name] = _mapped_strings(buffers, name)
+        for name in LISTS:
+            lists = batch._lists[name]
+            lists.vocabulary.values = _PackedValues(_mapped_strings(buffers, f"{name}.values"))
+            lists.vocabulary.codes = {}
+            lists.codes = memoryview(buffers[name]).cast("I")
+            lists.offsets = memoryview(buffers[f"{name}.offsets"]).cast("q")
+        batch._tx_hashes = memoryview(buffers["tx_hash"]).cast("B")
+        batch._tx_nulls = memoryview(buffers["tx_hash.nulls"]).cast("B")
+        return batch
+
+    def column(self, name: str) -> list:
+        """One column as Python values; timestamps as UTC ``datetime``, ``raw`` as JSON text."""
+        if name in self._categories:
+            values = self._vocabularies[name].values
+            return [values[code] for code in self._categories[name]]
+        if name in self._times:
+            return [_from_micros(value) for value in self._times[name]]
+        if name in self._integers:
+            return [None if value == NULL_INT else value for value in self._integers[name]]
+        if name in self._strings:
+            strings = self._strings[name]
+            return [strings.get(index) for index in range(self._size)]
+        if name in self._lists:
+            lists = self._lists[name]
+            return [lists.get(index) for index in range(self._size)]
+        if name == "tx_hash":
+            return [self.tx_hash(index) for index in range(self._size)]
+        raise KeyError(name)
+
+    def to_columns(self) -> Dict[str, list]:
+        return {name: self.column(name) for name in COLUMNS}
+
+    def to_arrow(self) -> Any:
+        """A ``pyarrow.Table``; categorical columns become dictionary arrays."""
+        try:
+            import pyarrow as pa
+        except ImportError as exc:  # pragma: no cover - optional dependency
+            raise RuntimeError("pyarrow is required for EventBatch.to_arrow") from exc
+
+        arrays = {}
+        for name in COLUMNS:
+            if name in self._categories:
+                arrays[name] = pa.DictionaryArray.from_arrays(
+                    pa.array(self._categories[name], type=pa.uint8()),
+                    pa.array(self._vocabularies[name].values, type=pa.string()),
+                )
+            elif name in self._times:
+                arrays[name] = pa.array(self.column(name), type=pa.timestamp("us", tz="UTC"))
+            else:
+                arrays[name] = pa.array(self.column(name))
+        return pa.table(arrays)
+
+    @classmethod
+    def from_arrow(cls, table: Any) -> "EventBatch":
+        batch = cls()
+        for payload in table.to_pylist():
+            if isinstance(payload.get("raw"), str):
+                payload["raw"] = json.loads(payload["raw"])
+            batch.append(payload)
+        return batch
+
+    def to_duckdb(self, conn: "duckdb.DuckDBPyConnection", name: str) -> None:
+        """Expose the batch as ``name`` on ``conn``.
+
+        With pyarrow installed the Arrow table is registered as a view.
+        Otherwise a temp table is built from flat NumPy arrays (codes, int64
+        and datetime64 columns, list elements as ``(row_id, code)`` pairs)
+        plus a temporary NDJSON file for the text columns, because DuckDB
+        scans Python objects slowly. Timestamps are then naive UTC
+        ``TIMESTAMP`` values, as in ``load_events``. ``raw`` is JSON text
+        either way.
+        """
+        try:
+            conn.register(name, self.to_arrow())
+            return
+        except RuntimeError:
+            pass
+        try:
+            import numpy as np
+        except ImportError as exc:  # pragma: no cover - optional dependency
+            raise RuntimeError("pyarrow or numpy is required for EventBatch.to_duckdb") from exc
+
+        row_ids = np.arange(self._size, dtype=np.int64)
+        rows: Dict[str, Any] = {"row_id": row_ids}
+        selects: List[str] = []
+        joins: List[str] = []
+        text_keys: List[str] = []
+        for key in COLUMNS:
+            if key in self._categories:
+                rows[key] = np.frombuffer(self._categories[key], dtype=np.uint8)
+                selects.append(f"{_sql_list(self._vocabularies[key].values)}[r.{key} + 1] AS {key}")
+            elif key in self._times:
+                # INT64_MIN is NaT, which DuckDB reads as NULL.
+                rows[key] = np.frombuffer(self._times[key], dtype=np.int64).view("datetime64[us]")
+                selects.append(f"r.{key}")
+            elif key in self._integers:
+                rows[key] = np.frombuffer(self._integers[key], dtype=np.int64)
+                selects.append(f"NULLIF(r.{key}, {NULL_INT}) AS {key}")
+            elif key in self._lists:
+                lists = self._lists[key]
+                offsets = np.frombuffer(lists.offsets, dtype=np.int64)
+                vocabulary = np.empty(len(lists.vocabulary.values), dtype=object)
+                vocabulary[:] = lists.vocabulary.values
+                conn.register(
+                    f"{name}__{key}",
+                    {
+                        "row_id": np.repeat(row_ids, np.diff(offsets)),
+                        "code": np.frombuffer(lists.codes, dtype=np.uint32),
+                        "pos": np.arange(len(lists.codes), dtype=np.int64),
+                    },
+                )
+                conn.register(
+                    f"{name}__{key}_values",
+                    {"code": np.arange(len(vocabulary), dtype=np.uint32), "value": vocabulary},
+                )
+                joins.append(
+                    f"LEFT JOIN (SELECT row_id, list(v.value ORDER BY e.pos) AS {key} "
+                    f"FROM {name}__{key} e JOIN {name}__{key}_values v USING (code) GROUP BY row_id) "
+                    f"{key}_ USING (row_id)"
+                )
+                selects.append(f"coalesce({key}_.{key}, []) AS {key}")
+            else:
+                text_keys.append(key)
+                selects.append(f"t.json[{len(text_keys)}] AS {key}")
+        conn.register(f"{name}__rows", rows)
+        fd, text_path = tempfile.mkstemp(prefix="event-batch-", suffix=".jsonl")
+        try:
+            # Text columns go through NDJSON: DuckDB reads it far faster than
+            # it scans NumPy object arrays.
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                columns = [self.column(key) for key in text_keys]
+                handle.writelines(json.dumps(values) + "\n" for values in zip(*columns))
+            conn.execute(
+                f"CREATE OR REPLACE TEMP TABLE {name} AS SELECT {', '.join(selects)} "
+                f"FROM {name}__rows r POSITIONAL JOIN read_json(?, format = 'newline_delimited', "
+                "records = false, columns = {'json': 'VARCHAR[]'}) t "
+                f"{' '.join(joins)} ORDER BY r.row_id",
+                [text_path],
+            )
+        finally:
+            os.unlink(text_path)
+            conn.unregister(f"{name}__rows")
+            for key in LISTS:
+                conn.unregister(f"{name}__{key}")
+                conn.unregister(f"{name}__{key}_values")
+
+
+def _mapped_strings(buffers: Mapping[str, Any], name: str) -> _Strings:
+    strings = _Strings()
+    strings.data = memoryview(buffers[name]).cast("B")
+    strings.offsets = memoryview(buffers[f"{name}.offsets"]).cast("q")
+    strings.nulls = memoryview(buffers[f"{name}.nulls"]).cast("B")
+    return strings
+
+
+def _sql_list(values: Sequence[Optional[str]]) -> str:
+    items = ("NULL" if value is None else "'" + value.replace("'", "''") + "'" for value in values)
+    return "([" + ", ".join(items) + "]::VARCHAR[])"
@@ -9,7 +9,7 @@ Protocol = Literal["aave_v3", "uniswap_v3", "general"]
 Source = Literal["onchain", "offchain"]
 Kind = Literal["protocol_event", "governance", "advisory"]
 Severity = Literal["info", "low", "medium", "high", "critical"]
-Chain = Literal["ethereum"]
+Chain = Literal["ethereum", "arbitrum", "optimism", "base", "polygon"]
 
 
 class Event(BaseModel):
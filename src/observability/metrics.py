@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import bisect
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, TextIO, Tuple, Union
+
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+LAG_BUCKETS: Tuple[float, ...] = (
+    1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0, 6 * 3600.0, 86400.0, 7 * 86400.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _label_values(labelnames: Sequence[str], labels: Dict[str, object]) -> LabelValues:
+    if len(labels) != len(labelnames):
+        raise ValueError(f"expected labels {list(labelnames)}, got {sorted(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [
+        f'{name}="{value.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in zip(labelnames, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+    def summary(self) -> Union[float, dict]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, value: float = 1.0, **labels: object) -> None:
+        key = _label_values(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def value(self, **labels: object) -> float:
+        return self._values.get(_label_values(self.labelnames, labels), 0.0)
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+    def summary(self) -> Union[float, dict]:
+        if not self.labelnames:
+            return self._values.get((), 0.0)
+        return {",".join(key): value for key, value in sorted(self._values.items())}
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: object) -> None:
+        key = _label_values(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class _HistogramState:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, size: int) -> None:
+        self.counts = [0] * size
+        self.total = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._states: Dict[LabelValues, _HistogramState] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = _label_values(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = _HistogramState(len(self.buckets) + 1)
+            state.counts[index] += 1
+            state.total += value
+            state.count += 1
+
+    def observe_many(self, values: Sequence[float], **labels: object) -> None:
+        """Record a batch of observations under one label lookup and lock."""
+        if not values:
+            return
+        key = _label_values(self.labelnames, labels)
+        buckets = self.buckets
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = _HistogramState(len(buckets) + 1)
+            counts = state.counts
+            for value in values:
+                counts[bisect.bisect_left(buckets, value)] += 1
+            state.total += sum(values)
+            state.count += len(values)
+
+    @contextmanager
+    def time(self, **labels: object) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        lines: List[str] = []
+        for key, state in sorted(self._states.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state.total)}")
+            lines.append(f"{self.name}_count{labels} {state.count}")
+        return lines
+
+    def _quantile(self, state: _HistogramState, q: float) -> Optional[float]:
+        if state.count == 0:
+            return None
+        rank = q * state.count
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), state.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound if bound != float("inf") else self.buckets[-1]
+        return self.buckets[-1]
+
+    def summary(self) -> Union[float, dict]:
+        result: dict = {}
+        for key, state in sorted(self._states.items()):
+            result[",".join(key) or "all"] = {
+                "count": state.count,
+                "sum": round(state.total, 6),
+                "mean": round(state.total / state.count, 6) if state.count else None,
+                "p50_le": self._quantile(state, 0.5),
+                "p99_le": self._quantile(state, 0.99),
+            }
+        return result
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls: type, name: str, *args: object, **kwargs: object) -> _Metric:
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = cls(name, *args, **kwargs)
+                    self._metrics[name] = metric
+        if type(metric) is not cls:
+            raise ValueError(f"metric {name} already registered as {metric.kind}")
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labelnames)  # type: ignore[return-value]
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, labelnames)  # type: ignore[return-value]
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._get_or_create(  # type: ignore[return-value]
+            Histogram, name, help_text, labelnames, buckets=buckets
+        )
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        for name in sorted(self._metrics):
+            metric = self._metrics[name]
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict:
+        return {name: self._metrics[name].summary() for name in sorted(self._metrics)}
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.counter(name, help_text, labelnames)
+
+
+def gauge(name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.gauge(name, help_text, labelnames)
+
+
+def histogram(
+    name: str,
+    help_text: str,
+    labelnames: Sequence[str] = (),
+    buckets: Sequence[float] = LATENCY_BUCKETS,
+) -> Histogram:
+    return REGISTRY.histogram(name, help_text, labelnames, buckets)
+
+
+def emit_summary(script: str, stream: TextIO = sys.stderr) -> None:
+    """Print the process metrics as one JSON line, for the end of a script run."""
+    payload = {"script": script, "metrics": REGISTRY.summary()}
+    stream.write(json.dumps(payload, separators=(",", ":")) + "\n")
@@ -0,0 +1,369 @@
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter as Tally
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, ContextManager, Dict, FrozenSet, Iterator, List, Optional
+
+PROFILE_MODES = ("cprofile", "sample")
+DEFAULT_PROFILE_DIR = Path("data/profiles")
+INDEX_NAME = "profiles.jsonl"
+TOP_FUNCTIONS = 15
+TOP_ALLOCATIONS = 10
+# Leaf frames of threads parked on a lock or a selector; not counted as samples.
+IDLE_FRAMES = frozenset({("threading.py", "wait"), ("selectors.py", "select"), ("queue.py", "get")})
+
+EnvLookup = Callable[[str], Optional[str]]
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+@dataclass(frozen=True)
+class ProfileConfig:
+    """Which stages to profile and how.
+
+    ``stages`` holds stage names, ``"*"`` for every stage, ``"api"`` for
+    every request or ``"api:/path"`` for requests under a path prefix.
+    """
+
+    stages: FrozenSet[str]
+    directory: Path = DEFAULT_PROFILE_DIR
+    mode: str = "cprofile"
+    memory: bool = True
+    sample_interval: float = 0.005
+    min_seconds: float = 0.0
+    script: str = "main"
+
+    def wants(self, stage: str) -> bool:
+        return "*" in self.stages or stage in self.stages
+
+    def wants_request(self, path: str) -> bool:
+        if "*" in self.stages or "api" in self.stages:
+            return True
+        return any(
+            stage.startswith("api:") and path.startswith(stage[4:]) for stage in self.stages
+        )
+
+
+# None while profiling is off; ``profile`` then costs one global lookup.
+_config: Optional[ProfileConfig] = None
+_active = threading.Lock()
+
+
+def configure(config: Optional[ProfileConfig]) -> None:
+    global _config
+    _config = config
+
+
+def current() -> Optional[ProfileConfig]:
+    return _config
+
+
+def _flag_value(argv: List[str]) -> Optional[str]:
+    """Remove ``--profile[=STAGES]`` from ``argv`` and return its value."""
+    for index, arg in enumerate(argv):
+        if arg == "--profile":
+            del argv[index]
+            if index < len(argv) and not argv[index].startswith("-"):
+                return argv.pop(index)
+            return "*"
+        if arg.startswith("--profile="):
+            del argv[index]
+            return arg.split("=", 1)[1] or "*"
+    return None
+
+
+def config_from_env(
+    script: str, env: EnvLookup, stages: Optional[str] = None
+) -> Optional[ProfileConfig]:
+    """Profiling settings from ``PROFILE_*`` variables; ``stages`` overrides ``PROFILE_STAGES``."""
+    raw = stages if stages is not None else env("PROFILE_STAGES")
+    if not raw or raw.strip().lower() in ("0", "false", "no", "off"):
+        return None
+    names = {name.strip() for name in raw.split(",") if name.strip()}
+    if names & {"1", "true", "yes", "on", "all"}:
+        names = {"*"}
+    mode = (env("PROFILE_MODE") or "cprofile").strip().lower()
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"PROFILE_MODE must be one of {', '.join(PROFILE_MODES)}")
+    try:
+        interval_ms = float(env("PROFILE_SAMPLE_MS") or 5.0)
+        min_ms = float(env("PROFILE_MIN_MS") or 0.0)
+    except ValueError as exc:
+        raise ValueError("PROFILE_SAMPLE_MS and PROFILE_MIN_MS must be numbers") from exc
+    return ProfileConfig(
+        stages=frozenset(names),
+        directory=Path(env("PROFILE_DIR") or DEFAULT_PROFILE_DIR),
+        mode=mode,
+        memory=(env("PROFILE_MEMORY") or "1").strip().lower() not in ("0", "false", "no", "off"),
+        sample_interval=max(0.0005, interval_ms / 1000.0),
+        min_seconds=max(0.0, min_ms / 1000.0),
+        script=script,
+    )
+
+
+def init(
+    script: str,
+    env: Optional[EnvLookup] = None,
+    argv: Optional[List[str]] = None,
+    stages: Optional[str] = None,
+) -> Optional[ProfileConfig]:
+    """Turn profiling on for this process from ``--profile`` in ``argv`` or ``PROFILE_STAGES``.
+
+    ``argv`` defaults to ``sys.argv``; the flag is removed from it so scripts
+    without argument parsing are unaffected. Scripts that parse ``--profile``
+    themselves pass its value as ``stages`` instead. Returns the active config.
+    """
+    lookup = env or os.environ.get
+    if stages is None:
+        stages = _flag_value(sys.argv if argv is None else argv)
+    config = config_from_env(script, lookup, stages)
+    configure(config)
+    return config
+
+
+def profile(stage: str) -> ContextManager[None]:
+    """Profile the ``with`` block as ``stage`` when that stage is selected.
+
+    Returns a shared no-op context otherwise. Stages started while another
+    profile is running are not profiled separately; they show up inside it.
+    """
+    config = _config
+    if config is None or not config.wants(stage):
+        return _NULL_CONTEXT
+    return _profiled(config, stage, config.mode)
+
+
+def profile_request(path: str) -> ContextManager[None]:
+    """Profile one API request; always sampled, since handlers run on worker threads."""
+    config = _config
+    if config is None or not config.wants_request(path):
+        return _NULL_CONTEXT
+    return _profiled(config, path, "sample")
+
+
+class _Sampler:
+    """Wall-clock stack sampler over every Python thread but its own."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.stacks: Tally = Tally()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                code = frame.f_code
+                if thread_id == own or (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                stack: List[str] = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{_short_path(code.co_filename)}:{code.co_name}:{code.co_firstlineno}")
+                    frame = frame.f_back
+                stack.reverse()
+                self.stacks[tuple(stack)] += 1
+                self.samples += 1
+
+    def folded(self) -> List[str]:
+        """Collapsed stacks (``a;b;c count``) for flame graph tools."""
+        return [f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common()]
+
+    def top(self, limit: int) -> List[dict]:
+        own: Tally = Tally()
+        total: Tally = Tally()
+        for stack, count in self.stacks.items():
+            if not stack:
+                continue
+            own[stack[-1]] += count
+            for name in set(stack):
+                total[name] += count
+        samples = max(1, self.samples)
+        return [
+            {
+                "function": name,
+                "own_share": round(count / samples, 4),
+                "total_share": round(total[name] / samples, 4),
+            }
+            for name, count in own.most_common(limit)
+        ]
+
+
+def _short_path(filename: str) -> str:
+    for marker in ("/site-packages/", "/src/", "/lib/python"):
+        index = filename.rfind(marker)
+        if index >= 0:
+            return filename[index + len(marker) :]
+    return os.path.basename(filename)
+
+
+def _cprofile_top(profiler, limit: int) -> List[dict]:
+    import pstats
+
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, name), (_, calls, own, total, _) in stats.stats.items():  # type: ignore[attr-defined]
+        rows.append(
+            {
+                "function": f"{_short_path(filename)}:{name}:{line}",
+                "calls": calls,
+                "own_seconds": round(own, 6),
+                "total_seconds": round(total, 6),
+            }
+        )
+    rows.sort(key=lambda row: row["own_seconds"], reverse=True)
+    return rows[:limit]
+
+
+def _slug(stage: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "-", stage).strip("-") or "root"
+
+
+@dataclass
+class _Run:
+    config: ProfileConfig
+    stage: str
+    mode: str
+    started_at: str = ""
+    wall: float = 0.0
+    cpu: float = 0.0
+    peak_bytes: Optional[int] = None
+    top: List[dict] = field(default_factory=list)
+    allocations: List[dict] = field(default_factory=list)
+    files: Dict[str, str] = field(default_factory=dict)
+
+
+@contextlib.contextmanager
+def _profiled(config: ProfileConfig, stage: str, mode: str) -> Iterator[None]:
+    if not _active.acquire(blocking=False):
+        yield
+        return
+    try:
+        run = _Run(config, stage, mode, started_at=datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S.%fZ"))
+        tracing = config.memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        elif config.memory:
+            tracemalloc.reset_peak()
+        profiler = sampler = None
+        if mode == "cprofile":
+            import cProfile
+
+            profiler = cProfile.Profile()
+        else:
+            sampler = _Sampler(config.sample_interval)
+        wall_started = time.perf_counter()
+        cpu_started = time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        else:
+            sampler.start()  # type: ignore[union-attr]
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            else:
+                sampler.stop()  # type: ignore[union-attr]
+            run.wall = time.perf_counter() - wall_started
+            run.cpu = time.process_time() - cpu_started
+            snapshot = None
+            if config.memory:
+                run.peak_bytes = tracemalloc.get_traced_memory()[1]
+                snapshot = tracemalloc.take_snapshot()
+                if tracing:
+                    tracemalloc.stop()
+            if run.wall >= config.min_seconds:
+                _write(run, profiler, sampler, snapshot)
+    finally:
+        _active.release()
+
+
+def _write(run: _Run, profiler, sampler: Optional[_Sampler], snapshot) -> None:
+    config = run.config
+    config.directory.mkdir(parents=True, exist_ok=True)
+    base = config.directory / f"{run.started_at}-{_slug(config.script)}-{_slug(run.stage)}"
+    if profiler is not None:
+        profile_path = base.with_name(base.name + ".prof")
+        profiler.dump_stats(str(profile_path))
+        run.top = _cprofile_top(profiler, TOP_FUNCTIONS)
+        run.files["profile"] = profile_path.name
+    elif sampler is not None:
+        folded_path = base.with_name(base.name + ".folded")
+        folded_path.write_text("\n".join(sampler.folded()) + "\n", encoding="utf-8")
+        run.top = sampler.top(TOP_FUNCTIONS)
+        run.files["profile"] = folded_path.name
+    if snapshot is not None:
+        snapshot = snapshot.filter_traces(
+            (tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__))
+        )
+        for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+            frame = stat.traceback[0]
+            run.allocations.append(
+                {"site": f"{_short_path(frame.filename)}:{frame.lineno}", "bytes": stat.size, "blocks": stat.count}
+            )
+    summary_path = base.with_name(base.name + ".txt")
+    summary_path.write_text(_summary_text(run), encoding="utf-8")
+    run.files["summary"] = summary_path.name
+    record = {
+        "script": config.script,
+        "stage": run.stage,
+        "mode": run.mode,
+        "started_at": run.started_at,
+        "wall_seconds": round(run.wall, 6),
+        "cpu_seconds": round(run.cpu, 6),
+        "peak_traced_mb": round(run.peak_bytes / 1e6, 3) if run.peak_bytes is not None else None,
+        "top": run.top[:5],
+        "files": run.files,
+    }
+    with (config.directory / INDEX_NAME).open("a", encoding="utf-8") as handle:
+        handle.write(json.dumps(record, separators=(",", ":")) + "\n")
+    peak = f", peak {record['peak_traced_mb']} MB traced" if run.peak_bytes is not None else ""
+    print(
+        f"profile {run.stage}: wall {run.wall:.3f}s, cpu {run.cpu:.3f}s{peak} -> {summary_path}",
+        file=sys.stderr,
+    )
+
+
+def _summary_text(run: _Run) -> str:
+    lines = [
+        f"{run.config.script} / {run.stage} ({run.mode}) at {run.started_at}",
+        f"wall {run.wall:.3f}s  cpu {run.cpu:.3f}s"
+        + (f"  peak traced memory {run.peak_bytes / 1e6:.1f} MB" if run.peak_bytes is not None else ""),
+        "",
+    ]
+    if run.mode == "cprofile":
+        lines.append(f"{'own s':>10} {'total s':>10} {'calls':>9}  function")
+        for row in run.top:
+            lines.append(
+                f"{row['own_seconds']:>10.4f} {row['total_seconds']:>10.4f} {row['calls']:>9}  {row['function']}"
+            )
+    else:
+        lines.append(f"{'own %':>7} {'total %':>8}  function")
+        for row in run.top:
+            lines.append(f"{row['own_share'] * 100:>7.1f} {row['total_share'] * 100:>8.1f}  {row['function']}")
+    if run.allocations:
+        lines.extend(["", f"{'live KB':>10} {'blocks':>8}  allocation site (at stage end)"])
+        for row in run.allocations:
+            lines.append(f"{row['bytes'] / 1024:>10.1f} {row['blocks']:>8}  {row['site']}")
+    return "\n".join(lines) + "\n"
+
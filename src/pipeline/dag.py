@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from observability.metrics import counter, histogram
+
+STAGE_SECONDS = histogram("sentinel_pipeline_stage_seconds", "Wall time per pipeline stage run", ("stage",))
+STAGE_RUNS = counter("sentinel_pipeline_stages_total", "Pipeline stage outcomes", ("stage", "status"))
+
+STATE_VERSION = 1
+
+
+@dataclass(frozen=True)
+class Stage:
+    """One pipeline step: a command plus the files it reads and writes.
+
+    ``inputs`` and ``code`` are glob patterns relative to the pipeline root;
+    their paths, sizes and mtimes (plus the values of ``env``) make up the
+    stage fingerprint. ``outputs`` must all match at least one file for a
+    stage to be skipped. ``max_age_seconds`` re-runs a stage whose inputs are
+    external (feeds, RPC) once its last run is older than that. A failed
+    ``optional`` stage does not block the stages that depend on it.
+    """
+
+    name: str
+    command: Sequence[str]
+    inputs: Sequence[str] = ()
+    outputs: Sequence[str] = ()
+    code: Sequence[str] = ()
+    env: Sequence[str] = ()
+    depends_on: Sequence[str] = ()
+    max_age_seconds: Optional[float] = None
+    optional: bool = False
+
+
+@dataclass
+class StageResult:
+    name: str
+    status: str  # "ran", "skipped", "planned", "failed" or "blocked"
+    seconds: float = 0.0
+    reason: str = ""
+    output: str = ""
+
+
+@dataclass
+class PipelineState:
+    """Fingerprint and outcome of each stage's last successful run."""
+
+    path: Path
+    stages: Dict[str, dict] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: Path) -> "PipelineState":
+        if not path.exists():
+            return cls(path=path)
+        payload = json.loads(path.read_text(encoding="utf-8"))
+        if payload.get("version") != STATE_VERSION:
+            return cls(path=path)
+        return cls(path=path, stages=payload.get("stages", {}))
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".json.tmp")
+        tmp_path.write_text(
+            json.dumps({"version": STATE_VERSION, "stages": self.stages}, indent=2),
+            encoding="utf-8",
+        )
+        tmp_path.replace(self.path)
+
+
+def _matches(root: Path, patterns: Sequence[str]) -> List[Path]:
+    paths: List[Path] = []
+    for pattern in patterns:
+        paths.extend(path for path in root.glob(pattern) if path.is_file())
+    return sorted(set(paths))
+
+
+def fingerprint(root: Path, stage: Stage, env: Dict[str, str]) -> str:
+    """Hash of the stage definition, its input/code file stats and env values.
+
+    Only ``stat`` is called per file, so fingerprinting stays cheap even for
+    large inputs; a touched but unchanged file costs one extra run.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([list(stage.command), sorted(stage.outputs)]).encode("utf-8"))
+    for path in _matches(root, [*stage.inputs, *stage.code]):
+        stat = path.stat()
+        digest.update(f"{path.relative_to(root)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8"))
+    for key in sorted(stage.env):
+        digest.update(f"{key}={env.get(key, '')}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _outputs_present(root: Path, stage: Stage) -> bool:
+    return all(any(path.is_file() for path in root.glob(pattern)) for pattern in stage.outputs)
+
+
+def _skip_reason(
+    root: Path,
+    stage: Stage,
+    digest: str,
+    previous: Optional[dict],
+    now: float,
+) -> Optional[str]:
+    if previous is None or previous.get("fingerprint") != digest:
+        return None
+    if not _outputs_present(root, stage):
+        return None
+    if stage.max_age_seconds is not None and now - previous.get("finished_at", 0.0) >= stage.max_age_seconds:
+        return None
+    return "inputs unchanged"
+
+
+def _ordered(stages: Sequence[Stage]) -> List[Stage]:
+    """Stages in dependency order; raises ValueError on unknown deps or cycles."""
+    by_name = {stage.name: stage for stage in stages}
+    ordered: List[Stage] = []
+    visiting: set = set()
+    done: set = set()
+
+    def _visit(stage: Stage) -> None:
+        if stage.name in done:
+            return
+        if stage.name in visiting:
+            raise ValueError(f"dependency cycle through stage {stage.name!r}")
+        visiting.add(stage.name)
+        for dep in stage.depends_on:
+            if dep not in by_name:
+                raise ValueError(f"stage {stage.name!r} depends on unknown stage {dep!r}")
+            _visit(by_name[dep])
+        visiting.discard(stage.name)
+        done.add(stage.name)
+        ordered.append(stage)
+
+    for stage in stages:
+        _visit(stage)
+    return ordered
+
+
+def _run_command(root: Path, stage: Stage) -> Tuple[int, str]:
+    proc = subprocess.run(
+        list(stage.command),
+        cwd=root,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    return proc.returncode, proc.stdout
+
+
+def run_pipeline(
+    root: Path,
+    stages: Sequence[Stage],
+    state_path: Path,
+    env: Optional[Dict[str, str]] = None,
+    jobs: int = 4,
+    force: Sequence[str] = (),
+    dry_run: bool = False,
+    on_result: Optional[Callable[[StageResult], None]] = None,
+) -> List[StageResult]:
+    """Run ``stages`` as a DAG, skipping those whose fingerprint is unchanged.
+
+    A stage starts as soon as all of its dependencies have finished, so
+    independent stages run concurrently (up to ``jobs`` at once). Fingerprints
+    are computed when a stage becomes ready, after its upstream stages have
+    rewritten their outputs. State is saved after every successful stage, so
+    an interrupted run resumes where it stopped. ``force`` names stages to run
+    regardless of fingerprints.
+    """
+    env = dict(os.environ if env is None else env)
+    ordered = _ordered(stages)
+    state = PipelineState.load(state_path)
+    state_lock = threading.Lock()
+    results: Dict[str, StageResult] = {}
+    pending = {stage.name: stage for stage in ordered}
+    running: Dict[Future, Stage] = {}
+
+    def _finish(result: StageResult) -> None:
+        results[result.name] = result
+        STAGE_RUNS.inc(stage=result.name, status=result.status)
+        if on_result is not None:
+            on_result(result)
+
+    def _execute(stage: Stage, digest: str) -> StageResult:
+        started = time.perf_counter()
+        returncode, output = _run_command(root, stage)
+        seconds = time.perf_counter() - started
+        STAGE_SECONDS.observe(seconds, stage=stage.name)
+        if returncode != 0:
+            return StageResult(stage.name, "failed", seconds, f"exit code {returncode}", output)
+        with state_lock:
+            state.stages[stage.name] = {
+                "fingerprint": digest,
+                "finished_at": time.time(),
+                "seconds": round(seconds, 3),
+            }
+            state.save()
+        return StageResult(stage.name, "ran", seconds, output=output)
+
+    by_name = {stage.name: stage for stage in ordered}
+
+    def _blocked_by(stage: Stage) -> Optional[str]:
+        for dep in stage.depends_on:
+            if results[dep].status in ("failed", "blocked") and not by_name[dep].optional:
+                return dep
+        return None
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while pending or running:
+            for name in list(pending):
+                stage = pending[name]
+                if any(dep not in results for dep in stage.depends_on):
+                    continue
+                del pending[name]
+                blocker = _blocked_by(stage)
+                if blocker is not None:
+                    _finish(StageResult(name, "blocked", reason=f"{blocker} failed"))
+                    continue
+                if dry_run:
+                    upstream = next(
+                        (dep for dep in stage.depends_on if results[dep].status == "planned"), None
+                    )
+                    if upstream is not None:
+                        # Its inputs would change once the upstream stage runs.
+                        _finish(StageResult(name, "planned", reason=f"after {upstream}"))
+                        continue
+                digest = fingerprint(root, stage, env)
+                reason = None if name in force else _skip_reason(
+                    root, stage, digest, state.stages.get(name), time.time()
+                )
+                if reason is not None:
+                    _finish(StageResult(name, "skipped", reason=reason))
+                    continue
+                if dry_run:
+                    _finish(StageResult(name, "planned", reason="dry run"))
+                    continue
+                running[pool.submit(_execute, stage, digest)] = stage
+            if not running:
+                continue
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    _finish(future.result())
+                except Exception as exc:  # surfaced as a failed stage
+                    _finish(StageResult(stage.name, "failed", reason=repr(exc)))
+    return [results[stage.name] for stage in ordered]
+
+
+def python_command(script: str) -> List[str]:
+    return [sys.executable, script]
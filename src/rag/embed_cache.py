@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from observability.metrics import counter
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms run without locking
+    fcntl = None  # type: ignore[assignment]
+
+KEY_BYTES = 16
+_RECORD = np.dtype([("key", f"V{KEY_BYTES}"), ("row", "<u8")])
+
+CACHE_HITS = counter("sentinel_rag_embed_cache_hits_total", "Chunk embeddings served from the cache")
+CACHE_MISSES = counter("sentinel_rag_embed_cache_misses_total", "Chunk embeddings computed by the model")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _model_slug(model: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "_", model).strip("_")
+    return f"{slug[:64]}-{hashlib.sha1(model.encode('utf-8')).hexdigest()[:8]}"
+
+
+class EmbeddingCache:
+    """Append-only on-disk store of embeddings keyed by (model, normalized text).
+
+    Vectors live in one memory-mapped ``vectors.bin`` array (float32 or
+    float16); ``index.bin`` holds fixed-size (key, row) records. Appends take
+    an exclusive file lock, write vectors before index records, and readers
+    only trust complete records, so several processes can share one cache.
+    """
+
+    def __init__(self, root: Path, model: str, dtype: str = "float32") -> None:
+        self.model = model
+        self.dir = root / _model_slug(model)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.dir / "vectors.bin"
+        self._index_path = self.dir / "index.bin"
+        self._meta_path = self.dir / "meta.json"
+        self._lock_path = self.dir / ".lock"
+        self.dim: Optional[int] = None
+        self.dtype = np.dtype(dtype)
+        if self._meta_path.exists():
+            meta = json.loads(self._meta_path.read_text(encoding="utf-8"))
+            self.dim = meta.get("dim")
+            self.dtype = np.dtype(meta.get("dtype", dtype))
+        self._rows: Dict[bytes, int] = {}
+        self._index_offset = 0
+        self._vectors: Optional[np.memmap] = None
+        self._mutex = threading.Lock()
+        self.refresh()
+
+    def key(self, text: str) -> bytes:
+        digest = hashlib.blake2b(digest_size=KEY_BYTES)
+        digest.update(self.model.encode("utf-8") + b"\0")
+        digest.update(normalize_text(text).encode("utf-8"))
+        return digest.digest()
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self._mutex, self._lock_path.open("a") as handle:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+    def refresh(self) -> None:
+        """Pick up records appended by other processes since the last refresh."""
+        if not self._index_path.exists():
+            return
+        size = self._index_path.stat().st_size
+        complete = size - size % _RECORD.itemsize
+        if complete <= self._index_offset:
+            return
+        with self._index_path.open("rb") as handle:
+            handle.seek(self._index_offset)
+            records = np.frombuffer(handle.read(complete - self._index_offset), dtype=_RECORD)
+        for record_key, row in zip(records["key"], records["row"]):
+            self._rows[bytes(record_key)] = int(row)
+        self._index_offset = complete
+        self._vectors = None
+
+    def _matrix(self) -> Optional[np.memmap]:
+        if self.dim is None or not self._vectors_path.exists():
+            return None
+        rows = self._vectors_path.stat().st_size // (self.dim * self.dtype.itemsize)
+        if self._vectors is None or self._vectors.shape[0] < rows:
+            self._vectors = (
+                np.memmap(self._vectors_path, dtype=self.dtype, mode="r", shape=(rows, self.dim))
+                if rows
+                else None
+            )
+        return self._vectors
+
+    def get_many(self, texts: Sequence[str]) -> Tuple[List[Optional[np.ndarray]], List[int]]:
+        """Return cached vectors (None for misses) and the indices of the misses."""
+        keys = [self.key(text) for text in texts]
+        rows = [self._rows.get(key) for key in keys]
+        if any(row is None for row in rows):
+            self.refresh()
+            rows = [self._rows.get(key) for key in keys]
+        matrix = self._matrix() if any(row is not None for row in rows) else None
+        results: List[Optional[np.ndarray]] = []
+        missing: List[int] = []
+        for position, row in enumerate(rows):
+            if row is None or matrix is None or row >= matrix.shape[0]:
+                results.append(None)
+                missing.append(position)
+            else:
+                results.append(np.asarray(matrix[row], dtype=np.float32))
+        return results, missing
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        if not texts:
+            return
+        array = np.asarray(vectors, dtype=np.float32)
+        with self._locked():
+            self.refresh()
+            if self.dim is None:
+                self.dim = int(array.shape[1])
+                self._meta_path.write_text(
+                    json.dumps({"model": self.model, "dim": self.dim, "dtype": self.dtype.name}),
+                    encoding="utf-8",
+                )
+            if array.shape[1] != self.dim:
+                raise ValueError(f"embedding dim {array.shape[1]} != cached dim {self.dim}")
+            fresh: Dict[bytes, int] = {}
+            for position, text in enumerate(texts):
+                key = self.key(text)
+                if key not in self._rows and key not in fresh:
+                    fresh[key] = position
+            if not fresh:
+                return
+            row_bytes = self.dim * self.dtype.itemsize
+            first_row = (
+                self._vectors_path.stat().st_size // row_bytes if self._vectors_path.exists() else 0
+            )
+            with self._vectors_path.open("ab") as handle:
+                handle.write(array[list(fresh.values())].astype(self.dtype).tobytes())
+                handle.flush()
+                os.fsync(handle.fileno())
+            records = np.empty(len(fresh), dtype=_RECORD)
+            records["key"] = [np.void(key) for key in fresh]
+            records["row"] = np.arange(first_row, first_row + len(fresh), dtype="<u8")
+            with self._index_path.open("ab") as handle:
+                handle.write(records.tobytes())
+            self.refresh()
+
+    def embed(
+        self,
+        texts: Sequence[str],
+        embed_fn: Callable[[List[str]], Sequence[Sequence[float]]],
+    ) -> List[List[float]]:
+        """Embed ``texts``, running ``embed_fn`` only on cache misses."""
+        cached, missing = self.get_many(texts)
+        CACHE_HITS.inc(len(texts) - len(missing))
+        CACHE_MISSES.inc(len(missing))
+        if missing:
+            computed = embed_fn([texts[position] for position in missing])
+            self.put_many([texts[position] for position in missing], computed)
+            for position, vector in zip(missing, computed):
+                cached[position] = np.asarray(vector, dtype=np.float32)
+        return [vector.tolist() for vector in cached]  # type: ignore[union-attr]
+
+
+_open_caches: Dict[Tuple[Path, str], EmbeddingCache] = {}
+_open_lock = threading.Lock()
+
+
+def open_cache(root: Path, model: str, dtype: str = "float32") -> EmbeddingCache:
+    """Return a process-wide cache instance so the index is loaded only once."""
+    key = (root.resolve(), model)
+    with _open_lock:
+        cache = _open_caches.get(key)
+        if cache is None:
+            cache = _open_caches[key] = EmbeddingCache(root, model, dtype)
+        return cache
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+def datetime_epoch(value: datetime) -> int:
+    """Epoch seconds for ``value``, treating naive datetimes as UTC."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def event_epoch(value: Any) -> Optional[int]:
+    """Parse an ISO event_time (``Z`` or offset suffix) into epoch seconds."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return datetime_epoch(parsed)
+
+
+@dataclass(frozen=True)
+class QueryFilters:
+    """Metadata and time-range constraints applied inside each retriever."""
+
+    protocol: Sequence[str] = ()
+    kind: Sequence[str] = ()
+    source: Sequence[str] = ()
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+
+    def is_empty(self) -> bool:
+        return not (self.protocol or self.kind or self.source or self.since or self.until)
+
+    def _bounds(self) -> Tuple[Optional[int], Optional[int]]:
+        since = datetime_epoch(self.since) if self.since else None
+        until = datetime_epoch(self.until) if self.until else None
+        return since, until
+
+    def chroma_where(self) -> Optional[Dict[str, Any]]:
+        clauses: List[Dict[str, Any]] = []
+        for field, values in (("protocol", self.protocol), ("kind", self.kind), ("source", self.source)):
+            if values:
+                clauses.append({field: {"$in": list(values)}})
+        since, until = self._bounds()
+        if since is not None:
+            clauses.append({"event_ts": {"$gte": since}})
+        if until is not None:
+            clauses.append({"event_ts": {"$lte": until}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def sql(self, alias: str) -> Tuple[str, List[Any]]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        for field, values in (("protocol", self.protocol), ("kind", self.kind), ("source", self.source)):
+            if values:
+                clauses.append(f"{alias}.{field} IN ({', '.join('?' for _ in values)})")
+                params.extend(values)
+        since, until = self._bounds()
+        if since is not None:
+            clauses.append(f"{alias}.event_ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append(f"{alias}.event_ts <= ?")
+            params.append(until)
+        return " AND ".join(clauses), params
@@ -2,23 +2,53 @@ from __future__ import annotations
 
 import json
 import re
-import sqlite3
 import sys
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Iterable, List, Sequence, Tuple
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
-# Chroma requires sqlite3 >= 3.35.0; fall back to pysqlite3-binary if needed.
-if sqlite3.sqlite_version_info < (3, 35, 0):
-    try:
-        import pysqlite3  # type: ignore
+from ingest.neardup import DUPLICATE_TAG
+from ingest.segments import iter_lines
+from observability.metrics import counter, histogram
+from rag.filters import QueryFilters, event_epoch
+from rag.lexical import LexicalIndex, lexical_is_current, lexical_path
+from rag.manifest import IndexManifest, content_hash
+
+EMBED_SECONDS = histogram("sentinel_rag_embed_seconds", "Time to embed one batch of chunks")
+UPSERT_SECONDS = histogram("sentinel_rag_upsert_seconds", "Time to upsert one batch into Chroma")
+CHUNKS_INDEXED = counter("sentinel_rag_chunks_indexed_total", "Chunks embedded and upserted")
+CHUNKS_SKIPPED = counter("sentinel_rag_chunks_skipped_total", "Chunks left as-is because their event is unchanged")
+CHUNKS_DELETED = counter("sentinel_rag_chunks_deleted_total", "Stale chunks deleted from the collection")
+QUERY_SECONDS = histogram("sentinel_rag_query_seconds", "End-to-end RAG query latency")
+
+BACKENDS = ("chroma", "numpy")
+QUERY_MODES = ("hybrid", "dense", "lexical")
+RRF_K = 60
+
+
+@lru_cache(maxsize=1)
+def _chromadb() -> Tuple[ModuleType, ModuleType]:
+    """Import Chroma on first use so callers that never touch RAG skip its cost.
+
+    Raises ImportError when the RAG extras (requirements-rag.txt) are missing.
+    """
+    import sqlite3
 
-        sys.modules["sqlite3"] = pysqlite3
-    except ImportError:
-        pass
+    # Chroma requires sqlite3 >= 3.35.0; fall back to pysqlite3-binary if needed.
+    if sqlite3.sqlite_version_info < (3, 35, 0):
+        try:
+            import pysqlite3  # type: ignore
 
-import chromadb
-from chromadb.utils import embedding_functions
+            sys.modules["sqlite3"] = pysqlite3
+        except ImportError:
+            pass
+
+    import chromadb
+    from chromadb.utils import embedding_functions
+
+    return chromadb, embedding_functions
 
 
 @dataclass(frozen=True)
@@ -28,6 +58,13 @@ class RagConfig:
     embedding_model: str
     max_chars: int = 1200
     batch_size: int = 128
+    parse_workers: int = 0
+    embed_workers: int = 0
+    embed_batch_size: int = 256
+    embedding_cache_dir: Optional[Path] = None
+    embedding_cache_dtype: str = "float32"
+    backend: str = "chroma"
+    quantization: str = "none"
 
 
 def _strip_html(text: str) -> str:
@@ -58,91 +95,416 @@ def _chunk_text(text: str, max_chars: int) -> List[str]:
 
 def _iter_jsonl(paths: Sequence[Path]) -> Iterable[dict]:
     for path in paths:
-        with path.open("r", encoding="utf-8") as handle:
-            for line in handle:
-                text = line.strip()
-                if not text:
-                    continue
-                yield json.loads(text)
+        for line in iter_lines(path):
+            text = line.strip()
+            if not text:
+                continue
+            yield json.loads(text)
 
 
-def _event_metadata(event: dict) -> Dict[str, str]:
-    metadata = {
+def _event_metadata(event: dict) -> Dict[str, Any]:
+    metadata: Dict[str, Any] = {
         "event_id": str(event.get("event_id", "")),
         "source": str(event.get("source", "")),
         "kind": str(event.get("kind", "")),
         "protocol": str(event.get("protocol", "")),
         "event_time": str(event.get("event_time", "")),
     }
+    # Numeric copy of event_time so retrievers can range-filter on it.
+    event_ts = event_epoch(event.get("event_time"))
+    if event_ts is not None:
+        metadata["event_ts"] = event_ts
     if event.get("source_url"):
         metadata["source_url"] = str(event.get("source_url"))
     if event.get("tx_hash"):
         metadata["tx_hash"] = str(event.get("tx_hash"))
+    entities = [str(entity) for entity in event.get("entities") or () if entity]
+    if entities:
+        metadata["entities"] = ",".join(entities)
     return metadata
 
 
-def iter_documents(paths: Sequence[Path], max_chars: int) -> Iterable[Tuple[str, str, Dict[str, str]]]:
+Chunk = Tuple[str, str, Dict[str, Any]]
+
+
+def event_documents(event: dict, max_chars: int) -> Tuple[str, List[Chunk]]:
+    """Turn one event into (event_id, chunks); chunks is empty for events without text.
+
+    Near-duplicates get no chunks either: their canonical event is already indexed.
+    """
+    base_id = str(event.get("event_id", ""))
+    if DUPLICATE_TAG in (event.get("tags") or ()):
+        return base_id, []
+    base_text = _build_text(event)
+    if not base_text:
+        return base_id, []
+    text = _strip_html(base_text)
+    chunks = _chunk_text(text, max_chars)
+    metadata = _event_metadata(event)
+    total = len(chunks)
+    documents = []
+    for idx, chunk in enumerate(chunks):
+        doc_id = f"{base_id}:{idx}" if total > 1 else base_id
+        meta = dict(metadata)
+        meta["chunk"] = str(idx)
+        meta["chunks"] = str(total)
+        documents.append((doc_id, chunk, meta))
+    return base_id, documents
+
+
+def iter_event_documents(
+    paths: Sequence[Path],
+    max_chars: int,
+) -> Iterable[Tuple[str, List[Chunk]]]:
+    """Yield (event_id, chunks) per event, where each chunk is (doc_id, text, metadata)."""
     for event in _iter_jsonl(paths):
-        base_text = _build_text(event)
-        if not base_text:
-            continue
-        text = _strip_html(base_text)
-        chunks = _chunk_text(text, max_chars)
-        base_id = str(event.get("event_id", ""))
-        metadata = _event_metadata(event)
-        total = len(chunks)
-        for idx, chunk in enumerate(chunks):
-            doc_id = f"{base_id}:{idx}" if total > 1 else base_id
-            meta = dict(metadata)
-            meta["chunk"] = str(idx)
-            meta["chunks"] = str(total)
-            yield doc_id, chunk, meta
+        event_id, documents = event_documents(event, max_chars)
+        if documents:
+            yield event_id, documents
 
 
-def build_index(config: RagConfig, paths: Sequence[Path]) -> int:
-    config.persist_dir.mkdir(parents=True, exist_ok=True)
-    client = chromadb.PersistentClient(path=str(config.persist_dir))
-    embed_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name=config.embedding_model
-    )
-    collection = client.get_or_create_collection(
-        name=config.collection_name,
-        embedding_function=embed_fn,
-        metadata={"description": "DeFi Sentinel RAG index"},
+def iter_documents(paths: Sequence[Path], max_chars: int) -> Iterable[Chunk]:
+    for _, documents in iter_event_documents(paths, max_chars):
+        yield from documents
+
+
+def manifest_path(config: RagConfig) -> Path:
+    return config.persist_dir / f"{config.collection_name}.manifest.json"
+
+
+def vector_store_path(config: RagConfig) -> Path:
+    return config.persist_dir / f"{config.collection_name}.npvec"
+
+
+@lru_cache(maxsize=4)
+def _local_embedder(model_name: str) -> Callable[[List[str]], list]:
+    """SentenceTransformer embedding for the numpy backend, without importing Chroma."""
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name)
+    return lambda texts: model.encode(list(texts), convert_to_numpy=True).tolist()
+
+
+@lru_cache(maxsize=4)
+def _chroma_embedder(model_name: str) -> Callable[[List[str]], list]:
+    _, embedding_functions = _chromadb()
+    return embedding_functions.SentenceTransformerEmbeddingFunction(model_name=model_name)
+
+
+def _embedding_function(config: RagConfig) -> Callable[[List[str]], list]:
+    """Process-wide embedder for the config, so the model is loaded once."""
+    if config.backend == "numpy":
+        return _local_embedder(config.embedding_model)
+    return _chroma_embedder(config.embedding_model)
+
+
+@lru_cache(maxsize=4)
+def _chroma_client(persist_dir: str):
+    chromadb, _ = _chromadb()
+    return chromadb.PersistentClient(path=persist_dir)
+
+
+def _cached_embedder(config: RagConfig, embed_fn: Callable) -> Callable[[List[str]], list]:
+    """Wrap ``embed_fn`` with the on-disk embedding cache when one is configured."""
+    if config.embedding_cache_dir is None:
+        return embed_fn
+    from rag.embed_cache import open_cache
+
+    cache = open_cache(
+        config.embedding_cache_dir,
+        config.embedding_model,
+        config.embedding_cache_dtype,
     )
+    return lambda texts: cache.embed(texts, embed_fn)
+
+
+def embed_texts(config: RagConfig, texts: List[str]) -> list:
+    """Embed ``texts`` in one call with the configured model, through the cache."""
+    return _cached_embedder(config, _embedding_function(config))(texts)
+
+
+def _upsert_batch(
+    collection,
+    lexical: LexicalIndex,
+    embed_fn,
+    ids: List[str],
+    docs: List[str],
+    metas: List[Dict[str, Any]],
+) -> None:
+    with EMBED_SECONDS.time():
+        embeddings = embed_fn(docs)
+    with UPSERT_SECONDS.time():
+        collection.upsert(ids=ids, embeddings=embeddings, documents=docs, metadatas=metas)
+        lexical.upsert(ids, docs, metas)
+    CHUNKS_INDEXED.inc(len(ids))
+
+
+def _delete_chunks(collection, lexical: LexicalIndex, ids: List[str], batch_size: int) -> None:
+    for start in range(0, len(ids), batch_size):
+        collection.delete(ids=ids[start : start + batch_size])
+    lexical.delete(ids)
+    CHUNKS_DELETED.inc(len(ids))
+
+
+def _changed_documents(
+    manifest: IndexManifest,
+    events: Iterable[Tuple[str, List[Chunk]]],
+    seen: Set[str],
+    stale: List[str],
+) -> Iterator[Chunk]:
+    """Yield chunks of new or changed events, recording them in the manifest.
 
+    Chunk ids an event no longer produces are appended to ``stale``.
+    """
+    skipped = 0
+    for event_id, documents in events:
+        seen.add(event_id)
+        digest = content_hash(documents)
+        if manifest.is_current(event_id, digest):
+            skipped += len(documents)
+            continue
+        chunk_ids = [doc_id for doc_id, _, _ in documents]
+        stale.extend(set(manifest.chunk_ids(event_id)) - set(chunk_ids))
+        manifest.record(event_id, digest, chunk_ids)
+        yield from documents
+    CHUNKS_SKIPPED.inc(skipped)
+
+
+def _serial_upsert(
+    config: RagConfig,
+    collection,
+    lexical: LexicalIndex,
+    embed_fn,
+    pending: Iterable[Chunk],
+) -> int:
     ids: List[str] = []
     docs: List[str] = []
-    metas: List[Dict[str, str]] = []
+    metas: List[Dict[str, Any]] = []
     total = 0
 
-    for doc_id, text, meta in iter_documents(paths, config.max_chars):
+    for doc_id, text, meta in pending:
         ids.append(doc_id)
         docs.append(text)
         metas.append(meta)
         if len(ids) >= config.batch_size:
-            collection.upsert(ids=ids, documents=docs, metadatas=metas)
+            _upsert_batch(collection, lexical, embed_fn, ids, docs, metas)
             total += len(ids)
             ids, docs, metas = [], [], []
 
     if ids:
-        collection.upsert(ids=ids, documents=docs, metadatas=metas)
+        _upsert_batch(collection, lexical, embed_fn, ids, docs, metas)
         total += len(ids)
+    return total
+
 
+def build_index(config: RagConfig, paths: Sequence[Path]) -> int:
+    """Embed and upsert new or changed events; returns the number of chunks upserted.
+
+    A manifest next to the collection records each event's content hash and
+    chunk ids. Unchanged events are skipped, chunks that an event no longer
+    produces are deleted, and events missing from ``paths`` are removed. A
+    different embedding model or backend than the manifest records forces a
+    full rebuild.
+
+    Every upsert and delete is mirrored into the BM25 lexical index
+    (``rag.lexical``); a missing lexical index forces a full pass so the two
+    retrievers always cover the same chunks.
+
+    With ``parse_workers`` or ``embed_workers`` above 1 the parse and embed
+    stages run in process pools (see ``rag.pipeline``).
+    """
+    if config.backend not in BACKENDS:
+        raise ValueError(f"unknown RAG backend {config.backend!r}; expected one of {BACKENDS}")
+    config.persist_dir.mkdir(parents=True, exist_ok=True)
+    embed_fn = _embedding_function(config)
+    manifest = IndexManifest.load(manifest_path(config))
+    rebuild = manifest.embedding_model not in (None, config.embedding_model) or (
+        manifest.embedding_model is not None and manifest.backend != config.backend
+    )
+    if config.backend == "numpy":
+        from rag.vector_store import NumpyVectorStore, current_version_dir
+
+        store_dir = vector_store_path(config)
+        if rebuild or current_version_dir(store_dir) is None:
+            manifest = IndexManifest(path=manifest.path)
+        collection = NumpyVectorStore.open(store_dir, config.quantization)
+        if rebuild:
+            collection.delete(list(collection.ids))
+    else:
+        client = _chroma_client(str(config.persist_dir))
+        if rebuild:
+            try:
+                client.delete_collection(name=config.collection_name)
+            except Exception:
+                pass
+            manifest = IndexManifest(path=manifest.path)
+        collection = client.get_or_create_collection(
+            name=config.collection_name,
+            embedding_function=embed_fn,
+            metadata={"description": "DeFi Sentinel RAG index"},
+        )
+    manifest.embedding_model = config.embedding_model
+    manifest.backend = config.backend
+    lexical_file = lexical_path(config.persist_dir, config.collection_name)
+    if rebuild or not lexical_is_current(lexical_file):
+        lexical_file.unlink(missing_ok=True)
+    if not lexical_file.exists():
+        manifest = IndexManifest(
+            path=manifest.path,
+            embedding_model=config.embedding_model,
+            backend=config.backend,
+        )
+
+    if config.parse_workers > 1:
+        from rag.pipeline import parallel_event_documents
+
+        events = parallel_event_documents(paths, config.max_chars, config.parse_workers)
+    else:
+        events = iter_event_documents(paths, config.max_chars)
+
+    lexical = LexicalIndex(lexical_file)
+    seen: Set[str] = set()
+    stale: List[str] = []
+    pending = _changed_documents(manifest, events, seen, stale)
+    try:
+        if config.embed_workers > 1:
+            from rag.pipeline import pipelined_upsert
+
+            total = pipelined_upsert(config, collection, lexical, pending)
+        else:
+            embed = _cached_embedder(config, embed_fn)
+            total = _serial_upsert(config, collection, lexical, embed, pending)
+
+        stale.extend(manifest.drop_missing(seen))
+        if stale:
+            _delete_chunks(collection, lexical, stale, config.batch_size)
+    finally:
+        lexical.close()
+    if config.backend == "numpy":
+        collection.save()
+    manifest.save()
     return total
 
 
+def _fuse(rankings: Sequence[Sequence[str]], top_k: int) -> List[Tuple[str, float]]:
+    """Reciprocal-rank fusion: score(d) = sum over rankings of 1 / (RRF_K + rank)."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (RRF_K + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+
+@dataclass(frozen=True)
+class QueryRequest:
+    """One query in a ``query_many`` batch."""
+
+    query: str
+    top_k: int = 5
+    filters: Optional[QueryFilters] = None
+    mode: str = "hybrid"
+
+    def candidates(self) -> int:
+        return max(self.top_k * 4, 20) if self.mode == "hybrid" else self.top_k
+
+
+def _dense_hits(
+    config: RagConfig,
+    vectors: Sequence[Sequence[float]],
+    requests: Sequence[QueryRequest],
+) -> List[List[Chunk]]:
+    """Dense candidates for each request, searched together per backend call."""
+    top_k = max(request.candidates() for request in requests)
+    filters = [request.filters or QueryFilters() for request in requests]
+    if config.backend == "numpy":
+        from rag.vector_store import open_store
+
+        store = open_store(vector_store_path(config), config.quantization)
+        return [
+            [(hit.doc_id, hit.document, hit.metadata) for hit in hits]
+            for hits in store.search(vectors, top_k, filters)
+        ]
+    collection = _chroma_client(str(config.persist_dir)).get_or_create_collection(
+        name=config.collection_name,
+        embedding_function=_embedding_function(config),
+    )
+    # Chroma takes one where clause per call, so queries sharing filters go together.
+    groups: Dict[str, List[int]] = {}
+    for position, query_filters in enumerate(filters):
+        groups.setdefault(json.dumps(query_filters.chroma_where(), sort_keys=True), []).append(position)
+    results: List[List[Chunk]] = [[] for _ in requests]
+    for positions in groups.values():
+        result = collection.query(
+            query_embeddings=[vectors[position] for position in positions],
+            n_results=top_k,
+            where=filters[positions[0]].chroma_where(),
+        )
+        for offset, position in enumerate(positions):
+            results[position] = list(
+                zip(result["ids"][offset], result["documents"][offset], result["metadatas"][offset])
+            )
+    return results
+
+
+def query_many(config: RagConfig, requests: Sequence[QueryRequest]) -> List[dict]:
+    """Answer a batch of queries with one embedding pass and shared clients.
+
+    Every request may carry its own ``top_k``, ``filters`` and ``mode`` (see
+    ``query_index``). Dense retrieval embeds all queries in a single model
+    call and searches them together; the lexical index is opened once for
+    the batch. Results come back in request order.
+    """
+    for request in requests:
+        if request.mode not in QUERY_MODES:
+            raise ValueError(f"unknown query mode {request.mode!r}; expected one of {QUERY_MODES}")
+    if not requests:
+        return []
+    with QUERY_SECONDS.time():
+        dense = [position for position, request in enumerate(requests) if request.mode != "lexical"]
+        rankings: List[List[List[Chunk]]] = [[] for _ in requests]
+        if dense:
+            vectors = embed_texts(config, [requests[position].query for position in dense])
+            hits = _dense_hits(config, vectors, [requests[position] for position in dense])
+            for position, chunks in zip(dense, hits):
+                rankings[position].append(chunks[: requests[position].candidates()])
+        lexical_file = lexical_path(config.persist_dir, config.collection_name)
+        if lexical_file.exists() and any(request.mode != "dense" for request in requests):
+            lexical = LexicalIndex(lexical_file)
+            try:
+                for position, request in enumerate(requests):
+                    if request.mode == "dense":
+                        continue
+                    found = lexical.search(request.query, request.candidates(), request.filters)
+                    rankings[position].append([(doc_id, text, meta) for doc_id, text, meta, _ in found])
+            finally:
+                lexical.close()
+        return [_fused_result(ranking, request.top_k) for ranking, request in zip(rankings, requests)]
+
+
+def _fused_result(rankings: List[List[Chunk]], top_k: int) -> dict:
+    chunks = {doc_id: (doc_id, text, meta) for ranking in rankings for doc_id, text, meta in ranking}
+    fused = _fuse([[doc_id for doc_id, _, _ in ranking] for ranking in rankings], top_k)
+    return {
+        "ids": [[doc_id for doc_id, _ in fused]],
+        "documents": [[chunks[doc_id][1] for doc_id, _ in fused]],
+        "metadatas": [[chunks[doc_id][2] for doc_id, _ in fused]],
+        "scores": [[score for _, score in fused]],
+    }
+
+
 def query_index(
     config: RagConfig,
     query: str,
     top_k: int = 5,
+    filters: Optional[QueryFilters] = None,
+    mode: str = "hybrid",
 ) -> dict:
-    client = chromadb.PersistentClient(path=str(config.persist_dir))
-    embed_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name=config.embedding_model
-    )
-    collection = client.get_or_create_collection(
-        name=config.collection_name,
-        embedding_function=embed_fn,
-    )
-    return collection.query(query_texts=[query], n_results=top_k)
+    """Retrieve the ``top_k`` chunks for ``query`` in Chroma's result shape.
+
+    ``mode`` picks dense (embedding) retrieval, lexical (BM25) retrieval, or
+    a hybrid of both fused by reciprocal rank. ``filters`` are pushed into
+    each retriever, so filtered queries still return ``top_k`` matches
+    instead of whatever survives post-filtering. Each result carries its
+    fused (or single-retriever) score in ``scores``.
+    """
+    return query_many(config, [QueryRequest(query, top_k, filters, mode)])[0]
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import json
+import re
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from rag.filters import QueryFilters
+
+_TOKEN = re.compile(r"[A-Za-z0-9_]+")
+
+# Bump when the schema changes; build_index drops an index of another version.
+LEXICAL_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    rowid INTEGER PRIMARY KEY,
+    doc_id TEXT NOT NULL UNIQUE,
+    protocol TEXT,
+    kind TEXT,
+    source TEXT,
+    event_ts INTEGER,
+    metadata TEXT NOT NULL,
+    text TEXT NOT NULL,
+    terms TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS chunks_filter ON chunks (protocol, kind, event_ts);
+CREATE INDEX IF NOT EXISTS chunks_time ON chunks (event_ts);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+    text, terms, content='chunks', content_rowid='rowid', tokenize='unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+    INSERT INTO chunks_fts(rowid, text, terms) VALUES (new.rowid, new.text, new.terms);
+END;
+CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+    INSERT INTO chunks_fts(chunks_fts, rowid, text, terms) VALUES ('delete', old.rowid, old.text, old.terms);
+END;
+CREATE TRIGGER IF NOT EXISTS chunks_au AFTER UPDATE ON chunks BEGIN
+    INSERT INTO chunks_fts(chunks_fts, rowid, text, terms) VALUES ('delete', old.rowid, old.text, old.terms);
+    INSERT INTO chunks_fts(rowid, text, terms) VALUES (new.rowid, new.text, new.terms);
+END;
+"""
+
+LexicalHit = Tuple[str, str, Dict[str, object], float]
+
+
+def lexical_path(persist_dir: Path, collection_name: str) -> Path:
+    return persist_dir / f"{collection_name}.lexical.sqlite3"
+
+
+def lexical_is_current(path: Path) -> bool:
+    """True if ``path`` holds a lexical index written with this schema version."""
+    if not path.exists():
+        return False
+    conn = sqlite3.connect(str(path))
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0] == LEXICAL_VERSION
+    finally:
+        conn.close()
+
+
+def _exact_terms(meta: Dict[str, object]) -> str:
+    # Identifiers that are not in the chunk text: the tx hash and the entity list
+    # (addresses, tickers), so an exact hash or address query has something to match.
+    terms = [str(meta.get("tx_hash") or "")]
+    terms.extend(str(meta.get("entities") or "").split(","))
+    return " ".join(term for term in terms if term)
+
+
+def _match_expression(query: str) -> Optional[str]:
+    # Quote every token so user text can never be parsed as FTS5 syntax.
+    tokens = _TOKEN.findall(query)
+    if not tokens:
+        return None
+    return " OR ".join(f'"{token}"' for token in dict.fromkeys(tokens))
+
+
+class LexicalIndex:
+    """BM25 inverted index over chunk text, kept next to the Chroma collection.
+
+    A second FTS5 column, ``terms``, holds each chunk's tx hash and entities so
+    hashes and addresses match exactly even though they are not in the text.
+
+    Backed by SQLite FTS5. Filter columns live in an ordinary indexed table so
+    metadata and time-range constraints are applied by the query planner
+    rather than by scanning matches.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        created = not path.exists()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        if created:
+            self._conn.execute(f"PRAGMA user_version = {LEXICAL_VERSION}")
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def upsert(self, ids: Sequence[str], docs: Sequence[str], metas: Sequence[Dict[str, object]]) -> None:
+        rows = [
+            (
+                doc_id,
+                meta.get("protocol"),
+                meta.get("kind"),
+                meta.get("source"),
+                meta.get("event_ts"),
+                json.dumps(meta, separators=(",", ":")),
+                text,
+                _exact_terms(meta),
+            )
+            for doc_id, text, meta in zip(ids, docs, metas)
+        ]
+        with self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO chunks (doc_id, protocol, kind, source, event_ts, metadata, text, terms)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (doc_id) DO UPDATE SET
+                    protocol = excluded.protocol,
+                    kind = excluded.kind,
+                    source = excluded.source,
+                    event_ts = excluded.event_ts,
+                    metadata = excluded.metadata,
+                    text = excluded.text,
+                    terms = excluded.terms
+                """,
+                rows,
+            )
+
+    def delete(self, ids: Iterable[str]) -> None:
+        with self._conn:
+            self._conn.executemany("DELETE FROM chunks WHERE doc_id = ?", [(doc_id,) for doc_id in ids])
+
+    def search(self, query: str, top_k: int, filters: Optional[QueryFilters] = None) -> List[LexicalHit]:
+        """Return (doc_id, text, metadata, bm25) best-first; lower bm25 is better."""
+        expression = _match_expression(query)
+        if expression is None:
+            return []
+        where = "chunks_fts MATCH ?"
+        params: List[object] = [expression]
+        if filters is not None and not filters.is_empty():
+            clause, extra = filters.sql("c")
+            where += f" AND {clause}"
+            params.extend(extra)
+        params.append(top_k)
+        rows = self._conn.execute(
+            f"""
+            SELECT c.doc_id, c.text, c.metadata, bm25(chunks_fts) AS score
+            FROM chunks_fts JOIN chunks AS c ON c.rowid = chunks_fts.rowid
+            WHERE {where}
+            ORDER BY score
+            LIMIT ?
+            """,
+            params,
+        ).fetchall()
+        return [(doc_id, text, json.loads(meta), score) for doc_id, text, meta, score in rows]
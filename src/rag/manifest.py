@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+MANIFEST_VERSION = 1
+
+
+def content_hash(chunks: Sequence[Tuple[str, str, Dict[str, Any]]]) -> str:
+    """Hash the chunk ids, texts and metadata an event produced.
+
+    Any change to the event text, its metadata or the chunking (for example a
+    different ``max_chars``) changes the hash.
+    """
+    digest = hashlib.sha256()
+    for doc_id, text, meta in chunks:
+        digest.update(doc_id.encode("utf-8") + b"\0")
+        digest.update(text.encode("utf-8") + b"\0")
+        digest.update(json.dumps(meta, sort_keys=True).encode("utf-8") + b"\n")
+    return digest.hexdigest()
+
+
+@dataclass
+class IndexManifest:
+    """Event id -> (content hash, chunk ids) for everything in one collection."""
+
+    path: Path
+    embedding_model: Optional[str] = None
+    backend: str = "chroma"
+    docs: Dict[str, dict] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: Path) -> "IndexManifest":
+        if not path.exists():
+            return cls(path=path)
+        payload = json.loads(path.read_text(encoding="utf-8"))
+        if payload.get("version") != MANIFEST_VERSION:
+            return cls(path=path)
+        return cls(
+            path=path,
+            embedding_model=payload.get("embedding_model"),
+            backend=payload.get("backend", "chroma"),
+            docs=payload.get("docs", {}),
+        )
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "version": MANIFEST_VERSION,
+            "embedding_model": self.embedding_model,
+            "backend": self.backend,
+            "docs": self.docs,
+        }
+        tmp_path = self.path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(payload, separators=(",", ":")), encoding="utf-8")
+        tmp_path.replace(self.path)
+
+    def is_current(self, event_id: str, digest: str) -> bool:
+        entry = self.docs.get(event_id)
+        return entry is not None and entry.get("hash") == digest
+
+    def chunk_ids(self, event_id: str) -> List[str]:
+        entry = self.docs.get(event_id)
+        return list(entry.get("chunks", [])) if entry else []
+
+    def record(self, event_id: str, digest: str, chunk_ids: Sequence[str]) -> None:
+        self.docs[event_id] = {"hash": digest, "chunks": list(chunk_ids)}
+
+    def drop_missing(self, seen: Set[str]) -> List[str]:
+        """Forget events not in ``seen`` and return their chunk ids for deletion."""
+        stale: List[str] = []
+        for event_id in [key for key in self.docs if key not in seen]:
+            stale.extend(self.chunk_ids(event_id))
+            del self.docs[event_id]
+        return stale
@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from ingest.segments import is_compressed, read_bytes, read_index, read_segment
+from observability.metrics import gauge
+from rag.embed_cache import CACHE_HITS, CACHE_MISSES
+from rag.index import CHUNKS_INDEXED, UPSERT_SECONDS, Chunk, RagConfig, event_documents
+from rag.lexical import LexicalIndex
+
+PARSE_RANGE_BYTES = 8 << 20
+WRITER_QUEUE_SIZE = 4
+
+STAGE_DOCS_PER_SECOND = gauge(
+    "sentinel_rag_stage_docs_per_second",
+    "Throughput of each index build pipeline stage over its active span",
+    ("stage",),
+)
+
+
+@dataclass
+class StageStats:
+    """Items a stage produced and the wall-clock span it was active for."""
+
+    name: str
+    items: int = 0
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+    def start(self) -> None:
+        if self.started is None:
+            self.started = time.perf_counter()
+
+    def add(self, items: int) -> None:
+        self.start()
+        self.items += items
+        self.finished = time.perf_counter()
+
+    def docs_per_second(self) -> float:
+        if self.started is None or self.finished is None or self.finished <= self.started:
+            return 0.0
+        return self.items / (self.finished - self.started)
+
+    def report(self) -> None:
+        STAGE_DOCS_PER_SECOND.set(self.docs_per_second(), stage=self.name)
+
+
+# --- parse stage -------------------------------------------------------------
+
+
+def _split_ranges(paths: Sequence[Path], range_bytes: int) -> List[Tuple[str, int, int]]:
+    ranges: List[Tuple[str, int, int]] = []
+    for path in paths:
+        if is_compressed(path):
+            # Compressed inputs split on their gzip members; without an index
+            # the whole file is one range.
+            segments = read_index(path) or []
+            ranges.extend((str(path), segment.offset, segment.offset + segment.length) for segment in segments)
+            if not segments:
+                ranges.append((str(path), 0, -1))
+            continue
+        size = path.stat().st_size
+        for start in range(0, max(size, 1), range_bytes):
+            ranges.append((str(path), start, min(size, start + range_bytes)))
+    return ranges
+
+
+def _range_lines(path: str, start: int, end: int) -> Iterator[bytes]:
+    if is_compressed(Path(path)):
+        # A compressed range is one gzip member, or the whole file when end is -1.
+        data = read_bytes(Path(path)) if end < 0 else read_segment(Path(path), start, end - start)
+        yield from data.splitlines()
+        return
+    with open(path, "rb") as handle:
+        if start:
+            handle.seek(start - 1)
+            handle.readline()
+        while handle.tell() < end:
+            line = handle.readline()
+            if not line:
+                break
+            yield line
+
+
+def _parse_range(path: str, start: int, end: int, max_chars: int) -> List[Tuple[str, List[Chunk]]]:
+    """Parse the lines that start inside [start, end) of a JSONL file."""
+    results: List[Tuple[str, List[Chunk]]] = []
+    for line in _range_lines(path, start, end):
+        text = line.strip()
+        if not text:
+            continue
+        event_id, documents = event_documents(json.loads(text), max_chars)
+        if documents:
+            results.append((event_id, documents))
+    return results
+
+
+def parallel_event_documents(
+    paths: Sequence[Path],
+    max_chars: int,
+    workers: int,
+    stats: Optional[StageStats] = None,
+) -> Iterator[Tuple[str, List[Chunk]]]:
+    """Parse and chunk line-aligned byte ranges of the inputs in a process pool.
+
+    Results come back in input order, with at most ``2 * workers`` ranges in
+    flight so memory stays bounded regardless of corpus size.
+    """
+    stats = stats or StageStats("parse")
+    ranges = iter(_split_ranges(paths, PARSE_RANGE_BYTES))
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        in_flight: Deque[Future] = deque()
+        stats.start()
+        for task in ranges:
+            in_flight.append(pool.submit(_parse_range, *task, max_chars))
+            if len(in_flight) >= 2 * workers:
+                yield from _drain_parse(in_flight.popleft(), stats)
+        while in_flight:
+            yield from _drain_parse(in_flight.popleft(), stats)
+    stats.report()
+
+
+def _drain_parse(future: Future, stats: StageStats) -> List[Tuple[str, List[Chunk]]]:
+    results = future.result()
+    stats.add(sum(len(documents) for _, documents in results))
+    return results
+
+
+# --- embed stage -------------------------------------------------------------
+
+_model: Any = None
+
+
+def _init_embedder(model_name: str, threads: int) -> None:
+    global _model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(threads)
+    _model = SentenceTransformer(model_name)
+
+
+def _embed(texts: List[str], batch_size: int) -> List[List[float]]:
+    vectors = _model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+    return vectors.tolist()
+
+
+# --- write stage -------------------------------------------------------------
+
+
+class _Writer(threading.Thread):
+    def __init__(self, collection: Any, lexical: LexicalIndex, stats: StageStats) -> None:
+        super().__init__(daemon=True)
+        self.collection = collection
+        self.lexical = lexical
+        self.stats = stats
+        self.queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=WRITER_QUEUE_SIZE)
+        self.error: Optional[BaseException] = None
+
+    def run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if self.error is not None:
+                continue
+            ids, embeddings, docs, metas = item
+            self.stats.start()
+            try:
+                with UPSERT_SECONDS.time():
+                    self.collection.upsert(
+                        ids=ids, embeddings=embeddings, documents=docs, metadatas=metas
+                    )
+                    self.lexical.upsert(ids, docs, metas)
+            except BaseException as exc:  # surfaced by pipelined_upsert
+                self.error = exc
+                continue
+            CHUNKS_INDEXED.inc(len(ids))
+            self.stats.add(len(ids))
+
+
+def _length_sorted_batches(window: List[Chunk], batch_size: int) -> Iterable[List[Chunk]]:
+    window.sort(key=lambda chunk: len(chunk[1]))
+    for start in range(0, len(window), batch_size):
+        yield window[start : start + batch_size]
+
+
+def pipelined_upsert(
+    config: RagConfig,
+    collection: Any,
+    lexical: LexicalIndex,
+    pending: Iterable[Chunk],
+) -> int:
+    """Embed ``pending`` chunks in a process pool and upsert them from a writer thread.
+
+    Chunks are gathered into a window, sorted by length so each embedding
+    batch pads to similar sizes, and sent to ``embed_workers`` processes that
+    each hold one model copy. Bounded in-flight batches and a bounded writer
+    queue keep memory flat; per-stage docs/sec are exported as metrics.
+    """
+    workers = config.embed_workers
+    batch_size = config.embed_batch_size
+    window_size = batch_size * workers * 2
+    threads = max(1, (os.cpu_count() or workers) // workers)
+    embed_stats = StageStats("embed")
+    write_stats = StageStats("write")
+    writer = _Writer(collection, lexical, write_stats)
+    writer.start()
+    total = 0
+
+    cache = None
+    if config.embedding_cache_dir is not None:
+        from rag.embed_cache import open_cache
+
+        cache = open_cache(
+            config.embedding_cache_dir,
+            config.embedding_model,
+            config.embedding_cache_dtype,
+        )
+
+    context = multiprocessing.get_context("spawn")
+    # (future for the cache misses or None, batch, vectors with None for misses, miss positions)
+    in_flight: Deque[Tuple[Optional[Future], List[Chunk], list, List[int]]] = deque()
+
+    def _collect() -> None:
+        nonlocal total
+        future, batch, embeddings, missing = in_flight.popleft()
+        if future is not None:
+            computed = future.result()
+            if cache is not None:
+                cache.put_many([batch[position][1] for position in missing], computed)
+            for position, vector in zip(missing, computed):
+                embeddings[position] = vector
+        embeddings = [vector.tolist() if hasattr(vector, "tolist") else vector for vector in embeddings]
+        embed_stats.add(len(batch))
+        ids = [doc_id for doc_id, _, _ in batch]
+        docs = [text for _, text, _ in batch]
+        metas: List[Dict[str, Any]] = [meta for _, _, meta in batch]
+        writer.queue.put((ids, embeddings, docs, metas))
+        total += len(batch)
+
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_embedder,
+            initargs=(config.embedding_model, threads),
+        ) as pool:
+            window: List[Chunk] = []
+
+            def _flush_window() -> None:
+                for batch in _length_sorted_batches(window, batch_size):
+                    texts = [text for _, text, _ in batch]
+                    embed_stats.start()
+                    if cache is not None:
+                        cached, missing = cache.get_many(texts)
+                        CACHE_HITS.inc(len(texts) - len(missing))
+                        CACHE_MISSES.inc(len(missing))
+                    else:
+                        cached, missing = [None] * len(texts), list(range(len(texts)))
+                    future = None
+                    if missing:
+                        miss_texts = [texts[position] for position in missing]
+                        future = pool.submit(_embed, miss_texts, batch_size)
+                    in_flight.append((future, batch, cached, missing))
+                    while len(in_flight) > 2 * workers:
+                        _collect()
+                window.clear()
+
+            for chunk in pending:
+                window.append(chunk)
+                if len(window) >= window_size:
+                    _flush_window()
+            _flush_window()
+            while in_flight:
+                _collect()
+    finally:
+        writer.queue.put(None)
+        writer.join()
+    if writer.error is not None:
+        raise writer.error
+    embed_stats.report()
+    write_stats.report()
+    return total
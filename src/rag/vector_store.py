@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from rag.filters import QueryFilters, datetime_epoch
+
+QUANTIZATIONS = ("none", "int8")
+RERANK_FACTOR = 4
+SCAN_BLOCK_ROWS = 65536
+STORE_VERSION = 1
+CURRENT_FILE = "CURRENT"
+KEEP_VERSIONS = 2
+_LEGACY_FILES = ("meta.json", "chunks.jsonl", "vectors.npy", "codes.npy", "scales.npy")
+
+_FILTER_FIELDS = ("protocol", "kind", "source")
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+def quantize_int8(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization; returns (codes, scales)."""
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(matrix / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+@dataclass
+class SearchHit:
+    doc_id: str
+    document: str
+    metadata: Dict[str, Any]
+    score: float
+
+
+class NumpyVectorStore:
+    """Brute-force cosine index stored as memory-mapped ``.npy`` matrices.
+
+    Rows are L2-normalized so a query is one matrix-vector (or, for a batch,
+    matrix-matrix) product followed by ``argpartition``. With ``int8``
+    quantization the scan runs over int8 codes and the best
+    ``RERANK_FACTOR * top_k`` candidates are re-scored against the float32
+    rows, which are only paged in for those candidates.
+
+    Mutations are staged in memory and written by ``save`` into a new
+    ``v<N>`` version directory; the ``CURRENT`` pointer file is then swapped
+    with ``os.replace``, so the store always exists and readers never see a
+    half-written version.
+    """
+
+    def __init__(self, path: Path, quantization: str = "none") -> None:
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"unknown quantization {quantization!r}; expected one of {QUANTIZATIONS}")
+        self.path = path
+        self.quantization = quantization
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.vectors: Optional[np.ndarray] = None
+        self.codes: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        self._rows: Dict[str, int] = {}
+        self._staged: Dict[str, Optional[Tuple[np.ndarray, str, Dict[str, Any]]]] = {}
+        self._columns: Dict[str, np.ndarray] = {}
+        self._dirty = True
+
+    # --- persistence -------------------------------------------------------
+
+    @classmethod
+    def open(cls, path: Path, quantization: str = "none") -> "NumpyVectorStore":
+        store = cls(path, quantization)
+        data_dir = current_version_dir(path)
+        if data_dir is None:
+            return store
+        meta = json.loads((data_dir / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("version") != STORE_VERSION:
+            return store
+        with (data_dir / "chunks.jsonl").open("r", encoding="utf-8") as handle:
+            for line in handle:
+                row = json.loads(line)
+                store.ids.append(row["id"])
+                store.documents.append(row["document"])
+                store.metadatas.append(row["metadata"])
+        if store.ids:
+            store.vectors = np.load(data_dir / "vectors.npy", mmap_mode="r")
+            if meta.get("quantization") == "int8" and (data_dir / "codes.npy").exists():
+                store.codes = np.load(data_dir / "codes.npy", mmap_mode="r")
+                store.scales = np.load(data_dir / "scales.npy", mmap_mode="r")
+        store._rows = {doc_id: row for row, doc_id in enumerate(store.ids)}
+        store._build_columns()
+        store._dirty = meta.get("quantization") != quantization
+        return store
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        ids, documents, metadatas, vectors = self._materialize()
+        version = f"v{_latest_version(self.path) + 1:06d}"
+        tmp_dir = self.path / f"{version}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+        with (tmp_dir / "chunks.jsonl").open("w", encoding="utf-8") as handle:
+            for doc_id, document, metadata in zip(ids, documents, metadatas):
+                row = {"id": doc_id, "document": document, "metadata": metadata}
+                handle.write(json.dumps(row, separators=(",", ":")) + "\n")
+        np.save(tmp_dir / "vectors.npy", vectors)
+        if self.quantization == "int8":
+            codes, scales = quantize_int8(vectors)
+            np.save(tmp_dir / "codes.npy", codes)
+            np.save(tmp_dir / "scales.npy", scales)
+        meta = {
+            "version": STORE_VERSION,
+            "count": len(ids),
+            "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+            "quantization": self.quantization,
+        }
+        (tmp_dir / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+        tmp_dir.rename(self.path / version)
+        pointer_tmp = self.path / f"{CURRENT_FILE}.tmp"
+        pointer_tmp.write_text(version + "\n", encoding="utf-8")
+        os.replace(pointer_tmp, self.path / CURRENT_FILE)
+        _prune_versions(self.path)
+        reopened = NumpyVectorStore.open(self.path, self.quantization)
+        self.__dict__.update(reopened.__dict__)
+
+    def _materialize(self) -> Tuple[List[str], List[str], List[Dict[str, Any]], np.ndarray]:
+        keep = [row for row, doc_id in enumerate(self.ids) if doc_id not in self._staged]
+        ids = [self.ids[row] for row in keep]
+        documents = [self.documents[row] for row in keep]
+        metadatas = [self.metadatas[row] for row in keep]
+        blocks: List[np.ndarray] = []
+        if keep and self.vectors is not None:
+            blocks.append(np.asarray(self.vectors[keep], dtype=np.float32))
+        added = [(doc_id, item) for doc_id, item in self._staged.items() if item is not None]
+        if added:
+            ids.extend(doc_id for doc_id, _ in added)
+            documents.extend(item[1] for _, item in added)
+            metadatas.extend(item[2] for _, item in added)
+            blocks.append(_normalize(np.stack([item[0] for _, item in added])))
+        vectors = np.concatenate(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+        return ids, documents, metadatas, vectors
+
+    # --- collection-style mutations (same calls build_index makes on Chroma) --
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+    ) -> None:
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        for doc_id, vector, document, metadata in zip(ids, matrix, documents, metadatas):
+            self._staged[doc_id] = (vector, document, metadata)
+        self._dirty = True
+
+    def delete(self, ids: Iterable[str]) -> None:
+        for doc_id in ids:
+            if doc_id in self._rows or doc_id in self._staged:
+                self._staged[doc_id] = None
+                self._dirty = True
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    # --- search ------------------------------------------------------------
+
+    def _build_columns(self) -> None:
+        self._columns = {
+            field: np.array([str(meta.get(field, "")) for meta in self.metadatas], dtype=object)
+            for field in _FILTER_FIELDS
+        }
+        self._columns["event_ts"] = np.array(
+            [meta.get("event_ts", np.nan) for meta in self.metadatas], dtype=np.float64
+        )
+
+    def _mask(self, filters: Optional[QueryFilters]) -> Optional[np.ndarray]:
+        if filters is None or filters.is_empty() or not self.ids:
+            return None
+        mask = np.ones(len(self.ids), dtype=bool)
+        for field in _FILTER_FIELDS:
+            values = getattr(filters, field)
+            if values:
+                mask &= np.isin(self._columns[field], list(values))
+        event_ts = self._columns["event_ts"]
+        if filters.since is not None:
+            mask &= event_ts >= datetime_epoch(filters.since)
+        if filters.until is not None:
+            mask &= event_ts <= datetime_epoch(filters.until)
+        return mask
+
+    def _scores(self, matrix: np.ndarray) -> np.ndarray:
+        if self.codes is None or self.scales is None:
+            return matrix @ self.vectors.T
+        # Scan int8 codes in blocks so only one block is widened to float32 at a time.
+        scores = np.empty((len(matrix), len(self.ids)), dtype=np.float32)
+        for start in range(0, len(self.ids), SCAN_BLOCK_ROWS):
+            block = np.asarray(self.codes[start : start + SCAN_BLOCK_ROWS], dtype=np.float32)
+            scores[:, start : start + len(block)] = (matrix @ block.T) * self.scales[start : start + len(block)]
+        return scores
+
+    def search(
+        self,
+        queries: Sequence[Sequence[float]],
+        top_k: int,
+        filters: Optional[Sequence[Optional[QueryFilters]]] = None,
+    ) -> List[List[SearchHit]]:
+        """Top-``top_k`` hits per query row, best first; scores are cosine similarity."""
+        matrix = _normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        if not self.ids or self.vectors is None:
+            return [[] for _ in range(len(matrix))]
+        filters = filters or [None] * len(matrix)
+        quantized = self.codes is not None
+        candidates = top_k * RERANK_FACTOR if quantized else top_k
+        results: List[List[SearchHit]] = []
+        for position, row_scores in enumerate(self._scores(matrix)):
+            mask = self._mask(filters[position])
+            if mask is not None:
+                row_scores = np.where(mask, row_scores, -np.inf)
+            rows = _top_rows(row_scores, candidates)
+            rows = rows[np.isfinite(row_scores[rows])]
+            if quantized and len(rows):
+                # Re-rank int8 candidates by exact similarity; sorted rows keep memmap reads sequential.
+                rows = np.sort(rows)
+                exact = np.asarray(self.vectors[rows], dtype=np.float32) @ matrix[position]
+                best = np.argsort(-exact)[:top_k]
+                rows, hit_scores = rows[best], exact[best]
+            else:
+                hit_scores = row_scores[rows]
+            results.append(
+                [
+                    SearchHit(self.ids[row], self.documents[row], self.metadatas[row], float(score))
+                    for row, score in zip(rows, hit_scores)
+                ]
+            )
+        return results
+
+
+def current_version_dir(path: Path) -> Optional[Path]:
+    """Directory holding the live version, or ``None`` if nothing was saved yet.
+
+    Stores written before versioning keep their files directly in ``path``.
+    """
+    pointer = path / CURRENT_FILE
+    if pointer.exists():
+        return path / pointer.read_text(encoding="utf-8").strip()
+    if (path / "meta.json").exists():
+        return path
+    return None
+
+
+def _versions(path: Path) -> List[Tuple[int, Path]]:
+    if not path.is_dir():
+        return []
+    found = []
+    for child in path.iterdir():
+        if child.is_dir() and child.name.startswith("v") and child.name[1:].isdigit():
+            found.append((int(child.name[1:]), child))
+    return sorted(found)
+
+
+def _latest_version(path: Path) -> int:
+    versions = _versions(path)
+    return versions[-1][0] if versions else 0
+
+
+def _prune_versions(path: Path) -> None:
+    # The previous version stays so a reader that just read the old pointer can still open it.
+    for _, old_dir in _versions(path)[:-KEEP_VERSIONS]:
+        shutil.rmtree(old_dir, ignore_errors=True)
+    for child in path.iterdir():
+        if child.name.endswith(".tmp") and child.is_dir():
+            shutil.rmtree(child, ignore_errors=True)
+    for name in _LEGACY_FILES:
+        (path / name).unlink(missing_ok=True)
+
+
+def _top_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < len(scores):
+        rows = np.argpartition(-scores, k - 1)[:k]
+    else:
+        rows = np.arange(len(scores))
+    return rows[np.argsort(-scores[rows])]
+
+
+_open_stores: Dict[Tuple[Path, str], Tuple[Optional[Path], NumpyVectorStore]] = {}
+_open_lock = threading.Lock()
+
+
+def open_store(path: Path, quantization: str = "none") -> NumpyVectorStore:
+    """Return a process-wide read handle, reopened when a new version is swapped in."""
+    version_dir = current_version_dir(path)
+    key = (path.resolve(), quantization)
+    with _open_lock:
+        cached = _open_stores.get(key)
+        if cached is None or cached[0] != version_dir:
+            cached = _open_stores[key] = (version_dir, NumpyVectorStore.open(path, quantization))
+        return cached[1]